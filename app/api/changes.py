@@ -0,0 +1,49 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session
+
+from app.core.database import get_read_session
+from app.core.serialization import FastJSONResponse
+from app.core.versions import versioned_tables
+from app.crud.changes import ChangeFeed, feed_entities, read_changes
+from app.models import User, UserType
+from app.dependencies.auth import TokenClaims, get_current_active_user, get_token_claims
+from app.dependencies.caching import versioned
+
+UserDep = Annotated[User, Depends(get_current_active_user)]
+ClaimsDep = Annotated[TokenClaims, Depends(get_token_claims)]
+ReadSessionDep = Annotated[Session, Depends(get_read_session)]
+
+MAX_CHANGES = 5000
+
+changes_router = APIRouter(
+    responses={
+        401: {"description": "Unauthorized"},
+        410: {"description": "Gone"},
+        },
+    tags=['Changes']
+)
+
+@changes_router.get("/changes", name='get_changes', response_model=ChangeFeed, dependencies=[versioned(*versioned_tables, by_usertype=True)])
+def get_changes(
+    current_user: UserDep,
+    claims: ClaimsDep,
+    db: ReadSessionDep,
+    since: Annotated[int, Query(ge=0, description="The cursor of the previous response; 0 for every change logged")] = 0,
+    entities: Annotated[list[str] | None, Query(description="Only the changes of these entities")] = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_CHANGES, description="Change log rows to read at most")] = 1000,
+):
+    """
+    What was created, updated and deleted after `since`, one change per row:
+    the whole row for a create, the changed fields for an update. Keep the
+    returned `cursor` and ask again with it; poll with If-None-Match to get
+    304 until something changes. Users, roles, skills and modules are only
+    in the feed of superadmins.
+    """
+    visible = [
+        entity for entity, feed in feed_entities.items()
+        if (claims.usertype == UserType.superadmin or not feed.superadmin_only)
+        and (entities is None or entity in entities)
+    ]
+    return FastJSONResponse(content=read_changes(db, since, limit, visible))
@@ -7,7 +7,7 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlmodel import Session, select
 
 from app.core.config import settings
-from app.core.database import get_session
+from app.core.database import get_read_session, get_write_session
 from app.crud.users_and_permissions import *
 from app.models import User
 from app.dependencies.auth import (
@@ -17,7 +17,8 @@ from app.dependencies.auth import (
 # Jinja2 templates
 templates = Jinja2Templates(directory="app/templates")
 
-SessionDep = Annotated[Session, Depends(get_session)]
+ReadSessionDep = Annotated[Session, Depends(get_read_session)]
+WriteSessionDep = Annotated[Session, Depends(get_write_session)]
 
 design_test_catalogue_router = APIRouter(
     prefix="/design_test_catalogue",
@@ -0,0 +1,91 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.broadcast import change_broadcaster
+from app.core.config import settings
+from app.core.database import async_engine
+from app.core.serialization import dumps
+from app.crud.changes import feed_entities
+from app.dependencies.auth import get_current_active_user, get_current_user, get_token_claims
+from app.models import UserType
+
+live_router = APIRouter(tags=['Live'])
+
+def _auth_token(websocket: WebSocket) -> str | None:
+    # Browsers send the login cookie with the handshake; other clients can use the header
+    scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return token
+    return websocket.cookies.get(settings.COOKIE_NAME)
+
+async def _authorize(websocket: WebSocket, module: str) -> float | None:
+    """The expiry of the connection's token, or HTTPException when it may not listen to `module`."""
+    # The cookie would let any site open this socket; only accept pages of our own origin
+    origin = websocket.headers.get("origin")
+    if origin is not None and urlsplit(origin).netloc != websocket.headers.get("host"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Cross-origin connection")
+    modules = {feed.module: False for feed in feed_entities.values()}
+    for feed in feed_entities.values():
+        modules[feed.module] |= feed.superadmin_only
+    if module not in modules:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No live channel for '{module}'")
+    token = _auth_token(websocket)
+    if token is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+    async with AsyncSession(async_engine, expire_on_commit=False) as db:
+        claims = await get_token_claims(db, token)
+        await get_current_active_user(await get_current_user(db, token, claims))
+    if modules[module] and claims.usertype != UserType.superadmin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="The user doesn't have the required permissions.")
+    return claims.exp
+
+async def _wait_for_close(websocket: WebSocket) -> None:
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+@live_router.websocket("/live/{module}", name="live_changes")
+async def live_changes(websocket: WebSocket, module: str):
+    """
+    Pushes the creates, updates and deletes of `module`'s entities as they
+    are committed, in the shape of GET /changes. Messages are
+    {"type": "changes", "cursor", "changes"}, or {"type": "resync", "cursor"}
+    when the client fell too far behind and should reload its lists. The
+    first message, {"type": "hello", "cursor"}, tells where the stream starts.
+    The connection closes when its token expires; reconnect with a new one.
+    """
+    try:
+        expires = await _authorize(websocket, module)
+    except HTTPException as exc:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=exc.detail)
+        return
+
+    subscription = change_broadcaster.subscribe(module, settings.LIVE_MAX_PENDING)
+    closed = None
+    try:
+        await websocket.accept()
+        await websocket.send_text(dumps({"type": "hello", "cursor": subscription.cursor}).decode())
+        closed = asyncio.create_task(_wait_for_close(websocket))
+        while True:
+            message = asyncio.create_task(subscription.next_message(settings.LIVE_COALESCE_SECONDS))
+            timeout = None if expires is None else max(0.0, expires - time.time())
+            done, _ = await asyncio.wait({message, closed}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if message not in done:
+                message.cancel()
+                if closed not in done:
+                    await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Token expired")
+                return
+            # A client that stops reading must not hold its queue, or this task, forever
+            await asyncio.wait_for(websocket.send_text(dumps(message.result()).decode()), settings.LIVE_SEND_TIMEOUT_SECONDS)
+    except (WebSocketDisconnect, asyncio.TimeoutError):
+        pass
+    finally:
+        change_broadcaster.unsubscribe(module, subscription)
+        if closed is not None:
+            closed.cancel()
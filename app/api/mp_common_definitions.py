@@ -6,14 +6,20 @@ from fastapi import (
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
-from app.core.database import get_session
+from app.core.config import settings
+from app.core.database import get_read_session, get_write_session, get_async_session
+from app.core.streaming import iter_records
 # Import the new CRUD functions
 from app.crud.mp_common_definitions import *
 # Import all necessary models
 from app.models import *
 from app.dependencies.auth import get_current_active_user
+from app.core.compression import encoded_json_response, preferred_encoding
+from app.dependencies.caching import versioned
+from app.dependencies.pagination import PageDep, page_response, ExportDep, export_response
 
 # Jinja2 templates
 templates = Jinja2Templates(directory="app/templates")
@@ -22,7 +28,9 @@ templates = Jinja2Templates(directory="app/templates")
 # NOTE: Using get_current_active_user makes these endpoints accessible to any logged-in user.
 # If you need stricter permissions (e.g., only admins), you might want a different dependency.
 UserDep = Annotated[User, Depends(get_current_active_user)]
-SessionDep = Annotated[Session, Depends(get_session)]
+ReadSessionDep = Annotated[Session, Depends(get_read_session)]
+WriteSessionDep = Annotated[Session, Depends(get_write_session)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
 
 mp_common_definitions_router = APIRouter(
     prefix="/mp_common_definitions",
@@ -45,121 +53,245 @@ async def mp_common_definitions_index(request: Request, current_user: UserDep):
         "user": current_user,
     })
 
+@mp_common_definitions_router.get("/bootstrap", name='get_mp_common_definitions_bootstrap', dependencies=[versioned(*bootstrap_tables, encoded=True)])
+def get_mp_common_definitions_bootstrap(current_user: UserDep, request: Request, db: ReadSessionDep):
+    """
+    Everything the page loads when it opens, in one compressed response:
+    locations, warehouses, laboratories, divisions and the users the division
+    editor offers, keyed like their list endpoints.
+    """
+    encoding = preferred_encoding(request.headers.get("accept-encoding"))
+    return encoded_json_response(read_bootstrap_json(db, encoding), encoding)
+
+@mp_common_definitions_router.get("/hierarchy", name='get_hierarchy', response_model=HierarchyRead, dependencies=[versioned(*hierarchy_tables)])
+def get_hierarchy(current_user: UserDep, db: ReadSessionDep):
+    """
+    Locations, warehouses, divisions, laboratories and users with the links
+    between them, so the page can draw the organization without joining lists.
+    """
+    return Response(content=read_hierarchy_json(db), media_type="application/json")
+
+async def run_bulk_import(import_rows, db: AsyncSession, request: Request) -> BulkImportReport:
+    try:
+        return await import_rows(db, iter_records(request), settings.BULK_IMPORT_CHUNK_SIZE)
+    except IntegrityError:
+        # A concurrent write took one of the codes; nothing of this import was kept
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Import conflicted with a concurrent change, retry it")
+
 # region Location operations
-@mp_common_definitions_router.get("/locations/", name='get_all_locations', response_model=list[LocationRead])
-def get_all_locations(current_user: UserDep, db: SessionDep):
-    return read_all_locations(db)
+@mp_common_definitions_router.get("/locations/", name='get_all_locations', response_model=list[LocationRead], dependencies=[versioned("location")])
+def get_all_locations(current_user: UserDep, db: ReadSessionDep, page: PageDep):
+    if page:
+        return page_response(*read_locations_page(db, page))
+    return Response(content=read_all_locations_json(db), media_type="application/json")
+
+@mp_common_definitions_router.get("/locations/export", name='export_locations', dependencies=[versioned("location")])
+def get_locations_export(current_user: UserDep, export: ExportDep):
+    """Streams every location with its relationships as NDJSON or CSV."""
+    chunks = export_locations(export.format, export.include, settings.EXPORT_BATCH_SIZE)
+    return export_response("locations", export.format, chunks)
 
-@mp_common_definitions_router.get("/locations/{location_id}", response_model=LocationRead)
-def get_location_by_id(current_user: UserDep, location_id: int, db: SessionDep):
+@mp_common_definitions_router.post("/locations/rows", name='get_location_rows', response_model=GridRowsResponse)
+def get_location_rows(current_user: UserDep, rows_request: GridRowsRequest, db: ReadSessionDep):
+    """Server-side row model: one block of locations, filtered, sorted and grouped in SQL."""
+    return read_locations_rows(db, rows_request)
+
+@mp_common_definitions_router.post("/locations/bulk", name='bulk_import_locations', response_model=BulkImportReport)
+async def bulk_import_locations(current_user: UserDep, request: Request, db: AsyncSessionDep):
+    """Creates locations from a streamed CSV or NDJSON body and reports the rows that failed."""
+    return await run_bulk_import(import_locations, db, request)
+
+@mp_common_definitions_router.get("/locations/{location_id}", response_model=LocationRead, dependencies=[versioned("location")])
+def get_location_by_id(current_user: UserDep, location_id: int, db: ReadSessionDep):
     location = read_location(db, location_id)
     if not location:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Location not found")
     return location
 
 @mp_common_definitions_router.post("/locations/", name='create_new_location', response_model=Location, status_code=status.HTTP_201_CREATED)
-def create_new_location(current_user: UserDep, location_create: LocationCreate, db: SessionDep):
+def create_new_location(current_user: UserDep, location_create: LocationCreate, db: WriteSessionDep):
     return create_location(db=db, location_create=location_create)
 
 @mp_common_definitions_router.put("/locations/{location_id}",name='update_existing_location', response_model=Location)
-def update_existing_location(current_user: UserDep, location_id: int, location_update: LocationUpdate, db: SessionDep):
+def update_existing_location(current_user: UserDep, location_id: int, location_update: LocationUpdate, db: WriteSessionDep):
     db_location = read_location(db, location_id)
     if not db_location:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Location not found")
     return update_location(db=db, db_location=db_location, input_location=location_update)
 
 @mp_common_definitions_router.delete("/locations/{location_id}",name='delete_location_by_id', status_code=status.HTTP_204_NO_CONTENT)
-def delete_location_by_id(current_user: UserDep, location_id: int, db: SessionDep):
+def delete_location_by_id(current_user: UserDep, location_id: int, db: WriteSessionDep):
     if not delete_location(db, location_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Location not found")
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 # endregion
 
 # region Warehouse operations
-@mp_common_definitions_router.get("/warehouses/", name='get_all_warehouses', response_model=list[WarehouseRead])
-def get_all_warehouses(current_user: UserDep, db: SessionDep):
-    return read_all_warehouses(db)
+@mp_common_definitions_router.get("/warehouses/", name='get_all_warehouses', response_model=list[WarehouseRead], dependencies=[versioned("warehouse")])
+def get_all_warehouses(current_user: UserDep, db: ReadSessionDep, page: PageDep):
+    if page:
+        return page_response(*read_warehouses_page(db, page))
+    return Response(content=read_all_warehouses_json(db), media_type="application/json")
+
+@mp_common_definitions_router.get("/warehouses/export", name='export_warehouses', dependencies=[versioned("warehouse")])
+def get_warehouses_export(current_user: UserDep, export: ExportDep):
+    """Streams every warehouse with its relationships as NDJSON or CSV."""
+    chunks = export_warehouses(export.format, export.include, settings.EXPORT_BATCH_SIZE)
+    return export_response("warehouses", export.format, chunks)
+
+@mp_common_definitions_router.post("/warehouses/rows", name='get_warehouse_rows', response_model=GridRowsResponse)
+def get_warehouse_rows(current_user: UserDep, rows_request: GridRowsRequest, db: ReadSessionDep):
+    """Server-side row model: one block of warehouses, filtered, sorted and grouped in SQL."""
+    return read_warehouses_rows(db, rows_request)
 
-@mp_common_definitions_router.get("/warehouses/{warehouse_id}", response_model=WarehouseRead)
-def get_warehouse_by_id(current_user: UserDep, warehouse_id: int, db: SessionDep):
+@mp_common_definitions_router.post("/warehouses/bulk", name='bulk_import_warehouses', response_model=BulkImportReport)
+async def bulk_import_warehouses(current_user: UserDep, request: Request, db: AsyncSessionDep):
+    """Creates warehouses from a streamed CSV or NDJSON body and reports the rows that failed."""
+    return await run_bulk_import(import_warehouses, db, request)
+
+@mp_common_definitions_router.get("/warehouses/{warehouse_id}", response_model=WarehouseRead, dependencies=[versioned("warehouse")])
+def get_warehouse_by_id(current_user: UserDep, warehouse_id: int, db: ReadSessionDep):
     warehouse = read_warehouse(db, warehouse_id)
     if not warehouse:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Warehouse not found")
     return warehouse
 
 @mp_common_definitions_router.post("/warehouses/", name='create_new_warehouse', response_model=WarehouseRead, status_code=status.HTTP_201_CREATED)
-def create_new_warehouse(current_user: UserDep, warehouse_create: WarehouseCreate, db: SessionDep):
+def create_new_warehouse(current_user: UserDep, warehouse_create: WarehouseCreate, db: WriteSessionDep):
     return create_warehouse(db=db, warehouse_create=warehouse_create)
 
 @mp_common_definitions_router.put("/warehouses/{warehouse_id}", response_model=WarehouseRead)
-def update_existing_warehouse(current_user: UserDep, warehouse_id: int, warehouse_update: WarehouseUpdate, db: SessionDep):
+def update_existing_warehouse(current_user: UserDep, warehouse_id: int, warehouse_update: WarehouseUpdate, db: WriteSessionDep):
     db_warehouse = read_warehouse(db, warehouse_id)
     if not db_warehouse:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Warehouse not found")
     return update_warehouse(db=db, db_warehouse=db_warehouse, input_warehouse=warehouse_update)
 
+@mp_common_definitions_router.patch("/warehouses/{warehouse_id}/members", name='update_warehouse_members_by_id', status_code=status.HTTP_204_NO_CONTENT)
+def update_warehouse_members_by_id(current_user: UserDep, warehouse_id: int, members: WarehouseMembersUpdate, db: WriteSessionDep):
+    # Plain get: the current links are never loaded, only the requested ones are touched
+    db_warehouse = db.get(Warehouse, warehouse_id)
+    if not db_warehouse:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Warehouse not found")
+    update_warehouse_members(db=db, db_warehouse=db_warehouse, members=members)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 @mp_common_definitions_router.delete("/warehouses/{warehouse_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_warehouse_by_id(current_user: UserDep, warehouse_id: int, db: SessionDep):
+def delete_warehouse_by_id(current_user: UserDep, warehouse_id: int, db: WriteSessionDep):
     if not delete_warehouse(db, warehouse_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Warehouse not found")
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 # endregion
 
 # region Laboratory operations
-@mp_common_definitions_router.get("/laboratories/", name='get_all_laboratories', response_model=list[LaboratoryRead])
-def get_all_laboratories(current_user: UserDep, db: SessionDep):
-    return read_all_laboratories(db)
+@mp_common_definitions_router.get("/laboratories/", name='get_all_laboratories', response_model=list[LaboratoryRead], dependencies=[versioned("laboratory")])
+def get_all_laboratories(current_user: UserDep, db: ReadSessionDep, page: PageDep):
+    if page:
+        return page_response(*read_laboratories_page(db, page))
+    return Response(content=read_all_laboratories_json(db), media_type="application/json")
+
+@mp_common_definitions_router.get("/laboratories/export", name='export_laboratories', dependencies=[versioned("laboratory")])
+def get_laboratories_export(current_user: UserDep, export: ExportDep):
+    """Streams every laboratory with its relationships as NDJSON or CSV."""
+    chunks = export_laboratories(export.format, export.include, settings.EXPORT_BATCH_SIZE)
+    return export_response("laboratories", export.format, chunks)
+
+@mp_common_definitions_router.post("/laboratories/rows", name='get_laboratory_rows', response_model=GridRowsResponse)
+def get_laboratory_rows(current_user: UserDep, rows_request: GridRowsRequest, db: ReadSessionDep):
+    """Server-side row model: one block of laboratories, filtered, sorted and grouped in SQL."""
+    return read_laboratories_rows(db, rows_request)
+
+@mp_common_definitions_router.post("/laboratories/bulk", name='bulk_import_laboratories', response_model=BulkImportReport)
+async def bulk_import_laboratories(current_user: UserDep, request: Request, db: AsyncSessionDep):
+    """Creates laboratories from a streamed CSV or NDJSON body and reports the rows that failed."""
+    return await run_bulk_import(import_laboratories, db, request)
 
-@mp_common_definitions_router.get("/laboratories/{laboratory_id}", response_model=LaboratoryRead)
-def get_laboratory_by_id(current_user: UserDep, laboratory_id: int, db: SessionDep):
+@mp_common_definitions_router.get("/laboratories/{laboratory_id}", response_model=LaboratoryRead, dependencies=[versioned("laboratory")])
+def get_laboratory_by_id(current_user: UserDep, laboratory_id: int, db: ReadSessionDep):
     laboratory = read_laboratory(db, laboratory_id)
     if not laboratory:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Laboratory not found")
     return laboratory
 
 @mp_common_definitions_router.post("/laboratories/", response_model=LaboratoryRead, status_code=status.HTTP_201_CREATED)
-def create_new_laboratory(current_user: UserDep, laboratory_create: LaboratoryCreate, db: SessionDep):
+def create_new_laboratory(current_user: UserDep, laboratory_create: LaboratoryCreate, db: WriteSessionDep):
     return create_laboratory(db=db, laboratory_create=laboratory_create)
 
 @mp_common_definitions_router.put("/laboratories/{laboratory_id}", response_model=LaboratoryRead)
-def update_existing_laboratory(current_user: UserDep, laboratory_id: int, laboratory_update: LaboratoryUpdate, db: SessionDep):
+def update_existing_laboratory(current_user: UserDep, laboratory_id: int, laboratory_update: LaboratoryUpdate, db: WriteSessionDep):
     db_laboratory = read_laboratory(db, laboratory_id)
     if not db_laboratory:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Laboratory not found")
     return update_laboratory(db=db, db_laboratory=db_laboratory, input_laboratory=laboratory_update)
 
+@mp_common_definitions_router.patch("/laboratories/{laboratory_id}/members", name='update_laboratory_members_by_id', status_code=status.HTTP_204_NO_CONTENT)
+def update_laboratory_members_by_id(current_user: UserDep, laboratory_id: int, members: LaboratoryMembersUpdate, db: WriteSessionDep):
+    # Plain get: the current links are never loaded, only the requested ones are touched
+    db_laboratory = db.get(Laboratory, laboratory_id)
+    if not db_laboratory:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Laboratory not found")
+    update_laboratory_members(db=db, db_laboratory=db_laboratory, members=members)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 @mp_common_definitions_router.delete("/laboratories/{laboratory_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_laboratory_by_id(current_user: UserDep, laboratory_id: int, db: SessionDep):
+def delete_laboratory_by_id(current_user: UserDep, laboratory_id: int, db: WriteSessionDep):
     if not delete_laboratory(db, laboratory_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Laboratory not found")
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 # endregion
 
 # region Division operations
-@mp_common_definitions_router.get("/divisions/", name='get_all_divisions', response_model=list[DivisionRead])
-def get_all_divisions(current_user: UserDep, db: SessionDep):
-    return read_all_divisions(db)
+@mp_common_definitions_router.get("/divisions/", name='get_all_divisions', response_model=list[DivisionRead], dependencies=[versioned("division")])
+def get_all_divisions(current_user: UserDep, db: ReadSessionDep, page: PageDep):
+    if page:
+        return page_response(*read_divisions_page(db, page))
+    return Response(content=read_all_divisions_json(db), media_type="application/json")
 
-@mp_common_definitions_router.get("/divisions/{division_id}", response_model=DivisionRead)
-def get_division_by_id(current_user: UserDep, division_id: int, db: SessionDep):
+@mp_common_definitions_router.get("/divisions/export", name='export_divisions', dependencies=[versioned("division")])
+def get_divisions_export(current_user: UserDep, export: ExportDep):
+    """Streams every division with its relationships as NDJSON or CSV."""
+    chunks = export_divisions(export.format, export.include, settings.EXPORT_BATCH_SIZE)
+    return export_response("divisions", export.format, chunks)
+
+@mp_common_definitions_router.post("/divisions/rows", name='get_division_rows', response_model=GridRowsResponse)
+def get_division_rows(current_user: UserDep, rows_request: GridRowsRequest, db: ReadSessionDep):
+    """Server-side row model: one block of divisions, filtered, sorted and grouped in SQL."""
+    return read_divisions_rows(db, rows_request)
+
+@mp_common_definitions_router.post("/divisions/bulk", name='bulk_import_divisions', response_model=BulkImportReport)
+async def bulk_import_divisions(current_user: UserDep, request: Request, db: AsyncSessionDep):
+    """Creates divisions from a streamed CSV or NDJSON body and reports the rows that failed."""
+    return await run_bulk_import(import_divisions, db, request)
+
+@mp_common_definitions_router.get("/divisions/{division_id}", response_model=DivisionRead, dependencies=[versioned("division")])
+def get_division_by_id(current_user: UserDep, division_id: int, db: ReadSessionDep):
     division = read_division(db, division_id)
     if not division:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Division not found")
     return division
 
 @mp_common_definitions_router.post("/divisions/", response_model=DivisionRead, status_code=status.HTTP_201_CREATED)
-def create_new_division(current_user: UserDep, division_create: DivisionCreate, db: SessionDep):
+def create_new_division(current_user: UserDep, division_create: DivisionCreate, db: WriteSessionDep):
     return create_division(db=db, division_create=division_create)
 
 @mp_common_definitions_router.put("/divisions/{division_id}", response_model=DivisionRead)
-def update_existing_division(current_user: UserDep, division_id: int, division_update: DivisionUpdate, db: SessionDep):
+def update_existing_division(current_user: UserDep, division_id: int, division_update: DivisionUpdate, db: WriteSessionDep):
     db_division = read_division(db, division_id)
     if not db_division:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Division not found")
     return update_division(db=db, db_division=db_division, input_division=division_update)
 
+@mp_common_definitions_router.patch("/divisions/{division_id}/members", name='update_division_members_by_id', status_code=status.HTTP_204_NO_CONTENT)
+def update_division_members_by_id(current_user: UserDep, division_id: int, members: DivisionMembersUpdate, db: WriteSessionDep):
+    # Plain get: the current links are never loaded, only the requested ones are touched
+    db_division = db.get(Division, division_id)
+    if not db_division:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Division not found")
+    update_division_members(db=db, db_division=db_division, members=members)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 @mp_common_definitions_router.delete("/divisions/{division_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_division_by_id(current_user: UserDep, division_id: int, db: SessionDep):
+def delete_division_by_id(current_user: UserDep, division_id: int, db: WriteSessionDep):
     if not delete_division(db, division_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Division not found")
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,37 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session
+
+from app.core.database import get_read_session
+from app.crud.search import search, searchable_tables
+from app.models import SearchHit, User
+from app.dependencies.auth import get_current_active_user
+from app.dependencies.caching import versioned
+
+UserDep = Annotated[User, Depends(get_current_active_user)]
+ReadSessionDep = Annotated[Session, Depends(get_read_session)]
+
+search_router = APIRouter(
+    responses={
+        400: {"description": "Bad Request"},
+        401: {"description": "Unauthorized"},
+        },
+    tags=['Search']
+)
+
+@search_router.get("/search", name='search', response_model=list[SearchHit], dependencies=[versioned(*searchable_tables)])
+def get_search(
+    current_user: UserDep,
+    db: ReadSessionDep,
+    q: Annotated[str, Query(max_length=200, description="Words to look for; each matches as a prefix")],
+    entities: Annotated[list[str] | None, Query(description=f"Limit the search to some of: {', '.join(searchable_tables)}")] = None,
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+):
+    """
+    Locations, warehouses, laboratories, divisions and users whose code,
+    name, description, address, username or email match every word of `q`,
+    best match first.
+    """
+    tables = [table for table in searchable_tables if entities is None or table in entities]
+    return search(db, q, tables, limit)
@@ -8,19 +8,24 @@ from sqlmodel import Session, select
 from sqlalchemy.exc import IntegrityError
 
 from app.core.config import settings
-from app.core.database import get_session
+from app.core.serialization import list_response
+from app.core.database import get_read_session, get_write_session
 from app.crud.users_and_permissions import *
 from app.models import *
 from app.dependencies.auth import (
     get_current_active_user, get_current_superadmin
     )
+from app.core.compression import encoded_json_response, preferred_encoding
+from app.dependencies.caching import versioned
+from app.dependencies.pagination import PageDep, page_response, ExportDep, export_response
 
 # Jinja2 templates
 templates = Jinja2Templates(directory="app/templates")
 
 # Only superadmins are allowed to use this route
 UserDep = Annotated[UserRead, Depends(get_current_superadmin)]
-SessionDep = Annotated[Session, Depends(get_session)]
+ReadSessionDep = Annotated[Session, Depends(get_read_session)]
+WriteSessionDep = Annotated[Session, Depends(get_write_session)]
 
 users_and_permissions_router = APIRouter(
     prefix="/users_and_permissions",
@@ -47,17 +52,38 @@ async def users_and_permissions_index(
         "user": current_user,
     })
 
+@users_and_permissions_router.get("/bootstrap", name='get_users_and_permissions_bootstrap', dependencies=[versioned(*bootstrap_tables, encoded=True, auth=get_current_superadmin)])
+def get_users_and_permissions_bootstrap(current_user: UserDep, request: Request, db: Session = Depends(get_read_session)):
+    """
+    Everything the page loads when it opens, in one compressed response:
+    roles, skills, modules, users and the divisions the user editor offers,
+    keyed like their list endpoints.
+    """
+    encoding = preferred_encoding(request.headers.get("accept-encoding"))
+    return encoded_json_response(read_bootstrap_json(db, encoding), encoding)
+
 # region userroles operations
-@users_and_permissions_router.get("/userroles/", name='get_all_user_roles', response_model=list[UserRoleRead])
-def get_all_user_roles(current_user: UserDep, db: Session = Depends(get_session)):
+@users_and_permissions_router.get("/userroles/", name='get_all_user_roles', response_model=list[UserRoleRead], dependencies=[versioned("userrole", auth=get_current_superadmin)])
+def get_all_user_roles(current_user: UserDep, page: PageDep, db: Session = Depends(get_read_session)):
     """
     Retrieve all user roles.
     """
     # raise HTTPException(status_code=404, detail="Item not found")
-    return read_all_roles(db)
+    if page:
+        return page_response(*read_roles_page(db, page))
+    return list_response(UserRoleRead, role_relationships, read_all_roles(db))
 
-@users_and_permissions_router.get("/userroles/{role_id}", response_model=UserRoleRead)
-def get_user_role_by_id(current_user: UserDep, role_id: int, db: Session = Depends(get_session)):
+@users_and_permissions_router.get("/userroles/export", name='export_userroles', dependencies=[versioned("userrole", auth=get_current_superadmin)])
+def get_userroles_export(current_user: UserDep, export: ExportDep):
+    chunks = export_roles(export.format, export.include, settings.EXPORT_BATCH_SIZE)
+    return export_response("userroles", export.format, chunks)
+
+@users_and_permissions_router.post("/userroles/rows", name='get_user_role_rows', response_model=GridRowsResponse)
+def get_user_role_rows(current_user: UserDep, rows_request: GridRowsRequest, db: Session = Depends(get_read_session)):
+    return read_roles_rows(db, rows_request)
+
+@users_and_permissions_router.get("/userroles/{role_id}", response_model=UserRoleRead, dependencies=[versioned("userrole", auth=get_current_superadmin)])
+def get_user_role_by_id(current_user: UserDep, role_id: int, db: Session = Depends(get_read_session)):
     """
     Retrieve a specific user role by its ID.
     """
@@ -71,7 +97,7 @@ def get_user_role_by_id(current_user: UserDep, role_id: int, db: Session = Depen
     return role
 
 @users_and_permissions_router.post("/userroles/", response_model=UserRole, status_code=status.HTTP_201_CREATED)
-def create_new_user_role(current_user: UserDep, role_create: UserRoleCreate, db: Session = Depends(get_session)):
+def create_new_user_role(current_user: UserDep, role_create: UserRoleCreate, db: Session = Depends(get_write_session)):
     """
     Create a new user role.
     """
@@ -88,7 +114,7 @@ def update_existing_user_role(
     current_user: UserDep,
     role_id: int,
     role_update: UserRoleUpdate,
-    db: Session = Depends(get_session)
+    db: Session = Depends(get_write_session)
 ):
     """
     Update an existing user role.
@@ -108,7 +134,7 @@ def update_existing_user_role(
             )
 
 @users_and_permissions_router.delete("/userroles/{role_id}", name='delete_user_role_by_id', status_code=status.HTTP_204_NO_CONTENT)
-def delete_user_role_by_id(current_user: UserDep,role_id: int, db: Session = Depends(get_session)):
+def delete_user_role_by_id(current_user: UserDep,role_id: int, db: Session = Depends(get_write_session)):
     """
     Delete a user role by its ID.
     """
@@ -121,12 +147,23 @@ def delete_user_role_by_id(current_user: UserDep,role_id: int, db: Session = Dep
 #endregion
 
 # region userskills operations
-@users_and_permissions_router.get("/userskills/", name="get_all_user_skills", response_model=list[UserSkillRead],)
-def get_all_user_skills(current_user: UserDep, db: Session = Depends(get_session)):
-    return read_all_skills(db)
+@users_and_permissions_router.get("/userskills/", name="get_all_user_skills", response_model=list[UserSkillRead], dependencies=[versioned("userskill", auth=get_current_superadmin)])
+def get_all_user_skills(current_user: UserDep, page: PageDep, db: Session = Depends(get_read_session)):
+    if page:
+        return page_response(*read_skills_page(db, page))
+    return list_response(UserSkillRead, skill_relationships, read_all_skills(db))
+
+@users_and_permissions_router.get("/userskills/export", name='export_userskills', dependencies=[versioned("userskill", auth=get_current_superadmin)])
+def get_userskills_export(current_user: UserDep, export: ExportDep):
+    chunks = export_skills(export.format, export.include, settings.EXPORT_BATCH_SIZE)
+    return export_response("userskills", export.format, chunks)
 
-@users_and_permissions_router.get("/userskills/{skill_id}", response_model=UserSkillRead)
-def get_user_skill_by_id(current_user: UserDep, skill_id: int, db: Session = Depends(get_session)):
+@users_and_permissions_router.post("/userskills/rows", name='get_user_skill_rows', response_model=GridRowsResponse)
+def get_user_skill_rows(current_user: UserDep, rows_request: GridRowsRequest, db: Session = Depends(get_read_session)):
+    return read_skills_rows(db, rows_request)
+
+@users_and_permissions_router.get("/userskills/{skill_id}", response_model=UserSkillRead, dependencies=[versioned("userskill", auth=get_current_superadmin)])
+def get_user_skill_by_id(current_user: UserDep, skill_id: int, db: Session = Depends(get_read_session)):
     skill = read_skill(db, skill_id)
     if not skill:
         raise HTTPException(
@@ -136,7 +173,7 @@ def get_user_skill_by_id(current_user: UserDep, skill_id: int, db: Session = Dep
     return skill
 
 @users_and_permissions_router.post("/userskills/", response_model=UserSkill, status_code=status.HTTP_201_CREATED)
-def create_new_user_skill(current_user: UserDep, skill_create: UserSkillCreate, db: Session = Depends(get_session) ):
+def create_new_user_skill(current_user: UserDep, skill_create: UserSkillCreate, db: Session = Depends(get_write_session) ):
     try:
         return create_skill(db=db, skill_create=skill_create)
     except IntegrityError as e:
@@ -146,7 +183,7 @@ def create_new_user_skill(current_user: UserDep, skill_create: UserSkillCreate,
         )
 
 @users_and_permissions_router.put("/userskills/{skill_id}", name="update_existing_user_skill", response_model=UserSkill)
-def update_existing_user_skill(current_user: UserDep, skill_id: int, skill_update: UserSkillUpdate, db: Session = Depends(get_session)):
+def update_existing_user_skill(current_user: UserDep, skill_id: int, skill_update: UserSkillUpdate, db: Session = Depends(get_write_session)):
     db_skill = read_skill(db, skill_id)
     if not db_skill:
         raise HTTPException(
@@ -162,7 +199,7 @@ def update_existing_user_skill(current_user: UserDep, skill_id: int, skill_updat
         )
 
 @users_and_permissions_router.delete("/userskills/{skill_id}", name="delete_user_skill_by_id", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user_skill_by_id(current_user: UserDep, skill_id: int, db: Session = Depends(get_session) ):
+def delete_user_skill_by_id(current_user: UserDep, skill_id: int, db: Session = Depends(get_write_session) ):
     if not delete_skill(db, skill_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -172,16 +209,27 @@ def delete_user_skill_by_id(current_user: UserDep, skill_id: int, db: Session =
 # endregion
 
 # region user operations
-@users_and_permissions_router.get("/users/", name='get_all_users', response_model=list[UserRead])
-def get_all_users(current_user: UserDep, db: Session = Depends(get_session)):
+@users_and_permissions_router.get("/users/", name='get_all_users', response_model=list[UserRead], dependencies=[versioned("user", auth=get_current_superadmin)])
+def get_all_users(current_user: UserDep, page: PageDep, db: Session = Depends(get_read_session)):
     """
     Retrieve all users.
     """
     # raise HTTPException(status_code=404, detail="Item not found")
-    return read_all_users(db)
+    if page:
+        return page_response(*read_users_page(db, page))
+    return list_response(UserRead, user_relationships, read_all_users(db))
+
+@users_and_permissions_router.get("/users/export", name='export_users', dependencies=[versioned("user", auth=get_current_superadmin)])
+def get_users_export(current_user: UserDep, export: ExportDep):
+    chunks = export_users(export.format, export.include, settings.EXPORT_BATCH_SIZE)
+    return export_response("users", export.format, chunks)
+
+@users_and_permissions_router.post("/users/rows", name='get_user_rows', response_model=GridRowsResponse)
+def get_user_rows(current_user: UserDep, rows_request: GridRowsRequest, db: Session = Depends(get_read_session)):
+    return read_users_rows(db, rows_request)
 
-@users_and_permissions_router.get("/users/{username}", response_model=UserRead)
-def get_user_by_username(current_user: UserDep, username: str, db: Session = Depends(get_session)):
+@users_and_permissions_router.get("/users/{username}", response_model=UserRead, dependencies=[versioned("user", auth=get_current_superadmin)])
+def get_user_by_username(current_user: UserDep, username: str, db: Session = Depends(get_read_session)):
     """
     Retrieve a specific user by its username.
     """
@@ -194,7 +242,7 @@ def get_user_by_username(current_user: UserDep, username: str, db: Session = Dep
     return user
 
 @users_and_permissions_router.post("/users/", response_model=UserRead, status_code=status.HTTP_201_CREATED)
-def create_new_user(current_user: UserDep, user_create: UserCreate, db: Session = Depends(get_session)):
+def create_new_user(current_user: UserDep, user_create: UserCreate, db: Session = Depends(get_write_session)):
     """
     Create a new user.
     """
@@ -211,7 +259,7 @@ def update_existing_user(
     current_user: UserDep,
     username: str,
     user_update: UserUpdate,
-    db: Session = Depends(get_session)
+    db: Session = Depends(get_write_session)
 ):
     """
     Update an existing user.
@@ -230,8 +278,27 @@ def update_existing_user(
                 detail=str(e)
             )
 
+@users_and_permissions_router.patch("/users/{username}/members", name='update_user_members_by_username', status_code=status.HTTP_204_NO_CONTENT)
+def update_user_members_by_username(
+    current_user: UserDep,
+    username: str,
+    members: UserMembersUpdate,
+    db: Session = Depends(get_write_session)
+):
+    """
+    Add or remove some of a user's roles, skills, modules and divisions without resending the full lists.
+    """
+    db_user = db.exec(select(User).where(User.username == username)).first()
+    if not db_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    update_user_members(db=db, db_user=db_user, members=members, updated_by=current_user.username)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
 @users_and_permissions_router.delete("/users/{username}", name='delete_user_by_username', status_code=status.HTTP_204_NO_CONTENT)
-def delete_user_by_username(current_user: UserDep, username: str, db: Session = Depends(get_session)):
+def delete_user_by_username(current_user: UserDep, username: str, db: Session = Depends(get_write_session)):
     """
     Delete a user by its username.
     """
@@ -244,8 +311,19 @@ def delete_user_by_username(current_user: UserDep, username: str, db: Session =
 # endregion
 
 # region module operations
-@users_and_permissions_router.get("/modules/", name='get_all_modules', response_model=list[ModuleRead])
-def get_all_modules(current_user: UserDep, db: Session = Depends(get_session)):
-    return read_all_modules(db)
+@users_and_permissions_router.get("/modules/", name='get_all_modules', response_model=list[ModuleRead], dependencies=[versioned("module", auth=get_current_superadmin)])
+def get_all_modules(current_user: UserDep, page: PageDep, db: Session = Depends(get_read_session)):
+    if page:
+        return page_response(*read_modules_page(db, page))
+    return Response(content=read_all_modules_json(db), media_type="application/json")
+
+@users_and_permissions_router.get("/modules/export", name='export_modules', dependencies=[versioned("module", auth=get_current_superadmin)])
+def get_modules_export(current_user: UserDep, export: ExportDep):
+    chunks = export_modules(export.format, export.include, settings.EXPORT_BATCH_SIZE)
+    return export_response("modules", export.format, chunks)
+
+@users_and_permissions_router.post("/modules/rows", name='get_module_rows', response_model=GridRowsResponse)
+def get_module_rows(current_user: UserDep, rows_request: GridRowsRequest, db: Session = Depends(get_read_session)):
+    return read_modules_rows(db, rows_request)
 # endregion
 
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Callable
+
+from app.core.versions import on_tables_changed
+
+logger = logging.getLogger(__name__)
+
+# (changes after `since`, cursor to continue from, whether more are waiting)
+ChangeReader = Callable[[int | None, int], tuple[list[dict], int, bool]]
+
+def merge_change(pending: dict | None, change: dict) -> dict:
+    """
+    Folds `change` into the change of the same row still waiting to be sent,
+    as the change feed compacts log rows: a create or delete replaces what
+    was pending, an update merges its fields and data into it.
+    """
+    if pending is None or change["op"] != "update" or pending["op"] == "delete":
+        return change
+    fields = list(dict.fromkeys(pending["fields"] + change["fields"])) if pending["op"] == "update" else []
+    return {**change, "op": pending["op"], "fields": fields, "data": {**(pending["data"] or {}), **(change["data"] or {})}}
+
+class Subscription:
+    """
+    The changes waiting to be sent on one connection.
+
+    A burst of changes to the same row folds into one. Past `max_pending`
+    rows the queue is dropped and the connection is told to reload instead,
+    so a slow client costs bounded memory and never holds up the fanout.
+    """
+
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        self.pending: dict[tuple[str, int], dict] = {}
+        self.resync = False
+        self.cursor = 0
+        self.ready = asyncio.Event()
+        self.coalesced = 0
+
+    def offer(self, changes: list[dict], cursor: int) -> bool:
+        """Queues `changes`; True when they overflowed the queue and turned it into a resync."""
+        self.cursor = cursor
+        overflowed = False
+        for change in changes:
+            if self.resync:
+                break
+            key = (change["entity"], change["id"])
+            pending = self.pending.pop(key, None)
+            if pending is not None:
+                self.coalesced += 1
+            self.pending[key] = merge_change(pending, change)
+            if len(self.pending) > self.max_pending:
+                self.pending.clear()
+                self.resync = overflowed = True
+        if self.pending or self.resync:
+            self.ready.set()
+        return overflowed
+
+    async def next_message(self, coalesce_seconds: float) -> dict:
+        """Waits for changes, lets a burst gather for `coalesce_seconds`, and takes them all as one message."""
+        await self.ready.wait()
+        if coalesce_seconds:
+            await asyncio.sleep(coalesce_seconds)
+        self.ready.clear()
+        if self.resync:
+            self.resync = False
+            self.pending.clear()
+            return {"type": "resync", "cursor": self.cursor}
+        changes = list(self.pending.values())
+        self.pending = {}
+        return {"type": "changes", "cursor": self.cursor, "changes": changes}
+
+class ChangeBroadcaster:
+    """
+    Pushes the change log to open pages, one channel per module.
+
+    One loop per worker reads the changes logged since its cursor, with the
+    current data, and offers them to every subscription of the channel the
+    entity belongs to. Commits made by this worker wake the loop at once;
+    those of other workers are picked up within `poll_seconds`.
+    """
+
+    def __init__(self):
+        self.channels: dict[str, set[Subscription]] = defaultdict(set)
+        self.cursor: int | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.batches = 0
+        self.changes = 0
+        self.resyncs = 0
+
+    def subscribe(self, channel: str, max_pending: int) -> Subscription:
+        subscription = Subscription(max_pending)
+        subscription.cursor = self.cursor or 0
+        self.channels[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, channel: str, subscription: Subscription) -> None:
+        self.channels[channel].discard(subscription)
+
+    def notify(self, tables: set[str] | None = None) -> None:
+        """Wakes the loop; safe to call from any thread, e.g. an after_commit hook of a sync endpoint."""
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:     # the loop closed meanwhile
+            pass
+
+    def publish(self, changes: list[dict], cursor: int, channel_of: Callable[[str], str]) -> None:
+        by_channel: dict[str, list[dict]] = defaultdict(list)
+        for change in changes:
+            by_channel[channel_of(change["entity"])].append(change)
+        for channel, subscriptions in self.channels.items():
+            channel_changes = by_channel.get(channel, [])
+            for subscription in list(subscriptions):
+                self.resyncs += subscription.offer(channel_changes, cursor)
+        self.changes += len(changes)
+        self.batches += 1
+
+    async def run(self, read_changes: ChangeReader, channel_of: Callable[[str], str], poll_seconds: float, batch_size: int) -> None:
+        """Background loop started by the app lifespan."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            self._wakeup.clear()
+            try:
+                has_more = True
+                while has_more:
+                    # Nobody listening: only move the cursor to the head
+                    since = self.cursor if any(self.channels.values()) else None
+                    changes, self.cursor, has_more = await asyncio.to_thread(read_changes, since, batch_size)
+                    if changes:
+                        self.publish(changes, self.cursor, channel_of)
+            except Exception:
+                logger.exception("Change broadcast failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "connections": {channel: len(subscriptions) for channel, subscriptions in self.channels.items()},
+            "cursor": self.cursor,
+            "batches": self.batches,
+            "changes": self.changes,
+            "resyncs": self.resyncs,
+        }
+
+change_broadcaster = ChangeBroadcaster()
+on_tables_changed(change_broadcaster.notify, direct=True)
@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from app.core.config import settings
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Small thread-safe in-process cache with LRU eviction and a per-entry TTL.
+
+    Sync endpoints run in AnyIO's worker threads, so every access is guarded
+    by a lock. Entries are evicted lazily: expired ones on lookup, the least
+    recently used one when `maxsize` is exceeded.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def discard_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Drop every entry for which `predicate(key, value)` is true. Returns the count."""
+        with self._lock:
+            doomed = [k for k, (_, v) in self._data.items() if predicate(k, v)]
+            for k in doomed:
+                del self._data[k]
+        return len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class TableCache:
+    """
+    Values derived from database tables, tagged with the tables they were read
+    from. `invalidate` drops every entry tagged with one of the given tables;
+    the TTL bounds how long writes made by other processes go unnoticed.
+
+    A value loaded while one of its tables was invalidated is returned but
+    not stored, so a slow read can never re-cache data older than a write.
+    """
+
+    def __init__(self, maxsize: int = 64, ttl: float = 300.0):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: Hashable, tables: frozenset[str], load: Callable[[], Any]) -> Any:
+        entry = self.entries.get(key, _MISSING)
+        if entry is not _MISSING:
+            return entry[1]
+        with self._lock:
+            before = [self._generations.get(table, 0) for table in tables]
+        value = load()
+        with self._lock:
+            if before == [self._generations.get(table, 0) for table in tables]:
+                self.entries.set(key, (tables, value))
+        return value
+
+    def invalidate(self, tables: set[str]) -> None:
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+        self.entries.discard_where(lambda key, entry: not entry[0].isdisjoint(tables))
+
+    def stats(self) -> dict[str, int]:
+        return self.entries.stats()
+
+# Serialized reference lists; app.core.versions invalidates them when a commit touches their tables
+reference_cache = TableCache(maxsize=settings.REFERENCE_CACHE_MAX_SIZE, ttl=settings.REFERENCE_CACHE_TTL_SECONDS)
@@ -0,0 +1,54 @@
+import gzip
+
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:     # optional: without it responses are only gzip-compressed
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+def available_encodings() -> tuple[str, ...]:
+    """Content codings we can produce, best first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+def preferred_encoding(accept_encoding: str | None, encodings: tuple[str, ...] | None = None) -> str | None:
+    """
+    The first of `encodings` (all we can produce by default) that the
+    Accept-Encoding header allows, or None for the identity coding.
+    """
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.lower()] = quality
+    for encoding in available_encodings() if encodings is None else encodings:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+def compress(body: bytes, encoding: str | None) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        # mtime=0 keeps the output identical for identical input, as strong ETags require
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+def encoded_json_response(body: bytes, encoding: str | None) -> Response:
+    """A JSON body already compressed with `encoding` (None for none)."""
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
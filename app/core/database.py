@@ -1,20 +1,144 @@
-from sqlmodel import SQLModel, create_engine, Session, select, text
-from sqlalchemy.exc import IntegrityError
+import hashlib
+import json
+from contextlib import contextmanager
+
+from sqlmodel import SQLModel, create_engine, Session, select, text, insert, update, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import inspect, event, true
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.core.versions import versioned_tables, initial_version
+from app.core.search import search_fingerprint, sync_search_indexes
 from app.models import *
 
-engine = create_engine(settings.DATABASE_URL, echo=False)
+def get_pool_options(database_url: str) -> dict:
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}   # in-memory SQLite uses a single shared connection, not a queue pool
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+engine = create_engine(settings.DATABASE_URL, echo=False, **get_pool_options(settings.DATABASE_URL))
+instrument_engine("write", engine)
+
+# PRAGMAs are per connection, so they are set from the pool's connect event on
+# every new connection rather than once at startup.
+sqlite_profiles = {
+    "development": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,         # ms
+        "cache_size": -16384,         # KiB when negative -> 16 MiB
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "foreign_keys": "ON",
+    },
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 15000,
+        "cache_size": -65536,         # 64 MiB
+        "mmap_size": 268435456,       # 256 MiB
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    },
+}
+
+def get_sqlite_pragmas() -> dict[str, str | int]:
+    profile = settings.SQLITE_PROFILE or ("production" if settings.ENV == "production" else "development")
+    if profile not in sqlite_profiles:
+        raise ValueError(f"Unknown SQLITE_PROFILE '{profile}', expected one of {list(sqlite_profiles)}")
+    return {**sqlite_profiles[profile], **settings.SQLITE_PRAGMAS}
+
+def apply_sqlite_pragmas(dbapi_connection, readonly: bool = False):
+    pragmas = get_sqlite_pragmas()
+    if readonly:
+        # journal_mode is a property of the file and needs write access to change
+        pragmas.pop("journal_mode", None)
+        pragmas["query_only"] = "ON"
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in pragmas.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+    finally:
+        cursor.close()
+
+def register_sqlite_profile(sync_engine, readonly: bool = False):
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(
+            sync_engine, "connect",
+            lambda dbapi_connection, connection_record: apply_sqlite_pragmas(dbapi_connection, readonly),
+        )
+
+register_sqlite_profile(engine)
+
+def get_read_database_url() -> str | None:
+    if settings.READ_DATABASE_URL:
+        return settings.READ_DATABASE_URL
+    url = make_url(settings.DATABASE_URL)
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        return None
+    query = {**url.query, "mode": "ro", "uri": "true"}
+    return url.set(database=f"file:{url.database}", query=query).render_as_string(hide_password=False)
+
+# Separate pool for GET endpoints so reads never queue behind writers for a
+# connection. With WAL, mode=ro readers also never wait on the write lock.
+read_database_url = get_read_database_url()
+if read_database_url:
+    read_engine = create_engine(read_database_url, echo=False, **get_pool_options(read_database_url))
+    register_sqlite_profile(read_engine, readonly=True)
+    instrument_engine("read", read_engine)
+else:
+    read_engine = engine
+
+def get_async_database_url() -> str:
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    url = make_url(settings.DATABASE_URL)
+    if url.get_backend_name() != "sqlite":
+        raise ValueError("ASYNC_DATABASE_URL must be set for non-SQLite databases")
+    return url.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+
+async_engine = create_async_engine(
+    get_async_database_url(), echo=False, **get_pool_options(get_async_database_url())
+)
+register_sqlite_profile(async_engine.sync_engine)
+instrument_engine("async", async_engine.sync_engine)
 
 # Dependency for FastAPI routes
 def get_session():
     with Session(engine) as session:
         yield session
 
+# Routers use these two to route reads and writes to their own pools
+get_write_session = get_session
+
+def get_read_session():
+    with Session(read_engine, autoflush=False) as session:
+        yield session
+
+# Dependency for async routes. Objects stay usable after commit because
+# lazy (re)loads are not possible without a greenlet context.
+async def get_async_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
 # For scripts like create_superadmin.py
 def get_sync_session():
     return Session(engine)
 
+# Streaming responses outlive their endpoint's dependencies, so they open their own
+def open_read_session():
+    return Session(read_engine, autoflush=False)
+
 """
 HOW TO ADD MODULES:
 linkname is the name of the path operation of the index page of the module.
@@ -23,78 +147,150 @@ for each module we might have a crud function module under app\\crud directory.
 All models are in the mnodels directory
 
 """
+initial_modules = [
+    {
+        "title": "Users & Permissions",
+        "description": "Management of user credentials",
+        "linkname": "users_and_permissions_index",
+        "image_url": "/static/images/users_and_permissions.png"
+    },
+    {
+        "title": "M&P Common Definitions",
+        "description": "General Information Catalogue of MP Department",
+        "linkname": "mp_common_definitions_index",
+        "image_url": "/static/images/mp_common_definitions.png"
+    },
+    {
+        "title": "Design Test Catalogue",
+        "description": "Published RFT Test Results Database",
+        "linkname": "design_test_catalogue_index",
+        "image_url": "/static/images/design_test_catalogue.png"
+    },
+    {
+        "title": "Lab Quality Control",
+        "description": "Quality Control Database of Labs",
+        "linkname": "lab_quality_control_index",
+        "image_url": "/static/images/lab_quality_control.png"
+    },
+
+]
+
+# create_all never alters existing tables, so columns added after the first
+# release are added here: (table, column, DDL type)
+added_columns = [
+    ("user", "authz_version", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+def schema_fingerprint() -> str:
+    """Hash of everything init_db applies. Any model, column or seed change alters it."""
+    parts = []
+    for table in SQLModel.metadata.sorted_tables:
+        parts.append(table.name)
+        parts.extend(f"{c.name}:{c.type}:{c.nullable}:{c.primary_key}" for c in table.columns)
+        parts.extend(sorted(index.name for index in table.indexes))
+    parts.append(json.dumps(added_columns))
+    parts.append(json.dumps(initial_modules, sort_keys=True))
+    parts.append(json.dumps(versioned_tables))
+    parts.append(search_fingerprint())
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+def applied_fingerprint(connection) -> str | None:
+    if not inspect(connection).has_table(SchemaState.__tablename__):
+        return None
+    return connection.execute(
+        select(SchemaState.fingerprint).where(SchemaState.name == "init_db")
+    ).scalar()
+
+@contextmanager
+def migration_lock():
+    """
+    Yield a connection inside a transaction that only one process can hold.
+
+    On SQLite, BEGIN IMMEDIATE takes the database write lock, so concurrent
+    workers wait (up to busy_timeout) until the first one has committed.
+    """
+    if engine.dialect.name != "sqlite":
+        with engine.begin() as connection:
+            yield connection
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.exec_driver_sql("ROLLBACK")
+            raise
+        connection.exec_driver_sql("COMMIT")
+
+def add_missing_columns(connection):
+    inspector = inspect(connection)
+    for table, column, ddl in added_columns:
+        existing = {c["name"] for c in inspector.get_columns(table)}
+        if column not in existing:
+            connection.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl}'))
+
+def sync_modules(connection):
+    existing = {
+        row.linkname: row
+        for row in connection.execute(
+            select(Module.id, Module.linkname, Module.title, Module.description, Module.image_url)
+        )
+    }
+    fields_to_chk = ("title", "description", "image_url")
+    for data in initial_modules:
+        row = existing.get(data["linkname"])
+        if row is None:
+            connection.execute(insert(Module).values(**data))
+        elif any(getattr(row, f) != data[f] for f in fields_to_chk):
+            connection.execute(
+                update(Module).where(Module.id == row.id).values({f: data[f] for f in fields_to_chk})
+            )
+
+    # Super-admins own every module: one INSERT ... SELECT for all missing links
+    already_linked = (
+        select(UserModuleLink.user_id)
+        .where(UserModuleLink.user_id == User.id, UserModuleLink.module_id == Module.id)
+        .exists()
+    )
+    connection.execute(
+        insert(UserModuleLink).from_select(
+            ["user_id", "module_id"],
+            select(User.id, Module.id)
+            .join(Module, true())
+            .where(User.usertype == UserType.superadmin, ~already_linked),
+        )
+    )
+
+def sync_table_versions(connection) -> None:
+    """Create the missing version rows and bump the others: a migration may change any read output."""
+    existing = set(connection.execute(select(TableVersion.name)).scalars())
+    connection.execute(update(TableVersion).values(version=TableVersion.version + 1))
+    missing = [name for name in versioned_tables if name not in existing]
+    if missing:
+        version = initial_version()
+        connection.execute(insert(TableVersion), [{"name": name, "version": version} for name in missing])
+
 def init_db():
-    SQLModel.metadata.create_all(engine)
+    """
+    Bring the schema and seed data up to date, once.
+
+    Every worker calls this on startup. If the stored fingerprint matches the
+    code, it returns after a single read. Otherwise the first worker to take
+    the migration lock applies the changes and records the fingerprint, and
+    the others find it up to date once they get the lock.
+    """
+    fingerprint = schema_fingerprint()
     with engine.connect() as connection:
-        connection.execute(text("PRAGMA foreign_keys=ON"))  # for SQLite only
-    initial_modules = [
-        {
-            "title": "Users & Permissions",
-            "description": "Management of user credentials",
-            "linkname": "users_and_permissions_index",
-            "image_url": "/static/images/users_and_permissions.png"
-        },
-        {
-            "title": "M&P Common Definitions",
-            "description": "General Information Catalogue of MP Department",
-            "linkname": "mp_common_definitions_index",
-            "image_url": "/static/images/mp_common_definitions.png"
-        },
-        {
-            "title": "Design Test Catalogue",
-            "description": "Published RFT Test Results Database",
-            "linkname": "design_test_catalogue_index",
-            "image_url": "/static/images/design_test_catalogue.png"
-        },
-        {
-            "title": "Lab Quality Control",
-            "description": "Quality Control Database of Labs",
-            "linkname": "lab_quality_control_index",
-            "image_url": "/static/images/lab_quality_control.png"
-        },
-
-    ]
- 
-    with Session(engine) as session:
-        existing_modules = session.exec(select(Module)).all()
-        by_linkname      = {m.linkname: m for m in existing_modules}
-
-        new_or_updated   = False
-        for data in initial_modules:
-            link = data["linkname"]
-
-            if link not in by_linkname:
-                # ‼️ Brand‑new module → insert
-                session.add(Module(**data))
-                new_or_updated = True
-            else:
-                # Optional “up‑sert”: keep row but sync title / description / image
-                row           = by_linkname[link]
-                fields_to_chk = ("title", "description", "image_url")
-                if any(getattr(row, f) != data[f] for f in fields_to_chk):
-                    for f in fields_to_chk:
-                        setattr(row, f, data[f])
-                    new_or_updated = True
-
-        if new_or_updated:
-            session.commit()    # commit only if something changed
-            for module in session.exec(select(Module)).all():
-                session.refresh(module)  # ensures the session knows fresh PKs
-
-        all_modules  = session.exec(select(Module)).all()
-        superadmins  = session.exec(
-            select(User).where(User.usertype == UserType.superadmin)
-        ).all()
-
-        for user in superadmins:
-            owned = {m.id for m in user.modules}
-            for mod in all_modules:
-                if mod.id not in owned:
-                    user.modules.append(mod)   # creates the link row
-                    new_or_updated = True
-
-        if new_or_updated:
-            try:
-                session.commit()
-            except IntegrityError:
-                session.rollback()
+        if applied_fingerprint(connection) == fingerprint:
+            return
+
+    with migration_lock() as connection:
+        if applied_fingerprint(connection) == fingerprint:
+            return
+        SQLModel.metadata.create_all(connection)
+        add_missing_columns(connection)
+        sync_modules(connection)
+        sync_table_versions(connection)
+        sync_search_indexes(connection)
+        connection.execute(delete(SchemaState).where(SchemaState.name == "init_db"))
+        connection.execute(insert(SchemaState).values(name="init_db", fingerprint=fingerprint))
@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+def _summary(samples) -> dict[str, float]:
+    if not samples:
+        return {"count": 0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    ordered = sorted(samples)
+    pick = lambda pct: ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+    return {
+        "count": len(ordered),
+        "p50_ms": round(pick(50) * 1000, 3),
+        "p99_ms": round(pick(99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+class PoolMetrics:
+    """
+    Connection pool counters for one engine: how long checkouts wait for a
+    connection, how long they hold it, how often they time out, and how long
+    connections live. Percentiles are over the most recent `window` samples.
+
+    Everything but the checkout wait comes from public pool events. SQLAlchemy
+    has no event for a checkout that starts waiting, so the wait is timed by
+    replacing `connect` on the engine's pool instance with a timing wrapper.
+    That wrapper is put on again on every new pool `dispose()` creates.
+    """
+
+    def __init__(self, name: str, engine: Engine, window: int = 1024):
+        self.name = name
+        self.engine = engine
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.closes = 0
+        self.wait_times = deque(maxlen=window)
+        self.hold_times = deque(maxlen=window)
+        self.lifetimes = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+        self._time_checkouts(engine.pool)
+        # dispose() swaps in a new pool; pool events carry over, the timer must be set again
+        event.listen(engine, "engine_disposed", lambda engine: self._time_checkouts(engine.pool))
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "close", self._on_close)
+
+    def _time_checkouts(self, pool) -> None:
+        # Wraps Pool.connect() on this pool instance: Engine.raw_connection()
+        # checks every connection out through it, and no event fires before.
+        connect = pool.connect
+        def timed_connect():
+            start = time.perf_counter()
+            try:
+                return connect()
+            except PoolTimeoutError:
+                with self._lock:
+                    self.timeouts += 1
+                raise
+            finally:
+                with self._lock:
+                    self.wait_times.append(time.perf_counter() - start)
+        pool.connect = timed_connect
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        connection_record.info["connected_at"] = time.monotonic()
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.monotonic()
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            with self._lock:
+                self.hold_times.append(time.monotonic() - checked_out_at)
+
+    def _on_close(self, dbapi_connection, connection_record):
+        connected_at = connection_record.info.pop("connected_at", None)
+        with self._lock:
+            self.closes += 1
+            if connected_at is not None:
+                self.lifetimes.append(time.monotonic() - connected_at)
+
+    def stats(self) -> dict:
+        pool = self.engine.pool
+        with self._lock:
+            stats = {
+                "pool": type(pool).__name__,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "closes": self.closes,
+                "checkout_wait": _summary(self.wait_times),
+                "hold_time": _summary(self.hold_times),
+                "connection_lifetime": _summary(self.lifetimes),
+            }
+        # Only queue pools know their size and overflow
+        for attr in ("size", "checkedin", "checkedout", "overflow"):
+            if hasattr(pool, attr):
+                stats[attr] = getattr(pool, attr)()
+        return stats
+
+pool_metrics: dict[str, PoolMetrics] = {}
+
+def instrument_engine(name: str, engine: Engine) -> PoolMetrics:
+    if name not in pool_metrics:
+        pool_metrics[name] = PoolMetrics(name, engine)
+    return pool_metrics[name]
+
+def get_pool_stats() -> dict[str, dict]:
+    return {name: metrics.stats() for name, metrics in pool_metrics.items()}
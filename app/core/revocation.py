@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import threading
+import time
+
+from sqlmodel import Session, select, delete
+from sqlalchemy.exc import IntegrityError
+
+from app.core.database import get_sync_session
+from app.models import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+class TokenDenylist:
+    """
+    Revoked token ids (`jti`), persisted in the RevokedToken table and mirrored
+    in memory so a request can be checked without a query.
+
+    Every worker keeps its own mirror. It learns about revocations made by
+    other workers through `refresh()`, which only reads rows newer than the
+    last one it has seen. `sweep()` forgets tokens whose `exp` has passed,
+    since jwt.decode rejects those anyway.
+    """
+
+    def __init__(self):
+        self._expiry: dict[str, int] = {}
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, jti: str) -> bool:
+        return jti in self._expiry
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def revoke(self, jti: str, username: str, expires_at: int) -> None:
+        with self._lock:
+            self._expiry[jti] = expires_at
+        with get_sync_session() as db:
+            db.add(RevokedToken(jti=jti, username=username, expires_at=expires_at))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()   # already revoked
+
+    def refresh(self, db: Session) -> int:
+        """Pull revocations recorded since the last refresh. Returns how many were new."""
+        now = int(time.time())
+        rows = db.exec(
+            select(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at)
+            .where(RevokedToken.id > self._last_id)
+            .order_by(RevokedToken.id)
+        ).all()
+        with self._lock:
+            for row_id, jti, expires_at in rows:
+                if expires_at > now:
+                    self._expiry[jti] = expires_at
+                self._last_id = max(self._last_id, row_id)
+        return len(rows)
+
+    def sweep(self, db: Session) -> int:
+        """Drop expired entries from memory and from the table. Returns how many left memory."""
+        now = int(time.time())
+        with self._lock:
+            expired = [jti for jti, expires_at in self._expiry.items() if expires_at <= now]
+            for jti in expired:
+                del self._expiry[jti]
+        if expired:
+            db.exec(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+            db.commit()
+        return len(expired)
+
+    def maintain(self) -> None:
+        with get_sync_session() as db:
+            self.refresh(db)
+            self.sweep(db)
+
+token_denylist = TokenDenylist()
+
+async def run_denylist_maintenance(interval: float) -> None:
+    """Background loop started by the app lifespan: refresh and sweep every `interval` seconds."""
+    while True:
+        try:
+            await asyncio.to_thread(token_denylist.maintain)
+        except Exception:
+            logger.exception("Token denylist maintenance failed")
+        await asyncio.sleep(interval)
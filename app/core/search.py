@@ -0,0 +1,85 @@
+import hashlib
+import json
+
+from sqlalchemy import delete, insert, inspect, select, text
+
+from app.models import SchemaState
+
+# FTS5 index per searchable table: (table, indexed columns). Each index is an
+# external-content table over its base table, so it stores only the index,
+# and triggers keep it in step with every write, CRUD or bulk.
+search_indexes = {
+    "location": ("code", "name", "description", "address"),
+    "warehouse": ("code", "name", "description"),
+    "laboratory": ("code", "name", "description"),
+    "division": ("code", "name", "description"),
+    "user": ("username", "name", "surname", "email"),
+}
+
+# Bump when the DDL below changes; init_db then recreates the indexes
+SEARCH_SCHEMA_VERSION = 1
+
+def search_fingerprint() -> str:
+    spec = json.dumps([SEARCH_SCHEMA_VERSION, search_indexes], sort_keys=True)
+    return hashlib.sha256(spec.encode()).hexdigest()
+
+def fts_table(table: str) -> str:
+    return f"{table}_fts"
+
+def _values(columns: tuple[str, ...], prefix: str) -> str:
+    return ", ".join(f"{prefix}.{column}" for column in columns)
+
+def search_index_ddl(table: str) -> list[str]:
+    columns = search_indexes[table]
+    fts = fts_table(table)
+    names = ", ".join(columns)
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f'CREATE TRIGGER {fts}_ai AFTER INSERT ON "{table}" BEGIN '
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {_values(columns, 'new')}); END",
+        f'CREATE TRIGGER {fts}_ad AFTER DELETE ON "{table}" BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {_values(columns, 'old')}); END",
+        # Only when an indexed column changes, not on every authz_version bump
+        f'CREATE TRIGGER {fts}_au AFTER UPDATE OF {names} ON "{table}" BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {_values(columns, 'old')}); "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {_values(columns, 'new')}); END",
+    ]
+
+def drop_search_index(connection, table: str) -> None:
+    fts = fts_table(table)
+    for trigger in ("ai", "ad", "au"):
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {fts}_{trigger}"))
+    connection.execute(text(f"DROP TABLE IF EXISTS {fts}"))
+
+def rebuild_search_index(connection, table: str) -> None:
+    """Re-read every row of `table` into its index."""
+    fts = fts_table(table)
+    connection.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+def sync_search_indexes(connection, recreate: bool = False) -> None:
+    """
+    Create the missing FTS5 indexes and their triggers and fill them from the
+    existing rows. Every index is dropped and built again with `recreate`,
+    or when the index definitions changed since they were last built.
+    SQLite only; other databases have no FTS5 and get no search index.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    fingerprint = search_fingerprint()
+    applied = connection.execute(
+        select(SchemaState.fingerprint).where(SchemaState.name == "search_index")
+    ).scalar()
+    recreate = recreate or (applied is not None and applied != fingerprint)
+    existing = set(inspect(connection).get_table_names())
+    for table in search_indexes:
+        if recreate:
+            drop_search_index(connection, table)
+        elif fts_table(table) in existing:
+            continue
+        for statement in search_index_ddl(table):
+            connection.execute(text(statement))
+        rebuild_search_index(connection, table)
+    if applied != fingerprint:
+        connection.execute(delete(SchemaState).where(SchemaState.name == "search_index"))
+        connection.execute(insert(SchemaState).values(name="search_index", fingerprint=fingerprint))
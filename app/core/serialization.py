@@ -0,0 +1,78 @@
+import json
+from typing import Any, Iterable
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:     # optional: the "orjson" engine falls back to "pydantic" without it
+    orjson = None
+
+def dumps(content: Any) -> bytes:
+    """Compact JSON with orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode()
+
+class FastJSONResponse(JSONResponse):
+    """JSON response that sends pre-serialized bytes as they are and encodes anything else with orjson when available."""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+class ListSerializer:
+    """
+    Precompiled JSON serializers for a list of ORM objects shaped by `read_model`.
+
+    `validated_json` runs the objects through a TypeAdapter built once, then
+    dumps straight to bytes in pydantic-core. `direct_json` skips validation:
+    it reads the read model's fields off the ORM objects (and the short read
+    models' fields off their relationships) and dumps the dicts with orjson.
+    Rows coming out of our own tables need no re-validation.
+    """
+
+    def __init__(self, read_model: type[BaseModel], relationships: dict[str, type[BaseModel]]):
+        self.adapter = TypeAdapter(list[read_model])
+        self.fields = [name for name in read_model.model_fields if name not in relationships]
+        self.nested = {name: list(short_model.model_fields) for name, short_model in relationships.items()}
+
+    def validated_json(self, objects: Iterable) -> bytes:
+        return self.adapter.dump_json(self.adapter.validate_python(objects, from_attributes=True))
+
+    def _row(self, obj) -> dict:
+        row = {name: getattr(obj, name) for name in self.fields}
+        for name, fields in self.nested.items():
+            row[name] = [{field: getattr(related, field) for field in fields} for related in getattr(obj, name)]
+        return row
+
+    def direct_json(self, objects: Iterable) -> bytes:
+        return orjson.dumps([self._row(obj) for obj in objects])
+
+    def dump_json(self, objects: Iterable) -> bytes:
+        if settings.JSON_SERIALIZER == "orjson" and orjson is not None:
+            return self.direct_json(objects)
+        return self.validated_json(objects)
+
+_serializers: dict[type[BaseModel], ListSerializer] = {}
+
+def get_list_serializer(read_model: type[BaseModel], relationships: dict[str, type[BaseModel]]) -> ListSerializer:
+    serializer = _serializers.get(read_model)
+    if serializer is None:
+        serializer = _serializers[read_model] = ListSerializer(read_model, relationships)
+    return serializer
+
+def list_response(read_model: type[BaseModel], relationships: dict[str, type[BaseModel]], objects: list):
+    """
+    Returns `objects` untouched for FastAPI's response_model path, or, when
+    JSON_SERIALIZER opts into a fast engine, a FastJSONResponse with the list
+    already serialized.
+    """
+    if settings.JSON_SERIALIZER == "fastapi":
+        return objects
+    return FastJSONResponse(get_list_serializer(read_model, relationships).dump_json(objects))
@@ -0,0 +1,193 @@
+import fnmatch
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+from pathlib import Path
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.routing import Mount
+from starlette.staticfiles import StaticFiles
+
+from app.core.compression import brotli, preferred_encoding
+
+MANIFEST_NAME = "manifest.json"
+IMMUTABLE = "public, max-age=31536000, immutable"
+# File suffix of the precompressed sibling for each content coding
+EXTENSIONS = {"br": "br", "gzip": "gz"}
+
+# Uploaded profile images keep their own unique names and are never fingerprinted
+BUILD_EXCLUDE = ("images/*_profile_image_*",)
+
+# Formats that shrink when compressed; images and woff/woff2 fonts already are
+COMPRESSIBLE = {".js", ".css", ".map", ".json", ".svg", ".html", ".txt", ".xml", ".ico", ".otf", ".ttf", ".eot"}
+# A precompressed sibling is only kept when it saves at least this much
+MIN_SAVING = 0.1
+
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+_JS_IMPORT = re.compile(r"""((?:\bfrom|\bimport)\s*\(?\s*)(['"])(\.\.?/[^'"]+)\2""")
+
+def build_static(source: Path, target: Path, clean: bool = False) -> dict[str, dict]:
+    """
+    Copies every file of `source` to `target` under a content-hashed name
+    (css/style.css -> css/style.<hash>.css), writes .br (when brotli is
+    installed) and .gz siblings for compressible files, and records the
+    mapping in `target`/manifest.json.
+
+    Relative CSS url(...) references and JS module imports are rewritten to
+    the hashed names first, so a changed font or module changes the hash of
+    every file that refers to it. Hashed files of earlier builds are kept
+    unless `clean` is set, so pages rendered before a redeploy still load.
+    """
+    if clean and target.exists():
+        shutil.rmtree(target)
+    files = {
+        path.relative_to(source).as_posix()
+        for path in source.rglob("*")
+        if path.is_file()
+    }
+    files = {name for name in files if not any(fnmatch.fnmatch(name, pattern) for pattern in BUILD_EXCLUDE)}
+    manifest: dict[str, dict] = {}
+
+    def fingerprint(name: str, pending: frozenset[str]) -> str:
+        if name in manifest:
+            return manifest[name]["path"]
+        data = (source / name).read_bytes()
+        suffix = posixpath.splitext(name)[1].lower()
+        if suffix in (".css", ".js"):
+            inner = pending | {name}
+            data = _rewrite_references(name, data, suffix, files, lambda reference: fingerprint(reference, inner), inner)
+        stem, ext = posixpath.splitext(name)
+        hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+        destination = target / hashed
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        destination.write_bytes(data)
+        encodings = []
+        if suffix in COMPRESSIBLE:
+            candidates = {"gzip": lambda: gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                candidates = {"br": lambda: brotli.compress(data, quality=11), **candidates}
+            for encoding, compress in candidates.items():
+                compressed = compress()
+                if len(compressed) <= len(data) * (1 - MIN_SAVING):
+                    Path(f"{destination}.{EXTENSIONS[encoding]}").write_bytes(compressed)
+                    encodings.append(encoding)
+        manifest[name] = {"path": hashed, "encodings": encodings}
+        return hashed
+
+    for name in sorted(files):
+        fingerprint(name, frozenset())
+    target.mkdir(parents=True, exist_ok=True)
+    (target / MANIFEST_NAME).write_text(json.dumps(manifest, indent=1, sort_keys=True))
+    return manifest
+
+def _split_reference(reference: str) -> tuple[str, str, str]:
+    """'font.woff2?v=4#iefix' -> ('font.woff2', '?', 'v=4#iefix')"""
+    match = re.search(r"[?#]", reference)
+    if match is None:
+        return reference, "", ""
+    return reference[:match.start()], match.group(), reference[match.end():]
+
+def _rewrite_references(name: str, data: bytes, suffix: str, files: set[str], fingerprint, pending: frozenset[str]) -> bytes:
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data
+    directory = posixpath.dirname(name)
+
+    def hashed_reference(reference: str) -> str | None:
+        path, sep, rest = _split_reference(reference)
+        if not path or "://" in path or path.startswith(("/", "data:")):
+            return None
+        target = posixpath.normpath(posixpath.join(directory, path))
+        # Import cycles keep their plain names; those files are still served, just not immutable
+        if target not in files or target in pending:
+            return None
+        relative = posixpath.relpath(fingerprint(target), directory or ".")
+        if suffix == ".js" and not relative.startswith("."):
+            relative = "./" + relative
+        return relative + sep + rest
+
+    if suffix == ".css":
+        def css(match):
+            hashed = hashed_reference(match.group(2).strip())
+            return match.group(0) if hashed is None else f"url({match.group(1)}{hashed}{match.group(1)})"
+        text = _CSS_URL.sub(css, text)
+    else:
+        def js(match):
+            hashed = hashed_reference(match.group(3))
+            return match.group(0) if hashed is None else f"{match.group(1)}{match.group(2)}{hashed}{match.group(2)}"
+        text = _JS_IMPORT.sub(js, text)
+    return text.encode("utf-8")
+
+class SendfileResponse(FileResponse):
+    """
+    FileResponse that lets the server send the file itself, with sendfile,
+    when it offers the ASGI pathsend extension. Other servers, HEAD and
+    Range requests get FileResponse's chunked reads.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        if (
+            "http.response.pathsend" not in scope.get("extensions", {})
+            or scope["method"] == "HEAD"
+            or Headers(scope=scope).get("range")
+        ):
+            await super().__call__(scope, receive, send)
+            return
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+
+class FingerprintedStaticFiles(StaticFiles):
+    """
+    StaticFiles that also serves the output of `build_static`.
+
+    Hashed names from the manifest are answered from the build directory with
+    `Cache-Control: immutable` and, when the client accepts it, the .br or
+    .gz sibling, through SendfileResponse. Any other path (unbuilt files,
+    uploaded images, a missing build) is served from `directory` as before.
+    """
+
+    def __init__(self, *, directory: str, build_directory: str, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.build_directory = build_directory
+        self.manifest: dict[str, dict] = {}
+        manifest_path = os.path.join(build_directory, MANIFEST_NAME)
+        if os.path.isfile(manifest_path):
+            with open(manifest_path) as manifest_file:
+                self.manifest = json.load(manifest_file)
+        self.hashed = {entry["path"]: entry for entry in self.manifest.values()}
+
+    def hashed_path(self, path: str) -> str:
+        """The fingerprinted name of `path`, or `path` itself when it was not built."""
+        entry = self.manifest.get(path.lstrip("/"))
+        return entry["path"] if entry else path
+
+    async def get_response(self, path: str, scope) -> Response:
+        entry = self.hashed.get(path.replace(os.sep, "/"))
+        if entry is None or scope["method"] not in ("GET", "HEAD"):
+            return await super().get_response(path, scope)
+        full_path = os.path.join(self.build_directory, path)
+        headers = {"Cache-Control": IMMUTABLE, "Vary": "Accept-Encoding"}
+        encoding = preferred_encoding(Headers(scope=scope).get("accept-encoding"), tuple(entry["encodings"]))
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+            full_path = f"{full_path}.{EXTENSIONS[encoding]}"
+        if not os.path.isfile(full_path):
+            return await super().get_response(path, scope)
+        # The type of the original name, not of the .br/.gz sibling
+        media_type = mimetypes.guess_type(path)[0] or "text/plain"
+        return SendfileResponse(full_path, headers=headers, media_type=media_type, stat_result=os.stat(full_path))
+
+class StaticMount(Mount):
+    """Mount whose `url_for(name, path=...)` resolves to the fingerprinted name of the file."""
+
+    def url_path_for(self, name: str, /, **path_params):
+        if name == self.name and "path" in path_params and isinstance(self.app, FingerprintedStaticFiles):
+            path_params["path"] = self.app.hashed_path(path_params["path"])
+        return super().url_path_for(name, **path_params)
@@ -0,0 +1,136 @@
+import codecs
+import csv
+import io
+import json
+import tempfile
+from datetime import date, datetime
+from enum import Enum
+from typing import IO, AsyncIterator, Iterable
+
+from fastapi import HTTPException, Request, status
+
+from app.core.config import settings
+
+CSV_TYPES = {"text/csv", "application/csv"}
+NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines"}
+
+def body_format(request: Request) -> str:
+    """"csv" or "ndjson", from the request's Content-Type."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in CSV_TYPES:
+        return "csv"
+    if content_type in NDJSON_TYPES:
+        return "ndjson"
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail="Send the rows as text/csv or application/x-ndjson",
+    )
+
+async def spool_body(request: Request) -> IO[bytes]:
+    """
+    The whole request body in a temporary file, kept in memory up to
+    BULK_IMPORT_SPOOL_MEMORY_BYTES. Imports read their rows from it, so the
+    write transaction never waits on a slow upload.
+    """
+    body = tempfile.SpooledTemporaryFile(max_size=settings.BULK_IMPORT_SPOOL_MEMORY_BYTES)
+    async for data in request.stream():
+        body.write(data)
+    body.seek(0)
+    return body
+
+def iter_blocks(file: IO[bytes], size: int = 64 * 1024) -> Iterable[bytes]:
+    while data := file.read(size):
+        yield data
+
+def iter_lines(blocks: Iterable[bytes]) -> Iterable[str]:
+    """Decodes `blocks` as UTF-8 and yields them line by line."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    for data in blocks:
+        pending += decoder.decode(data)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+def parse_records(fmt: str, lines: Iterable[str]) -> Iterable[tuple[int, dict | str]]:
+    """(row number, record or error message) for every row of CSV or NDJSON `lines`."""
+    number = 0
+    if fmt == "ndjson":
+        for line in lines:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield number, f"Invalid JSON: {exc.msg}"
+                continue
+            yield number, record if isinstance(record, dict) else "Each line must be a JSON object"
+        return
+
+    header = None
+    buffered = ""
+    for line in lines:
+        # A quoted cell may contain newlines: a record is complete once its quotes are balanced
+        buffered += line
+        if buffered.count('"') % 2:
+            continue
+        text, buffered = buffered, ""
+        if not text.strip():
+            continue
+        cells = next(csv.reader([text]))
+        if header is None:
+            header = [cell.strip() for cell in cells]
+            continue
+        number += 1
+        if len(cells) != len(header):
+            yield number, f"Expected {len(header)} columns, got {len(cells)}"
+            continue
+        yield number, {key: value for key, value in zip(header, cells) if value != ""}
+    if buffered.strip():
+        yield number + 1, "Unterminated quoted value"
+
+async def iter_records(request: Request) -> AsyncIterator[tuple[int, dict | str]]:
+    """
+    Yields (row number, record) for every row of a CSV or NDJSON body.
+
+    A record that cannot be parsed is yielded as the error message instead,
+    so the caller can report it and carry on. CSV cells of list fields hold
+    codes separated by ";". The body is received in full before the first
+    record is yielded.
+    """
+    fmt = body_format(request)
+    with await spool_body(request) as body:
+        for record in parse_records(fmt, iter_lines(iter_blocks(body))):
+            yield record
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)
+
+def _csv_cell(value):
+    if isinstance(value, list):
+        return ";".join(map(str, value))
+    if isinstance(value, (datetime, date, Enum)):
+        return _json_default(value)
+    return value
+
+def ndjson_chunk(rows: Iterable[dict]) -> str:
+    """One JSON object per line."""
+    return "".join(json.dumps(row, default=_json_default) + "\n" for row in rows)
+
+def csv_chunk(rows: Iterable[dict], fieldnames: list[str], header: bool = False) -> str:
+    """CSV lines for `rows`; list cells are joined with ";" the way bulk imports expect them."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore", lineterminator="\n")
+    if header:
+        writer.writeheader()
+    for row in rows:
+        writer.writerow({key: _csv_cell(value) for key, value in row.items()})
+    return buffer.getvalue()
@@ -0,0 +1,165 @@
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from app.core.cache import TTLCache
+
+@dataclass
+class BucketState:
+    tokens: float
+    updated_at: float
+    failures: int = 0
+    blocked_until: float = 0.0
+
+# An update receives the current state (or None) and the current time and
+# returns (new state, how long the state must be kept, result for the caller).
+BucketUpdate = Callable[[BucketState | None, float], tuple[BucketState, float, float]]
+
+class MemoryThrottleStore:
+    """Per-process bucket store. A bucket that would be full again when it expires is simply forgotten."""
+
+    def __init__(self, maxsize: int = 100_000):
+        self._buckets = TTLCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def update(self, key: str, fn: BucketUpdate) -> float:
+        now = time.time()
+        with self._lock:
+            state, keep_for, result = fn(self._buckets.get(key), now)
+            self._buckets.set(key, state, ttl=keep_for)
+        return result
+
+class SQLiteThrottleStore:
+    """
+    Bucket store shared by every worker through a small SQLite file, for
+    gunicorn deployments where each worker would otherwise throttle alone.
+    Each update is one short IMMEDIATE transaction.
+    """
+
+    def __init__(self, path: str, prune_probability: float = 1 / 256):
+        self.path = path
+        self.prune_probability = prune_probability
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS login_throttle ("
+                " key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL,"
+                " failures INTEGER NOT NULL, blocked_until REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def update(self, key: str, fn: BucketUpdate) -> float:
+        connection = self._connect()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT tokens, updated_at, failures, blocked_until FROM login_throttle"
+                " WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+            state, keep_for, result = fn(BucketState(*row) if row else None, now)
+            connection.execute(
+                "INSERT OR REPLACE INTO login_throttle VALUES (?, ?, ?, ?, ?, ?)",
+                (key, state.tokens, state.updated_at, state.failures, state.blocked_until, now + keep_for),
+            )
+            if random.random() < self.prune_probability:
+                connection.execute("DELETE FROM login_throttle WHERE expires_at <= ?", (now,))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return result
+
+class LoginThrottle:
+    """
+    Token buckets in front of password verification, one per key (a username
+    or a client IP). Every attempt costs a token; buckets refill at
+    `per_minute`. After `free_failures` consecutive failures a key is also
+    blocked for an exponentially growing period, capped at `max_backoff`
+    seconds. Counters are per process, even with a shared store.
+    """
+
+    def __init__(self, store, burst: int, per_minute: float, free_failures: int, max_backoff: float):
+        self.store = store
+        self.burst = burst
+        self.rate = per_minute / 60
+        self.free_failures = free_failures
+        self.max_backoff = max_backoff
+        self.allowed = 0
+        self.throttled = 0
+        self.failures = 0
+        self.successes = 0
+        self._counter_lock = threading.Lock()
+
+    def _refill(self, state: BucketState | None, now: float) -> BucketState:
+        if state is None:
+            return BucketState(tokens=self.burst, updated_at=now)
+        state.tokens = min(self.burst, state.tokens + (now - state.updated_at) * self.rate)
+        state.updated_at = now
+        return state
+
+    def _keep_for(self, state: BucketState, now: float) -> float:
+        # Until the bucket is full and unblocked again; after that it equals a fresh one.
+        return max(state.blocked_until - now, (self.burst - state.tokens) / self.rate, 0) + 1
+
+    def _count(self, counter: str) -> None:
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def acquire(self, key: str) -> float:
+        """Take one attempt from `key`. Returns 0 if allowed, else seconds to wait."""
+        def take(state, now):
+            state = self._refill(state, now)
+            if state.blocked_until > now:
+                retry_after = state.blocked_until - now
+            elif state.tokens < 1:
+                retry_after = (1 - state.tokens) / self.rate
+            else:
+                state.tokens -= 1
+                retry_after = 0.0
+            return state, self._keep_for(state, now), retry_after
+
+        retry_after = self.store.update(key, take)
+        self._count("throttled" if retry_after else "allowed")
+        return retry_after
+
+    def record_failure(self, key: str) -> None:
+        def fail(state, now):
+            state = self._refill(state, now)
+            state.failures += 1
+            if state.failures > self.free_failures:
+                backoff = min(2 ** (state.failures - self.free_failures), self.max_backoff)
+                state.blocked_until = now + backoff
+            return state, self._keep_for(state, now), 0.0
+
+        self.store.update(key, fail)
+        self._count("failures")
+
+    def record_success(self, key: str) -> None:
+        def reset(state, now):
+            state = self._refill(state, now)
+            state.failures = 0
+            state.blocked_until = 0.0
+            return state, self._keep_for(state, now), 0.0
+
+        self.store.update(key, reset)
+        self._count("successes")
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "allowed": self.allowed,
+            "throttled": self.throttled,
+            "failures": self.failures,
+            "successes": self.successes,
+        }
@@ -0,0 +1,83 @@
+import hashlib
+import time
+from typing import Callable
+
+from sqlalchemy import event
+from sqlmodel import Session, select, update
+
+from app.core.cache import reference_cache
+from app.models import TableVersion
+
+# Read models embed short versions of related rows, so a write to a table
+# also changes the output of the tables listed here for it.
+dependent_tables: dict[str, set[str]] = {
+    "location": {"warehouse"},
+    "warehouse": {"location", "division"},
+    "laboratory": {"division"},
+    "division": {"warehouse", "laboratory", "user"},
+    "user": {"userrole", "userskill", "module", "division"},
+    "userrole": {"user"},
+    "userskill": {"user"},
+    "module": {"user"},
+}
+versioned_tables = sorted(dependent_tables)
+
+def initial_version() -> int:
+    # Milliseconds since the epoch, so a recreated database never repeats an old version
+    return int(time.time() * 1000)
+
+def bump_table_versions(db: Session, *tables: str) -> None:
+    """Bump the version of `tables` and of every table embedding them, inside the caller's transaction."""
+    names = set(tables).union(*(dependent_tables[table] for table in tables))
+    db.exec(
+        update(TableVersion)
+        .where(TableVersion.name.in_(names))
+        .values(version=TableVersion.version + 1)
+    )
+    db.info.setdefault("changed_tables", set()).update(names)
+    db.info.setdefault("written_tables", set()).update(tables)
+
+# In-process caches subscribe here to learn which tables a commit changed.
+# `direct` listeners only hear about the tables written, not their dependents.
+table_change_listeners: list[tuple[Callable[[set[str]], None], bool]] = []
+
+def on_tables_changed(listener: Callable[[set[str]], None], direct: bool = False) -> Callable[[set[str]], None]:
+    table_change_listeners.append((listener, direct))
+    return listener
+
+on_tables_changed(reference_cache.invalidate)
+
+@event.listens_for(Session, "after_commit")
+def _publish_changed_tables(session) -> None:
+    changed = session.info.pop("changed_tables", None)
+    written = session.info.pop("written_tables", None)
+    if changed:
+        for listener, direct in table_change_listeners:
+            listener(written if direct else changed)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_tables(session) -> None:
+    session.info.pop("changed_tables", None)
+    session.info.pop("written_tables", None)
+
+def read_table_versions(db: Session, tables: tuple[str, ...]) -> list[int]:
+    versions = dict(db.exec(select(TableVersion.name, TableVersion.version).where(TableVersion.name.in_(tables))).all())
+    db.info.setdefault("table_versions", {}).update(versions)
+    return [versions.get(table, 0) for table in tables]
+
+def session_table_versions(db: Session, tables: tuple[str, ...]) -> tuple[int, ...]:
+    """
+    The versions of `tables` as first read in `db`, e.g. for the request's
+    ETag, so that whatever is built for those versions can be keyed by them.
+    """
+    known = db.info.get("table_versions", {})
+    if not known.keys() >= set(tables):
+        read_table_versions(db, tuple(table for table in tables if table not in known))
+        known = db.info["table_versions"]
+    return tuple(known.get(table, 0) for table in tables)
+
+def make_etag(tables: tuple[str, ...], versions: list[int], path: str, query: str) -> str:
+    """Strong ETag: the same table versions and request always produce the same body."""
+    key = ",".join(f"{table}:{version}" for table, version in zip(tables, versions))
+    digest = hashlib.sha256(f"{key}:{path}?{query}".encode()).hexdigest()[:32]
+    return f'"{digest}"'
@@ -0,0 +1,155 @@
+from typing import Any, AsyncIterator
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.crud.changes import CREATE, UPDATE, back_reference, change_log_rows
+from app.crud.pagination import relationship_columns
+from app.models import ChangeLog
+
+class BulkRowError(BaseModel):
+    row: int
+    code: str | None = None
+    detail: str
+
+class BulkImportReport(BaseModel):
+    created: int = 0
+    failed: int = 0
+    errors: list[BulkRowError] = []
+
+class BulkImporter:
+    """
+    Imports rows of one entity in chunks, inside the caller's transaction.
+
+    `links` maps each list field of `create_model` to the column holding the
+    related rows' codes (e.g. "divisions" -> Division.code). Per chunk, the
+    rows are validated, codes already taken are looked up with one query,
+    referenced codes not seen before with one query per relationship, and
+    the entities, their link rows and their change log rows are written with
+    one executemany each. A row that fails is reported and skipped; the
+    others still go in.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        model: type[SQLModel],
+        create_model: type[SQLModel],
+        links: dict[str, Any],
+        key: str = "code",
+    ):
+        self.db = db
+        self.model = model
+        self.create_model = create_model
+        self.links = links
+        self.key = key
+        self.report = BulkImportReport()
+        self._seen: set[str] = set()
+        self._ids: dict[str, dict[str, int]] = {name: {} for name in links}
+        self.linked_ids: dict[str, set[int]] = {name: set() for name in links}
+
+    def _fail(self, row: int, detail: str, code: str | None = None) -> None:
+        self.report.failed += 1
+        self.report.errors.append(BulkRowError(row=row, code=code, detail=detail))
+
+    def _validate(self, row: int, record: dict | str) -> SQLModel | None:
+        if isinstance(record, str):
+            self._fail(row, record)
+            return None
+        for name in self.links:
+            if isinstance(record.get(name), str):
+                record[name] = [code.strip() for code in record[name].split(";") if code.strip()]
+        try:
+            return self.create_model.model_validate(record)
+        except ValidationError as exc:
+            error = exc.errors()[0]
+            location = ".".join(map(str, error["loc"]))
+            self._fail(row, f"{location}: {error['msg']}", record.get(self.key))
+            return None
+
+    async def _resolve(self, name: str, codes: set[str]) -> dict[str, int]:
+        known = self._ids[name]
+        unknown = codes - known.keys()
+        if unknown:
+            code_column = self.links[name]
+            target = code_column.class_
+            result = await self.db.execute(select(code_column, target.id).where(code_column.in_(unknown)))
+            known.update(result.all())
+        return known
+
+    async def import_chunk(self, chunk: list[tuple[int, dict | str]]) -> None:
+        candidates = []
+        for row, record in chunk:
+            item = self._validate(row, record)
+            if item is None:
+                continue
+            code = getattr(item, self.key)
+            if code in self._seen:
+                self._fail(row, f"Duplicate {self.key} '{code}' in this import", code)
+                continue
+            self._seen.add(code)
+            candidates.append((row, item))
+        if not candidates:
+            return
+
+        key_column = getattr(self.model, self.key)
+        taken = set((await self.db.execute(
+            select(key_column).where(key_column.in_([getattr(item, self.key) for _, item in candidates]))
+        )).scalars())
+        ids = {
+            name: await self._resolve(name, {code for _, item in candidates for code in getattr(item, name) or []})
+            for name in self.links
+        }
+
+        accepted = []
+        for row, item in candidates:
+            code = getattr(item, self.key)
+            if code in taken:
+                self._fail(row, f"{self.model.__name__} with {self.key} '{code}' already exists", code)
+                continue
+            missing = {
+                name: sorted(set(getattr(item, name) or []) - ids[name].keys())
+                for name in self.links
+            }
+            missing = {name: codes for name, codes in missing.items() if codes}
+            if missing:
+                detail = "; ".join(f"{name} not found: {', '.join(codes)}" for name, codes in missing.items())
+                self._fail(row, detail, code)
+                continue
+            accepted.append(item)
+        if not accepted:
+            return
+
+        created = await self.db.execute(
+            insert(self.model).returning(self.model.id, sort_by_parameter_order=True),
+            [item.model_dump(exclude=set(self.links)) for item in accepted],
+        )
+        new_ids = created.scalars().all()
+        changes = change_log_rows(self.model.__tablename__, new_ids, CREATE)
+        for name in self.links:
+            local_column, remote_column, _ = relationship_columns(self.model, name)
+            link_rows = [
+                {local_column.key: new_id, remote_column.key: ids[name][code]}
+                for new_id, item in zip(new_ids, accepted)
+                for code in dict.fromkeys(getattr(item, name) or [])
+            ]
+            if link_rows:
+                await self.db.execute(insert(local_column.table), link_rows)
+                self.linked_ids[name].update(row[remote_column.key] for row in link_rows)
+                target, back = back_reference(self.model, name)
+                changes += change_log_rows(target, (row[remote_column.key] for row in link_rows), UPDATE, [back])
+        await self.db.execute(insert(ChangeLog), changes)
+        self.report.created += len(accepted)
+
+    async def run(self, records: AsyncIterator[tuple[int, dict | str]], chunk_size: int) -> BulkImportReport:
+        chunk = []
+        async for record in records:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                await self.import_chunk(chunk)
+                chunk = []
+        if chunk:
+            await self.import_chunk(chunk)
+        return self.report
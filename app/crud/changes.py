@@ -0,0 +1,220 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterable, Literal
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy import func, insert, inspect as sa_inspect
+from sqlmodel import Session, SQLModel, select
+
+from app.core.database import open_read_session
+from app.crud.pagination import attach_relationships, relationship_columns, scalar_fields
+from app.models import ChangeLog
+
+CREATE, UPDATE, DELETE = "create", "update", "delete"
+
+@dataclass
+class FeedEntity:
+    model: type[SQLModel]
+    read_model: type[BaseModel]
+    relationships: dict[str, type[BaseModel]]
+    # The module page that shows the entity, i.e. its live broadcast channel
+    module: str
+    superadmin_only: bool
+
+# Entities the change feed serves, by table name; each CRUD module registers its own
+feed_entities: dict[str, FeedEntity] = {}
+
+def register_feed_entity(
+    model: type[SQLModel],
+    read_model: type[BaseModel],
+    relationships: dict[str, type[BaseModel]],
+    module: str,
+    superadmin_only: bool = False,
+) -> None:
+    feed_entities[model.__tablename__] = FeedEntity(model, read_model, relationships, module, superadmin_only)
+
+# region Recording
+def change_log_rows(entity: str, ids: Iterable[int], op: str, fields: Iterable[str] = ()) -> list[dict]:
+    changed_at = datetime.now(timezone.utc)
+    fields = list(fields)
+    return [
+        {"entity": entity, "entity_id": entity_id, "op": op, "fields": fields, "changed_at": changed_at}
+        for entity_id in dict.fromkeys(ids)
+    ]
+
+def record_changes(db: Session, entity: str, ids: Iterable[int], op: str, fields: Iterable[str] = ()) -> None:
+    """Appends one `op` per id to the change log, inside the caller's transaction."""
+    rows = change_log_rows(entity, ids, op, fields)
+    if rows:
+        db.execute(insert(ChangeLog), rows)
+
+def back_reference(model: type[SQLModel], name: str) -> tuple[str, str]:
+    """(table of the related rows, name of the relationship pointing back) for `model`'s `name`."""
+    relationship = sa_inspect(model).relationships[name]
+    return relationship.mapper.class_.__tablename__, relationship.back_populates
+
+def _linked_ids(db: Session, row: SQLModel, name: str) -> list[int]:
+    local_column, remote_column, _ = relationship_columns(type(row), name)
+    return db.exec(select(remote_column).where(local_column == row.id)).all()
+
+def changed_fields(row: SQLModel, data: dict) -> list[str]:
+    """The keys of `data` whose value differs from `row`'s; call it before applying `data`."""
+    return [name for name, value in data.items() if getattr(row, name, None) != value]
+
+def record_link_changes(db: Session, owner: SQLModel, name: str, added: list[int], removed: list[int]) -> None:
+    """A link change alters both sides: `owner`'s `name` list and the back-reference of every row linked or unlinked."""
+    if not added and not removed:
+        return
+    target, back = back_reference(type(owner), name)
+    record_changes(db, owner.__tablename__, [owner.id], UPDATE, [name])
+    record_changes(db, target, [*added, *removed], UPDATE, [back])
+
+def record_update(db: Session, row: SQLModel, fields: list[str]) -> None:
+    """
+    Logs an update of `row`'s scalar `fields`, and of every linked row whose
+    read model embeds one of those fields in its short read of `row`.
+    """
+    if not fields:
+        return
+    entity = row.__tablename__
+    record_changes(db, entity, [row.id], UPDATE, fields)
+    for name in feed_entities[entity].relationships:
+        target, back = back_reference(type(row), name)
+        embedded = feed_entities[target].relationships.get(back) if target in feed_entities else None
+        if embedded is not None and not embedded.model_fields.keys().isdisjoint(fields):
+            record_changes(db, target, _linked_ids(db, row, name), UPDATE, [back])
+
+def record_delete(db: Session, row: SQLModel) -> None:
+    """Logs the delete of `row` and an update of every row it was linked to. Call it before deleting."""
+    entity = row.__tablename__
+    record_changes(db, entity, [row.id], DELETE)
+    for name in feed_entities[entity].relationships:
+        target, back = back_reference(type(row), name)
+        record_changes(db, target, _linked_ids(db, row, name), UPDATE, [back])
+# endregion
+
+# region Change feed
+class Change(BaseModel):
+    seq: int
+    entity: str
+    id: int
+    op: Literal["create", "update", "delete"]
+    # The fields an update changed; empty for create and delete, which concern the whole row
+    fields: list[str] = []
+    # The whole row for a create, the id and changed fields for an update, None for a delete
+    data: dict | None = None
+
+class ChangeFeed(BaseModel):
+    changes: list[Change]
+    # Pass as `since` to get the changes after these
+    cursor: int
+    has_more: bool
+
+def compact_changes(rows: Iterable[tuple[int, str, int, str, list[str]]]) -> list[dict]:
+    """
+    Folds the log rows of each entity row into one change, relative to the
+    state before the first of them: create+update is a create, updates merge
+    their fields, create..delete cancels out and anything..delete is a delete.
+    A delete followed by a create (an id reused) is a create of the new row.
+    Changes come out in the order of their last log row.
+    """
+    merged: dict[tuple[str, int], dict] = {}
+    for seq, entity, entity_id, op, fields in rows:
+        key = (entity, entity_id)
+        change = merged.pop(key, None)
+        if change is None:
+            change = {"existed": op != CREATE, "replaced": False, "fields": {}}
+        change["replaced"] |= op == DELETE
+        change["last_op"] = op
+        change["seq"] = seq
+        change["fields"].update(dict.fromkeys(fields))
+        merged[key] = change
+
+    changes = []
+    for (entity, entity_id), change in merged.items():
+        exists = change["last_op"] != DELETE
+        if not change["existed"] and not exists:
+            continue
+        if not exists:
+            op, fields = DELETE, []
+        elif not change["existed"] or change["replaced"]:
+            op, fields = CREATE, []
+        else:
+            op, fields = UPDATE, list(change["fields"])
+        changes.append({"seq": change["seq"], "entity": entity, "id": entity_id, "op": op, "fields": fields})
+    return changes
+
+def _read_rows(db: Session, entity: str, ids: list[int]) -> dict[int, dict]:
+    feed = feed_entities[entity]
+    columns = scalar_fields(feed.read_model, feed.relationships)
+    rows = [
+        dict(row._mapping)
+        for row in db.execute(select(*(getattr(feed.model, name) for name in columns)).where(feed.model.id.in_(ids)))
+    ]
+    attach_relationships(db, feed.model, rows, list(feed.relationships), feed.relationships)
+    return {row["id"]: row for row in rows}
+
+def read_change_head(db: Session) -> int:
+    """The sequence number of the last change logged, 0 for none."""
+    return db.exec(select(func.coalesce(func.max(ChangeLog.seq), 0))).one()
+
+def read_changes(db: Session, since: int, limit: int, entities: list[str]) -> dict:
+    """
+    The changes of `entities` logged after `since`, compacted, with the
+    current data of the rows that still exist. At most `limit` log rows are
+    read per call; `has_more` tells the caller to ask again from `cursor`.
+    Fields the read models do not expose (password hashes) are left out.
+    """
+    head = read_change_head(db)
+    if since > head:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail=f"No changes were logged after {since}; reload the data and continue from {head}",
+        )
+    rows = db.exec(
+        select(ChangeLog.seq, ChangeLog.entity, ChangeLog.entity_id, ChangeLog.op, ChangeLog.fields)
+        .where(ChangeLog.seq > since, ChangeLog.seq <= head, ChangeLog.entity.in_(entities))
+        .order_by(ChangeLog.seq)
+        .limit(limit)
+    ).all()
+    has_more = len(rows) == limit
+    changes = compact_changes(rows)
+
+    ids: dict[str, list[int]] = {}
+    for change in changes:
+        if change["op"] != DELETE:
+            ids.setdefault(change["entity"], []).append(change["id"])
+    data = {entity: _read_rows(db, entity, entity_ids) for entity, entity_ids in ids.items()}
+
+    feed = []
+    for change in changes:
+        if change["op"] == DELETE:
+            feed.append(change)
+            continue
+        row = data[change["entity"]].get(change["id"])
+        if row is None:
+            # Deleted after the log was read; its delete comes with a later cursor
+            feed.append({**change, "op": DELETE, "fields": []})
+        elif change["op"] == CREATE:
+            feed.append({**change, "data": row})
+        else:
+            fields = [name for name in change["fields"] if name in row]
+            if fields:
+                feed.append({**change, "fields": fields, "data": {"id": row["id"], **{name: row[name] for name in fields}}})
+    return {"changes": feed, "cursor": rows[-1].seq if has_more else head, "has_more": has_more}
+
+def read_live_changes(since: int | None, limit: int) -> tuple[list[dict], int, bool]:
+    """
+    The live broadcast's read: the changes of every entity after `since`,
+    the cursor to continue from and whether more are waiting. With no
+    `since`, or one ahead of the log (a recreated database), it only
+    returns the head.
+    """
+    with open_read_session() as db:
+        head = read_change_head(db)
+        if since is None or since > head:
+            return [], head, False
+        feed = read_changes(db, since, limit, list(feed_entities))
+    return feed["changes"], feed["cursor"], feed["has_more"]
+# endregion
@@ -0,0 +1,35 @@
+from typing import Iterable
+
+from fastapi import HTTPException, status
+from sqlmodel import Session, select
+
+from app.models import Division, Laboratory, Location, User, Warehouse
+
+# The column relationships are linked by, per table: the code, or the username for users
+link_code_columns = {
+    "location": Location.code,
+    "warehouse": Warehouse.code,
+    "laboratory": Laboratory.code,
+    "division": Division.code,
+    "user": User.username,
+}
+
+def resolve_codes(db: Session, table: str, codes: Iterable[str]) -> tuple[dict[str, int], list[str]]:
+    """Ids of `codes` in `table`, plus the codes that do not exist. One query, inside the caller's transaction."""
+    codes = list(dict.fromkeys(codes))
+    if not codes:
+        return {}, []
+    column = link_code_columns[table]
+    found = dict(db.exec(select(column, column.class_.id).where(column.in_(codes))).all())
+    return found, [code for code in codes if code not in found]
+
+def require_code_ids(db: Session, table: str, codes: Iterable[str], label: str) -> list[int]:
+    """Ids of `codes` in `table`, or 404 naming the codes that do not exist."""
+    codes = list(dict.fromkeys(codes))
+    found, missing = resolve_codes(db, table, codes)
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{label} not found: {', '.join(missing)}",
+        )
+    return [found[code] for code in codes]
@@ -0,0 +1,67 @@
+from typing import Iterator
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlmodel import SQLModel
+
+from app.core.database import open_read_session
+from app.core.streaming import csv_chunk, ndjson_chunk
+from app.crud.pagination import attach_relationships, scalar_fields
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def export_rows(
+    model: type[SQLModel],
+    read_model: type[BaseModel],
+    fmt: str,
+    include: list[str] | None,
+    relationships: dict[str, type[BaseModel]],
+    batch_size: int,
+) -> Iterator[str]:
+    """
+    Streams the whole table as NDJSON or CSV text, one chunk per batch of rows,
+    with every relationship unless `include` names a subset. The arguments are
+    checked here, before the response starts and an error can still be sent.
+
+    Rows are fetched `batch_size` at a time from a single streaming query
+    and each included relationship is loaded with one link-table query per
+    batch, so memory does not grow with the table. In CSV, related rows are
+    written as their first field (code, username, ...) joined by ";", the
+    format the bulk imports read.
+    """
+    include = list(relationships) if include is None else include
+    unknown = [name for name in include if name not in relationships]
+    if fmt not in EXPORT_FORMATS or unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown field(s): {', '.join(unknown)}" if unknown else f"Format must be one of {', '.join(EXPORT_FORMATS)}",
+        )
+    columns = scalar_fields(read_model, relationships)
+    columns = ["id"] + [name for name in columns if name != "id"]
+    statement = (
+        select(*(getattr(model, name) for name in columns))
+        .order_by(model.id)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+
+    def stream() -> Iterator[str]:
+        with open_read_session() as db:
+            result = db.execute(statement)
+            first = True
+            for partition in result.partitions():
+                rows = [dict(row._mapping) for row in partition]
+                attach_relationships(db, model, rows, include, relationships)
+                if fmt == "csv":
+                    for name in include:
+                        key = next(iter(relationships[name].model_fields))
+                        for row in rows:
+                            row[name] = [related[key] for related in row[name]]
+                    yield csv_chunk(rows, columns + include, header=first)
+                else:
+                    yield ndjson_chunk(rows)
+                first = False
+            if first and fmt == "csv":
+                yield csv_chunk([], columns + include, header=True)
+
+    return stream()
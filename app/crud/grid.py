@@ -0,0 +1,202 @@
+from datetime import datetime
+from typing import Any, Literal
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy import Boolean, and_, func, not_, or_, select
+from sqlmodel import Session, SQLModel
+
+from app.crud.pagination import attach_relationships, scalar_fields
+
+# region AG Grid server-side row model
+class GridColumn(BaseModel):
+    id: str
+    field: str | None = None
+    displayName: str | None = None
+    aggFunc: str | None = None
+
+class GridSort(BaseModel):
+    colId: str
+    sort: Literal["asc", "desc"]
+
+class GridRowsRequest(BaseModel):
+    """The `IServerSideGetRowsRequest` AG Grid sends for every block it needs."""
+    startRow: int = 0
+    endRow: int = 100
+    rowGroupCols: list[GridColumn] = []
+    valueCols: list[GridColumn] = []
+    groupKeys: list[Any] = []
+    sortModel: list[GridSort] = []
+    filterModel: dict[str, dict[str, Any]] | None = None
+    # Not part of AG Grid's request: relationships to add to leaf rows
+    include: list[str] = []
+
+class GridRowsResponse(BaseModel):
+    rowData: list[dict[str, Any]]
+    rowCount: int
+
+MAX_BLOCK_SIZE = 1000
+
+aggregates = {
+    "sum": func.sum,
+    "avg": func.avg,
+    "min": func.min,
+    "max": func.max,
+    "count": func.count,
+}
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _coerce(column, value):
+    if isinstance(column.type, Boolean) and isinstance(value, str):
+        return value.lower() == "true"
+    return value
+
+def _condition(column, spec: dict[str, Any]):
+    """Translates one AG Grid filter model (simple or combined) into a SQL expression."""
+    if "conditions" in spec or "condition1" in spec:
+        conditions = spec.get("conditions") or [spec["condition1"], spec["condition2"]]
+        combine = or_ if spec.get("operator", "AND").upper() == "OR" else and_
+        return combine(*(_condition(column, condition) for condition in conditions))
+
+    filter_type = spec.get("filterType", "text")
+    if filter_type == "set":
+        values = [_coerce(column, value) for value in spec.get("values", [])]
+        non_null = [value for value in values if value is not None]
+        clause = column.in_(non_null)
+        return or_(clause, column.is_(None)) if None in values else clause
+
+    kind = spec.get("type", "equals")
+    if kind == "blank":
+        return or_(column.is_(None), column == "") if filter_type == "text" else column.is_(None)
+    if kind == "notBlank":
+        return and_(column.is_not(None), column != "") if filter_type == "text" else column.is_not(None)
+
+    if filter_type == "date":
+        try:
+            value = datetime.fromisoformat(spec["dateFrom"])
+            value_to = datetime.fromisoformat(spec["dateTo"]) if spec.get("dateTo") else None
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date filter")
+    else:
+        if spec.get("filter") is None or (kind == "inRange" and spec.get("filterTo") is None):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Missing value for {filter_type} filter '{kind}'")
+        value = _coerce(column, spec["filter"])
+        value_to = spec.get("filterTo")
+
+    if filter_type == "text":
+        value = str(value)
+        pattern = _escape_like(value)
+        text_conditions = {
+            "equals": lambda: func.lower(column) == value.lower(),
+            "notEqual": lambda: func.lower(column) != value.lower(),
+            "contains": lambda: column.ilike(f"%{pattern}%", escape="\\"),
+            "notContains": lambda: not_(column.ilike(f"%{pattern}%", escape="\\")),
+            "startsWith": lambda: column.ilike(f"{pattern}%", escape="\\"),
+            "endsWith": lambda: column.ilike(f"%{pattern}", escape="\\"),
+        }
+        if kind in text_conditions:
+            return text_conditions[kind]()
+    else:
+        comparisons = {
+            "equals": lambda: column == value,
+            "notEqual": lambda: column != value,
+            "lessThan": lambda: column < value,
+            "lessThanOrEqual": lambda: column <= value,
+            "greaterThan": lambda: column > value,
+            "greaterThanOrEqual": lambda: column >= value,
+            "inRange": lambda: column.between(value, value_to),
+        }
+        if kind in comparisons:
+            return comparisons[kind]()
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Unsupported {filter_type} filter '{kind}'",
+    )
+
+def read_grid_rows(
+    db: Session,
+    model: type[SQLModel],
+    read_model: type[BaseModel],
+    request: GridRowsRequest,
+    relationships: dict[str, type[BaseModel]],
+) -> GridRowsResponse:
+    """
+    Answers one block request of AG Grid's server-side row model.
+
+    Filtering, sorting, grouping and aggregation all run in SQL. While there
+    are group columns left to open, the block holds one row per group with
+    its `childCount` and the requested aggregates; below the last group
+    level it holds leaf rows. `rowCount` comes for free on the last block,
+    otherwise from a COUNT over the same filtered set.
+    """
+    columns = scalar_fields(read_model, relationships)
+    group_fields = [column.field or column.id for column in request.rowGroupCols]
+    value_columns = request.valueCols
+    referenced = group_fields + [column.field or column.id for column in value_columns]
+    referenced += [sort.colId for sort in request.sortModel] + list(request.filterModel or {})
+    unknown = [name for name in dict.fromkeys(referenced) if name not in columns]
+    unknown += [name for name in request.include if name not in relationships]
+    unknown += [column.aggFunc for column in value_columns if column.aggFunc and column.aggFunc not in aggregates]
+    if unknown or len(request.groupKeys) > len(group_fields):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown field(s): {', '.join(map(str, unknown))}" if unknown else "Too many group keys",
+        )
+    block_size = request.endRow - request.startRow
+    if not 0 < block_size <= MAX_BLOCK_SIZE or request.startRow < 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Blocks must hold between 1 and {MAX_BLOCK_SIZE} rows",
+        )
+
+    conditions = [_condition(getattr(model, name), spec) for name, spec in (request.filterModel or {}).items()]
+    conditions += [
+        getattr(model, name) == _coerce(getattr(model, name), key)
+        for name, key in zip(group_fields, request.groupKeys)
+    ]
+
+    level = len(request.groupKeys)
+    if level < len(group_fields):
+        group_column = getattr(model, group_fields[level])
+        sortable = {group_fields[level]: group_column}
+        selected = [group_column, func.count().label("childCount")]
+        for value_column in value_columns:
+            aggregate = aggregates[value_column.aggFunc or "sum"]
+            expression = aggregate(getattr(model, value_column.field or value_column.id)).label(value_column.id)
+            sortable[value_column.id] = expression
+            selected.append(expression)
+        statement = select(*selected).where(*conditions).group_by(group_column)
+        statement = statement.order_by(*[
+            sortable[sort.colId].desc() if sort.sort == "desc" else sortable[sort.colId].asc()
+            for sort in request.sortModel
+            if sort.colId in sortable
+        ], group_column)
+        count_statement = select(func.count()).select_from(
+            select(group_column).where(*conditions).group_by(group_column).subquery()
+        )
+    else:
+        fields = ["id"] + [name for name in columns if name != "id"]
+        statement = select(*(getattr(model, name) for name in fields)).where(*conditions)
+        statement = statement.order_by(*[
+            getattr(model, sort.colId).desc() if sort.sort == "desc" else getattr(model, sort.colId).asc()
+            for sort in request.sortModel
+        ], model.id)
+        count_statement = select(func.count()).select_from(model).where(*conditions)
+
+    # One row past the block tells whether this is the last one
+    statement = statement.offset(request.startRow).limit(block_size + 1)
+    rows = [dict(row._mapping) for row in db.execute(statement)]
+    if len(rows) > block_size or (not rows and request.startRow > 0):
+        # More rows follow, or the block starts past the end (a filter shrank
+        # the set): only a count knows the total
+        rows = rows[:block_size]
+        row_count = db.execute(count_statement).scalar_one()
+    else:
+        row_count = request.startRow + len(rows)
+
+    if level >= len(group_fields) and rows:
+        attach_relationships(db, model, rows, request.include, relationships)
+    return GridRowsResponse(rowData=rows, rowCount=row_count)
+# endregion
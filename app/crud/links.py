@@ -0,0 +1,89 @@
+from typing import Iterable
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, insert
+from sqlmodel import Session, SQLModel, select
+
+from app.crud.changes import record_link_changes
+from app.crud.codes import require_code_ids
+from app.crud.pagination import relationship_columns
+from app.models import LinkChanges
+
+def require_ids(db: Session, model: type[SQLModel], ids: Iterable[int], label: str) -> list[int]:
+    """`ids` without duplicates, or 404 naming the ids that do not exist in `model`'s table."""
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return ids
+    existing = set(db.exec(select(model.id).where(model.id.in_(ids))).all())
+    missing = [str(row_id) for row_id in ids if row_id not in existing]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{label} not found: {', '.join(missing)}",
+        )
+    return ids
+
+def _linked_ids(db: Session, owner: SQLModel, name: str, among: Iterable[int] | None = None) -> set[int]:
+    local_column, remote_column, _ = relationship_columns(type(owner), name)
+    statement = select(remote_column).where(local_column == owner.id)
+    if among is not None:
+        statement = statement.where(remote_column.in_(among))
+    return set(db.exec(statement).all())
+
+def _write_delta(db: Session, owner: SQLModel, name: str, added: list[int], removed: list[int]) -> None:
+    local_column, remote_column, _ = relationship_columns(type(owner), name)
+    if removed:
+        db.exec(delete(local_column.table).where(local_column == owner.id, remote_column.in_(removed)))
+    if added:
+        db.exec(
+            insert(local_column.table),
+            params=[{local_column.key: owner.id, remote_column.key: target_id} for target_id in added],
+        )
+    if added or removed:
+        record_link_changes(db, owner, name, added, removed)
+        # A loaded collection no longer matches the link table
+        db.expire(owner, [name])
+
+def replace_links(db: Session, owner: SQLModel, name: str, target_ids: Iterable[int]) -> tuple[list[int], list[int]]:
+    """
+    Makes `owner`'s `name` relationship hold exactly `target_ids`.
+
+    Only the link rows that differ are written: one query reads the linked
+    ids, then one DELETE and one executemany INSERT apply the difference.
+    Neither side's ORM objects are loaded. Returns the (added, removed) ids.
+    """
+    target = dict.fromkeys(target_ids)
+    current = _linked_ids(db, owner, name)
+    added = [target_id for target_id in target if target_id not in current]
+    removed = [target_id for target_id in current if target_id not in target]
+    _write_delta(db, owner, name, added, removed)
+    return added, removed
+
+def change_links(
+    db: Session, owner: SQLModel, name: str, add_ids: Iterable[int], remove_ids: Iterable[int]
+) -> tuple[list[int], list[int]]:
+    """
+    Links `add_ids` to and unlinks `remove_ids` from `owner`'s `name`
+    relationship, leaving its other links alone. Ids already in the wanted
+    state are skipped; an id in both lists ends up linked. Returns the
+    (added, removed) ids.
+    """
+    add = dict.fromkeys(add_ids)
+    remove = [target_id for target_id in dict.fromkeys(remove_ids) if target_id not in add]
+    if not add and not remove:
+        return [], []
+    present = _linked_ids(db, owner, name, among=[*add, *remove])
+    added = [target_id for target_id in add if target_id not in present]
+    removed = [target_id for target_id in remove if target_id in present]
+    _write_delta(db, owner, name, added, removed)
+    return added, removed
+
+def change_links_by_code(
+    db: Session, owner: SQLModel, name: str, table: str, changes: LinkChanges, label: str
+) -> tuple[list[int], list[int]]:
+    """`change_links` for a relationship whose targets are named by code (username for users)."""
+    return change_links(
+        db, owner, name,
+        require_code_ids(db, table, changes.add, label),
+        require_code_ids(db, table, changes.remove, label),
+    )
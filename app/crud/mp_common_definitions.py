@@ -1,19 +1,44 @@
+from typing import AsyncIterator, Iterator
+
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.orm import selectinload
 from fastapi import HTTPException, status
+from pydantic import TypeAdapter
 
 from app.models import (
     # Location Models
     Location, LocationCreate, LocationRead, LocationUpdate,
     # Warehouse Models
-    Warehouse, WarehouseCreate, WarehouseRead, WarehouseUpdate,
+    Warehouse, WarehouseCreate, WarehouseRead, WarehouseUpdate, WarehouseMembersUpdate,
     # Laboratory Models
-    Laboratory, LaboratoryCreate, LaboratoryRead, LaboratoryUpdate,
+    Laboratory, LaboratoryCreate, LaboratoryRead, LaboratoryUpdate, LaboratoryMembersUpdate,
     # Division Models
-    Division, DivisionCreate, DivisionRead, DivisionUpdate,
+    Division, DivisionCreate, DivisionRead, DivisionUpdate, DivisionMembersUpdate,
+    # Short read models for paged relationships
+    LocationShortRead, WarehouseShortRead, LaboratoryShortRead, DivisionShortRead, UserShortRead,
     # User Model for relationship linking
-    User
+    User, DivisionUserLink,
+    # Link tables and the hierarchy snapshot
+    LocationWarehouseLink, DivisionWarehouseLink, DivisionLaboratoryLink, HierarchyRead,
 )
+from app.dependencies.auth import bump_authz_version
+from app.core.versions import bump_table_versions, session_table_versions
+from app.crud.pagination import PageParams, read_page
+from app.core.cache import reference_cache
+from app.core.serialization import get_list_serializer
+from app.crud.reference import cached_bootstrap_json, cached_list_json
+from app.crud.codes import require_code_ids
+from app.crud.links import change_links_by_code, replace_links
+from app.crud.grid import GridRowsRequest, GridRowsResponse, read_grid_rows
+from app.crud.export import export_rows
+from app.crud.bulk import BulkImporter, BulkImportReport
+from app.crud.changes import CREATE, changed_fields, record_changes, record_delete, record_update, register_feed_entity
+
+BulkRecords = AsyncIterator[tuple[int, dict | str]]
+
+def division_member_ids(db: Session, division_id: int) -> list[int]:
+    return db.exec(select(DivisionUserLink.user_id).where(DivisionUserLink.division_id == division_id)).all()
 
 # region Location CRUD
 def read_location(db: Session, location_id: int) -> LocationRead | None:
@@ -26,6 +51,35 @@ def read_all_locations(db: Session) -> list[LocationRead]:
     statement = select(Location).options(selectinload(Location.warehouses))
     return db.exec(statement).all()
 
+def read_all_locations_json(db: Session) -> bytes:
+    """Serialized list of all locations, cached until a write touches them."""
+    return cached_list_json(db, "location", LocationRead, location_relationships, lambda: read_all_locations(db))
+
+location_relationships = {"warehouses": WarehouseShortRead}
+register_feed_entity(Location, LocationRead, location_relationships, module="mp_common_definitions")
+
+def read_locations_page(db: Session, params: PageParams) -> tuple[list[dict], int | None]:
+    """Fetches one page of locations, with warehouses only when included."""
+    return read_page(db, Location, LocationRead, params, location_relationships)
+
+def read_locations_rows(db: Session, request: GridRowsRequest) -> GridRowsResponse:
+    """Answers an AG Grid server-side row request for locations."""
+    return read_grid_rows(db, Location, LocationRead, request, location_relationships)
+
+def export_locations(fmt: str, include: list[str] | None, batch_size: int) -> Iterator[str]:
+    """Streams all locations as NDJSON or CSV text."""
+    return export_rows(Location, LocationRead, fmt, include, location_relationships, batch_size)
+
+
+async def import_locations(db: AsyncSession, records: BulkRecords, chunk_size: int) -> BulkImportReport:
+    """Bulk-creates locations in one transaction, reporting the rows that failed."""
+    importer = BulkImporter(db, Location, LocationCreate, links={})
+    report = await importer.run(records, chunk_size)
+    if report.created:
+        await db.run_sync(bump_table_versions, "location")
+    await db.commit()
+    return report
+
 def create_location(*, db: Session, location_create: LocationCreate) -> Location:
     """Creates a new Location, ensuring the location code is unique."""
     if db.exec(select(Location).where(Location.code == location_create.code)).first():
@@ -36,6 +90,9 @@ def create_location(*, db: Session, location_create: LocationCreate) -> Location
     
     location = Location.model_validate(location_create)
     db.add(location)
+    db.flush()
+    record_changes(db, "location", [location.id], CREATE)
+    bump_table_versions(db, "location")
     db.commit()
     db.refresh(location)
     return location
@@ -50,8 +107,11 @@ def update_location(*, db: Session, db_location: Location, input_location: Locat
             )
             
     location_data = input_location.model_dump(exclude_unset=True)
+    fields = changed_fields(db_location, location_data)
     db_location.sqlmodel_update(location_data)
     db.add(db_location)
+    record_update(db, db_location, fields)
+    bump_table_versions(db, "location")
     db.commit()
     db.refresh(db_location)
     return db_location
@@ -61,7 +121,9 @@ def delete_location(db: Session, location_id: int) -> bool:
     location = db.get(Location, location_id)
     if not location:
         return False
+    record_delete(db, location)
     db.delete(location)
+    bump_table_versions(db, "location")
     db.commit()
     return True
 # endregion
@@ -81,6 +143,41 @@ def read_all_warehouses(db: Session) -> list[WarehouseRead]:
     statement = select(Warehouse).options(selectinload(Warehouse.locations), selectinload(Warehouse.divisions))
     return db.exec(statement).all()
 
+def read_all_warehouses_json(db: Session) -> bytes:
+    """Serialized list of all warehouses, cached until a write touches them."""
+    return cached_list_json(db, "warehouse", WarehouseRead, warehouse_relationships, lambda: read_all_warehouses(db))
+
+warehouse_relationships = {
+    "locations": LocationShortRead,
+    "divisions": DivisionShortRead,
+}
+register_feed_entity(Warehouse, WarehouseRead, warehouse_relationships, module="mp_common_definitions")
+
+def read_warehouses_page(db: Session, params: PageParams) -> tuple[list[dict], int | None]:
+    """Fetches one page of warehouses, with locations and divisions only when included."""
+    return read_page(db, Warehouse, WarehouseRead, params, warehouse_relationships)
+
+def read_warehouses_rows(db: Session, request: GridRowsRequest) -> GridRowsResponse:
+    """Answers an AG Grid server-side row request for warehouses."""
+    return read_grid_rows(db, Warehouse, WarehouseRead, request, warehouse_relationships)
+
+def export_warehouses(fmt: str, include: list[str] | None, batch_size: int) -> Iterator[str]:
+    """Streams all warehouses as NDJSON or CSV text."""
+    return export_rows(Warehouse, WarehouseRead, fmt, include, warehouse_relationships, batch_size)
+
+
+async def import_warehouses(db: AsyncSession, records: BulkRecords, chunk_size: int) -> BulkImportReport:
+    """Bulk-creates warehouses in one transaction, linking locations and divisions by code."""
+    importer = BulkImporter(db, Warehouse, WarehouseCreate, links={
+        "locations": Location.code,
+        "divisions": Division.code,
+    })
+    report = await importer.run(records, chunk_size)
+    if report.created:
+        await db.run_sync(bump_table_versions, "warehouse")
+    await db.commit()
+    return report
+
 def create_warehouse(*, db: Session, warehouse_create: WarehouseCreate) -> Warehouse:
     """Creates a warehouse, linking it to locations and divisions by their codes."""
     if db.exec(select(Warehouse).where(Warehouse.code == warehouse_create.code)).first():
@@ -91,24 +188,17 @@ def create_warehouse(*, db: Session, warehouse_create: WarehouseCreate) -> Wareh
     
     warehouse_data = warehouse_create.model_dump(exclude={"locations", "divisions"})
     db_warehouse = Warehouse.model_validate(warehouse_data)
-
-    # Link Locations
-    if warehouse_create.locations:
-        locations = db.exec(select(Location).where(Location.code.in_(warehouse_create.locations))).all()
-        if len(locations) != len(set(warehouse_create.locations)):
-            missing = set(warehouse_create.locations) - {loc.code for loc in locations}
-            raise HTTPException(status_code=404, detail=f"Locations not found: {missing}")
-        db_warehouse.locations = locations
-
-    # Link Divisions
-    if warehouse_create.divisions:
-        divisions = db.exec(select(Division).where(Division.code.in_(warehouse_create.divisions))).all()
-        if len(divisions) != len(set(warehouse_create.divisions)):
-            missing = set(warehouse_create.divisions) - {div.code for div in divisions}
-            raise HTTPException(status_code=404, detail=f"Divisions not found: {missing}")
-        db_warehouse.divisions = divisions
+    location_ids = require_code_ids(db, "location", warehouse_create.locations, "Locations")
+    division_ids = require_code_ids(db, "division", warehouse_create.divisions, "Divisions")
 
     db.add(db_warehouse)
+    db.flush()
+    record_changes(db, "warehouse", [db_warehouse.id], CREATE)
+    if location_ids:
+        replace_links(db, db_warehouse, "locations", location_ids)
+    if division_ids:
+        replace_links(db, db_warehouse, "divisions", division_ids)
+    bump_table_versions(db, "warehouse")
     db.commit()
     db.refresh(db_warehouse)
     return db_warehouse
@@ -121,34 +211,44 @@ def update_warehouse(*, db: Session, db_warehouse: Warehouse, input_warehouse: W
     
     # Update scalar fields
     warehouse_data = input_warehouse.model_dump(exclude_unset=True, exclude={"locations", "divisions"})
+    fields = changed_fields(db_warehouse, warehouse_data)
     db_warehouse.sqlmodel_update(warehouse_data)
+    record_update(db, db_warehouse, fields)
 
     # Update relationships if provided (None means leave unchanged)
     if input_warehouse.locations is not None:
-        locations = db.exec(select(Location).where(Location.code.in_(input_warehouse.locations))).all()
-        if len(locations) != len(set(input_warehouse.locations)):
-            missing = set(input_warehouse.locations) - {loc.code for loc in locations}
-            raise HTTPException(status_code=404, detail=f"Locations not found: {missing}")
-        db_warehouse.locations = locations
+        location_ids = require_code_ids(db, "location", input_warehouse.locations, "Locations")
+        replace_links(db, db_warehouse, "locations", location_ids)
 
     if input_warehouse.divisions is not None:
-        divisions = db.exec(select(Division).where(Division.code.in_(input_warehouse.divisions))).all()
-        if len(divisions) != len(set(input_warehouse.divisions)):
-            missing = set(input_warehouse.divisions) - {div.code for div in divisions}
-            raise HTTPException(status_code=404, detail=f"Divisions not found: {missing}")
-        db_warehouse.divisions = divisions
+        division_ids = require_code_ids(db, "division", input_warehouse.divisions, "Divisions")
+        replace_links(db, db_warehouse, "divisions", division_ids)
     
     db.add(db_warehouse)
+    bump_table_versions(db, "warehouse")
     db.commit()
     db.refresh(db_warehouse)
     return db_warehouse
 
+def update_warehouse_members(*, db: Session, db_warehouse: Warehouse, members: WarehouseMembersUpdate) -> None:
+    """Links and unlinks some of a warehouse's locations and divisions by code, leaving the others alone."""
+    changed = False
+    if members.locations is not None:
+        changed |= any(change_links_by_code(db, db_warehouse, "locations", "location", members.locations, "Locations"))
+    if members.divisions is not None:
+        changed |= any(change_links_by_code(db, db_warehouse, "divisions", "division", members.divisions, "Divisions"))
+    if changed:
+        bump_table_versions(db, "warehouse")
+    db.commit()
+
 def delete_warehouse(db: Session, warehouse_id: int) -> bool:
     """Deletes a warehouse. Returns True on success, False if not found."""
     warehouse = db.get(Warehouse, warehouse_id)
     if not warehouse:
         return False
+    record_delete(db, warehouse)
     db.delete(warehouse)
+    bump_table_versions(db, "warehouse")
     db.commit()
     return True
 # endregion
@@ -168,6 +268,35 @@ def read_all_laboratories(db: Session) -> list[LaboratoryRead]:
     statement = select(Laboratory).options(selectinload(Laboratory.divisions))
     return db.exec(statement).all()
 
+def read_all_laboratories_json(db: Session) -> bytes:
+    """Serialized list of all laboratories, cached until a write touches them."""
+    return cached_list_json(db, "laboratory", LaboratoryRead, laboratory_relationships, lambda: read_all_laboratories(db))
+
+laboratory_relationships = {"divisions": DivisionShortRead}
+register_feed_entity(Laboratory, LaboratoryRead, laboratory_relationships, module="mp_common_definitions")
+
+def read_laboratories_page(db: Session, params: PageParams) -> tuple[list[dict], int | None]:
+    """Fetches one page of laboratories, with divisions only when included."""
+    return read_page(db, Laboratory, LaboratoryRead, params, laboratory_relationships)
+
+def read_laboratories_rows(db: Session, request: GridRowsRequest) -> GridRowsResponse:
+    """Answers an AG Grid server-side row request for laboratories."""
+    return read_grid_rows(db, Laboratory, LaboratoryRead, request, laboratory_relationships)
+
+def export_laboratories(fmt: str, include: list[str] | None, batch_size: int) -> Iterator[str]:
+    """Streams all laboratories as NDJSON or CSV text."""
+    return export_rows(Laboratory, LaboratoryRead, fmt, include, laboratory_relationships, batch_size)
+
+
+async def import_laboratories(db: AsyncSession, records: BulkRecords, chunk_size: int) -> BulkImportReport:
+    """Bulk-creates laboratories in one transaction, linking divisions by code."""
+    importer = BulkImporter(db, Laboratory, LaboratoryCreate, links={"divisions": Division.code})
+    report = await importer.run(records, chunk_size)
+    if report.created:
+        await db.run_sync(bump_table_versions, "laboratory")
+    await db.commit()
+    return report
+
 def create_laboratory(*, db: Session, laboratory_create: LaboratoryCreate) -> Laboratory:
     """Creates a laboratory, linking it to divisions by their codes."""
     if db.exec(select(Laboratory).where(Laboratory.code == laboratory_create.code)).first():
@@ -179,15 +308,14 @@ def create_laboratory(*, db: Session, laboratory_create: LaboratoryCreate) -> La
     laboratory_data = laboratory_create.model_dump(exclude={"divisions"})
     db_laboratory = Laboratory.model_validate(laboratory_data)
 
-    # Link Divisions
-    if laboratory_create.divisions:
-        divisions = db.exec(select(Division).where(Division.code.in_(laboratory_create.divisions))).all()
-        if len(divisions) != len(set(laboratory_create.divisions)):
-            missing = set(laboratory_create.divisions) - {div.code for div in divisions}
-            raise HTTPException(status_code=404, detail=f"Divisions not found: {missing}")
-        db_laboratory.divisions = divisions
+    division_ids = require_code_ids(db, "division", laboratory_create.divisions, "Divisions")
 
     db.add(db_laboratory)
+    db.flush()
+    record_changes(db, "laboratory", [db_laboratory.id], CREATE)
+    if division_ids:
+        replace_links(db, db_laboratory, "divisions", division_ids)
+    bump_table_versions(db, "laboratory")
     db.commit()
     db.refresh(db_laboratory)
     return db_laboratory
@@ -199,26 +327,35 @@ def update_laboratory(*, db: Session, db_laboratory: Laboratory, input_laborator
             raise HTTPException(status_code=400, detail=f"Laboratory code '{input_laboratory.code}' already exists")
 
     laboratory_data = input_laboratory.model_dump(exclude_unset=True, exclude={"divisions"})
+    fields = changed_fields(db_laboratory, laboratory_data)
     db_laboratory.sqlmodel_update(laboratory_data)
+    record_update(db, db_laboratory, fields)
 
     if input_laboratory.divisions is not None:
-        divisions = db.exec(select(Division).where(Division.code.in_(input_laboratory.divisions))).all()
-        if len(divisions) != len(set(input_laboratory.divisions)):
-            missing = set(input_laboratory.divisions) - {div.code for div in divisions}
-            raise HTTPException(status_code=404, detail=f"Divisions not found: {missing}")
-        db_laboratory.divisions = divisions
-        
+        division_ids = require_code_ids(db, "division", input_laboratory.divisions, "Divisions")
+        replace_links(db, db_laboratory, "divisions", division_ids)
+
     db.add(db_laboratory)
+    bump_table_versions(db, "laboratory")
     db.commit()
     db.refresh(db_laboratory)
     return db_laboratory
 
+def update_laboratory_members(*, db: Session, db_laboratory: Laboratory, members: LaboratoryMembersUpdate) -> None:
+    """Links and unlinks some of a laboratory's divisions by code, leaving the others alone."""
+    if members.divisions is not None:
+        if any(change_links_by_code(db, db_laboratory, "divisions", "division", members.divisions, "Divisions")):
+            bump_table_versions(db, "laboratory")
+    db.commit()
+
 def delete_laboratory(db: Session, laboratory_id: int) -> bool:
     """Deletes a laboratory. Returns True on success, False if not found."""
     laboratory = db.get(Laboratory, laboratory_id)
     if not laboratory:
         return False
+    record_delete(db, laboratory)
     db.delete(laboratory)
+    bump_table_versions(db, "laboratory")
     db.commit()
     return True
 # endregion
@@ -246,6 +383,46 @@ def read_all_divisions(db: Session) -> list[DivisionRead]:
     )
     return db.exec(statement).all()
 
+def read_all_divisions_json(db: Session) -> bytes:
+    """Serialized list of all divisions, cached until a write touches them."""
+    return cached_list_json(db, "division", DivisionRead, division_relationships, lambda: read_all_divisions(db))
+
+division_relationships = {
+    "laboratories": LaboratoryShortRead,
+    "warehouses": WarehouseShortRead,
+    "users": UserShortRead,
+}
+register_feed_entity(Division, DivisionRead, division_relationships, module="mp_common_definitions")
+
+def read_divisions_page(db: Session, params: PageParams) -> tuple[list[dict], int | None]:
+    """Fetches one page of divisions, with laboratories, warehouses and users only when included."""
+    return read_page(db, Division, DivisionRead, params, division_relationships)
+
+def read_divisions_rows(db: Session, request: GridRowsRequest) -> GridRowsResponse:
+    """Answers an AG Grid server-side row request for divisions."""
+    return read_grid_rows(db, Division, DivisionRead, request, division_relationships)
+
+def export_divisions(fmt: str, include: list[str] | None, batch_size: int) -> Iterator[str]:
+    """Streams all divisions as NDJSON or CSV text."""
+    return export_rows(Division, DivisionRead, fmt, include, division_relationships, batch_size)
+
+
+async def import_divisions(db: AsyncSession, records: BulkRecords, chunk_size: int) -> BulkImportReport:
+    """Bulk-creates divisions in one transaction, linking laboratories, warehouses and users."""
+    importer = BulkImporter(db, Division, DivisionCreate, links={
+        "laboratories": Laboratory.code,
+        "warehouses": Warehouse.code,
+        "users": User.username,
+    })
+    report = await importer.run(records, chunk_size)
+    # Division codes are part of the members' token claims
+    if importer.linked_ids["users"]:
+        await db.run_sync(bump_authz_version, list(importer.linked_ids["users"]))
+    if report.created:
+        await db.run_sync(bump_table_versions, "division")
+    await db.commit()
+    return report
+
 def create_division(*, db: Session, division_create: DivisionCreate) -> Division:
     """Creates a division, linking it to laboratories, warehouses, and users."""
     if db.exec(select(Division).where(Division.code == division_create.code)).first():
@@ -257,26 +434,22 @@ def create_division(*, db: Session, division_create: DivisionCreate) -> Division
     division_data = division_create.model_dump(exclude={"laboratories", "warehouses", "users"})
     db_division = Division.model_validate(division_data)
 
-    # Link relationships
-    if division_create.laboratories:
-        labs = db.exec(select(Laboratory).where(Laboratory.code.in_(division_create.laboratories))).all()
-        if len(labs) != len(set(division_create.laboratories)):
-            raise HTTPException(status_code=404, detail="One or more laboratories not found")
-        db_division.laboratories = labs
-    
-    if division_create.warehouses:
-        warehouses = db.exec(select(Warehouse).where(Warehouse.code.in_(division_create.warehouses))).all()
-        if len(warehouses) != len(set(division_create.warehouses)):
-            raise HTTPException(status_code=404, detail="One or more warehouses not found")
-        db_division.warehouses = warehouses
-
-    if division_create.users:
-        users = db.exec(select(User).where(User.username.in_(division_create.users))).all()
-        if len(users) != len(set(division_create.users)):
-            raise HTTPException(status_code=404, detail="One or more users not found")
-        db_division.users = users
-    
+    laboratory_ids = require_code_ids(db, "laboratory", division_create.laboratories, "Laboratories")
+    warehouse_ids = require_code_ids(db, "warehouse", division_create.warehouses, "Warehouses")
+    user_ids = require_code_ids(db, "user", division_create.users, "Users")
+
     db.add(db_division)
+    db.flush()
+    record_changes(db, "division", [db_division.id], CREATE)
+    if laboratory_ids:
+        replace_links(db, db_division, "laboratories", laboratory_ids)
+    if warehouse_ids:
+        replace_links(db, db_division, "warehouses", warehouse_ids)
+    if user_ids:
+        replace_links(db, db_division, "users", user_ids)
+        # Division codes are part of the members' token claims
+        bump_authz_version(db, user_ids)
+    bump_table_versions(db, "division")
     db.commit()
     db.refresh(db_division)
     return db_division
@@ -287,39 +460,131 @@ def update_division(*, db: Session, db_division: Division, input_division: Divis
         if db.exec(select(Division).where(Division.code == input_division.code)).first():
             raise HTTPException(status_code=400, detail=f"Division code '{input_division.code}' already exists")
 
+    # Division codes are part of the members' token claims
+    stale_user_ids = set()
+    if input_division.code and input_division.code != db_division.code:
+        stale_user_ids.update(division_member_ids(db, db_division.id))
+
     division_data = input_division.model_dump(exclude_unset=True, exclude={"laboratories", "warehouses", "users"})
+    fields = changed_fields(db_division, division_data)
     db_division.sqlmodel_update(division_data)
+    record_update(db, db_division, fields)
 
     # Update relationships if provided
     if input_division.laboratories is not None:
-        labs = db.exec(select(Laboratory).where(Laboratory.code.in_(input_division.laboratories))).all()
-        if len(labs) != len(set(input_division.laboratories)):
-            raise HTTPException(status_code=404, detail="One or more laboratories not found")
-        db_division.laboratories = labs
+        laboratory_ids = require_code_ids(db, "laboratory", input_division.laboratories, "Laboratories")
+        replace_links(db, db_division, "laboratories", laboratory_ids)
 
     if input_division.warehouses is not None:
-        warehouses = db.exec(select(Warehouse).where(Warehouse.code.in_(input_division.warehouses))).all()
-        if len(warehouses) != len(set(input_division.warehouses)):
-            raise HTTPException(status_code=404, detail="One or more warehouses not found")
-        db_division.warehouses = warehouses
+        warehouse_ids = require_code_ids(db, "warehouse", input_division.warehouses, "Warehouses")
+        replace_links(db, db_division, "warehouses", warehouse_ids)
 
     if input_division.users is not None:
-        users = db.exec(select(User).where(User.username.in_(input_division.users))).all()
-        if len(users) != len(set(input_division.users)):
-            raise HTTPException(status_code=404, detail="One or more users not found")
-        db_division.users = users
+        user_ids = require_code_ids(db, "user", input_division.users, "Users")
+        added, removed = replace_links(db, db_division, "users", user_ids)
+        stale_user_ids.update(added, removed)
 
+    bump_authz_version(db, stale_user_ids)
     db.add(db_division)
+    bump_table_versions(db, "division")
     db.commit()
     db.refresh(db_division)
     return db_division
 
+def update_division_members(*, db: Session, db_division: Division, members: DivisionMembersUpdate) -> None:
+    """
+    Links and unlinks some of a division's laboratories, warehouses and users
+    by code (username for users), leaving the others alone. Only the users
+    added or removed get their tokens refreshed.
+    """
+    changed = False
+    if members.laboratories is not None:
+        changed |= any(change_links_by_code(db, db_division, "laboratories", "laboratory", members.laboratories, "Laboratories"))
+    if members.warehouses is not None:
+        changed |= any(change_links_by_code(db, db_division, "warehouses", "warehouse", members.warehouses, "Warehouses"))
+    if members.users is not None:
+        added, removed = change_links_by_code(db, db_division, "users", "user", members.users, "Users")
+        # Division codes are part of the members' token claims
+        bump_authz_version(db, added + removed)
+        changed |= bool(added or removed)
+    if changed:
+        bump_table_versions(db, "division")
+    db.commit()
+
 def delete_division(db: Session, division_id: int) -> bool:
     """Deletes a division. Returns True on success, False if not found."""
     division = db.get(Division, division_id)
     if not division:
         return False
+    bump_authz_version(db, division_member_ids(db, division_id))
+    record_delete(db, division)
     db.delete(division)
+    bump_table_versions(db, "division")
     db.commit()
     return True
-# endregion
\ No newline at end of file
+# endregion
+
+# region Bootstrap
+bootstrap_tables = ("location", "warehouse", "laboratory", "division", "user")
+
+def read_all_users_short_json(db: Session) -> bytes:
+    """Serialized list of all users with the fields the division editor offers."""
+    return get_list_serializer(UserShortRead, {}).dump_json(db.exec(select(User).order_by(User.id)).all())
+
+def read_bootstrap_json(db: Session, encoding: str | None) -> bytes:
+    """
+    Every list the Common Definitions page and its editors load, as one JSON
+    object compressed with `encoding`. All lists are read in `db`, so rows
+    loaded for one relationship are reused by the next from the session's
+    identity map; lists still cached from the list endpoints are not read again.
+    """
+    return cached_bootstrap_json(db, "mp_common_definitions", frozenset(bootstrap_tables), lambda: {
+        "locations": read_all_locations_json(db),
+        "warehouses": read_all_warehouses_json(db),
+        "laboratories": read_all_laboratories_json(db),
+        "divisions": read_all_divisions_json(db),
+        "users": read_all_users_short_json(db),
+    }, encoding)
+# endregion
+
+# region Hierarchy
+hierarchy_tables = ("location", "warehouse", "division", "laboratory", "user")
+
+# Response key -> (link column of the parent, link column of the child)
+hierarchy_links = {
+    "location_warehouses": (LocationWarehouseLink.location_id, LocationWarehouseLink.warehouse_id),
+    "warehouse_divisions": (DivisionWarehouseLink.warehouse_id, DivisionWarehouseLink.division_id),
+    "division_laboratories": (DivisionLaboratoryLink.division_id, DivisionLaboratoryLink.laboratory_id),
+    "division_users": (DivisionUserLink.division_id, DivisionUserLink.user_id),
+}
+
+hierarchy_adapter = TypeAdapter(HierarchyRead)
+
+def _load_hierarchy(db: Session) -> bytes:
+    hierarchy = {}
+    for name, model, short_model in (
+        ("locations", Location, LocationShortRead),
+        ("warehouses", Warehouse, WarehouseShortRead),
+        ("divisions", Division, DivisionShortRead),
+        ("laboratories", Laboratory, LaboratoryShortRead),
+        ("users", User, UserShortRead),
+    ):
+        columns = [getattr(model, field) for field in short_model.model_fields]
+        hierarchy[name] = [dict(row._mapping) for row in db.exec(select(*columns).order_by(model.id))]
+    for name, (parent, child) in hierarchy_links.items():
+        adjacency = {}
+        for parent_id, child_id in db.exec(select(parent, child).distinct().order_by(parent, child)):
+            adjacency.setdefault(parent_id, []).append(child_id)
+        hierarchy[name] = adjacency
+    return hierarchy_adapter.dump_json(hierarchy_adapter.validate_python(hierarchy))
+
+def read_hierarchy_json(db: Session) -> bytes:
+    """
+    The whole Location -> Warehouse -> Division -> Laboratory/User graph as
+    JSON: each node once, and one parent -> children map per link table.
+    Built with one query per node table and one per link table, and served
+    from the reference cache until a commit writes one of its tables.
+    """
+    key = ("hierarchy", session_table_versions(db, hierarchy_tables))
+    return reference_cache.get_or_load(key, frozenset(hierarchy_tables), lambda: _load_hierarchy(db))
+# endregion
@@ -0,0 +1,86 @@
+from collections import defaultdict
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy import inspect as sa_inspect, select
+from sqlmodel import Session, SQLModel
+
+class PageParams(BaseModel):
+    """Keyset pagination, column projection and relationship opt-in for list endpoints."""
+    after: int | None = None
+    limit: int = 100
+    fields: list[str] | None = None
+    include: list[str] = []
+
+def relationship_columns(model: type[SQLModel], name: str):
+    """(link column pointing at `model`, link column pointing at the target, target class)."""
+    relationship = sa_inspect(model).relationships[name]
+    local_column = relationship.synchronize_pairs[0][1]
+    remote_column = relationship.secondary_synchronize_pairs[0][1]
+    return local_column, remote_column, relationship.mapper.class_
+
+def attach_relationships(
+    db: Session,
+    model: type[SQLModel],
+    rows: list[dict],
+    include: list[str],
+    relationships: dict[str, type[BaseModel]],
+) -> None:
+    """Adds each included relationship to `rows` with one link-table query per relationship."""
+    ids = [row["id"] for row in rows]
+    for name in include:
+        local_column, remote_column, target = relationship_columns(model, name)
+        short_fields = list(relationships[name].model_fields)
+        related = db.execute(
+            select(local_column, *(getattr(target, field) for field in short_fields))
+            .join(target, remote_column == target.id)
+            .where(local_column.in_(ids))
+            .order_by(local_column, target.id)
+        )
+        grouped = defaultdict(list)
+        for owner_id, *values in related:
+            grouped[owner_id].append(dict(zip(short_fields, values)))
+        for row in rows:
+            row[name] = grouped[row["id"]]
+
+def scalar_fields(read_model: type[BaseModel], relationships: dict[str, type[BaseModel]]) -> list[str]:
+    """The column fields a read model exposes, i.e. everything but its relationships."""
+    return [name for name in read_model.model_fields if name not in relationships]
+
+def read_page(
+    db: Session,
+    model: type[SQLModel],
+    read_model: type[BaseModel],
+    params: PageParams,
+    relationships: dict[str, type[BaseModel]],
+) -> tuple[list[dict], int | None]:
+    """
+    Reads one page of `model` rows ordered by id, starting after `params.after`.
+
+    Only the requested columns are selected; `relationships` maps the names a
+    caller may `include` to the short read model of the related rows. Each
+    included relationship costs one query over the link table for the whole
+    page. Returns the rows and the cursor for the next page (None on the last).
+    """
+    columns = scalar_fields(read_model, relationships)
+    fields = params.fields or columns
+    unknown = [name for name in fields if name not in columns]
+    unknown += [name for name in params.include if name not in relationships]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown field(s): {', '.join(unknown)}",
+        )
+    # The id is the cursor, so it is always part of the page
+    fields = ["id"] + [name for name in dict.fromkeys(fields) if name != "id"]
+
+    statement = select(*(getattr(model, name) for name in fields)).order_by(model.id).limit(params.limit)
+    if params.after is not None:
+        statement = statement.where(model.id > params.after)
+    rows = [dict(row._mapping) for row in db.execute(statement)]
+    if not rows:
+        return rows, None
+
+    attach_relationships(db, model, rows, params.include, relationships)
+    next_after = rows[-1]["id"] if len(rows) == params.limit else None
+    return rows, next_after
@@ -0,0 +1,49 @@
+import json
+from typing import Callable, Iterable
+
+from pydantic import BaseModel
+from sqlmodel import Session
+
+from app.core.cache import reference_cache
+from app.core.compression import compress
+from app.core.serialization import get_list_serializer
+from app.core.versions import session_table_versions
+
+def cached_list_json(
+    db: Session,
+    table: str,
+    read_model: type[BaseModel],
+    relationships: dict[str, type[BaseModel]],
+    load: Callable[[], Iterable],
+) -> bytes:
+    """
+    The JSON list of `read_model` built from `load()`, served from the reference
+    cache until a commit bumps `table` (writes to embedded tables bump it too).
+
+    Entries are keyed by the version of `table` read in `db` (the one the
+    ETag was made from), so a worker that has not yet heard of another
+    worker's commit builds the list again instead of serving its old one.
+    """
+    serializer = get_list_serializer(read_model, relationships)
+    key = (table, session_table_versions(db, (table,)))
+    return reference_cache.get_or_load(key, frozenset({table}), lambda: serializer.dump_json(load()))
+
+def cached_bootstrap_json(
+    db: Session,
+    name: str,
+    tables: frozenset[str],
+    load: Callable[[], dict[str, bytes]],
+    encoding: str | None,
+) -> bytes:
+    """
+    The serialized lists returned by `load()` joined into one JSON object and
+    compressed with `encoding`, cached per encoding and versions of `tables`
+    until a commit bumps one of them. The lists themselves usually come
+    from `cached_list_json`.
+    """
+    def build() -> bytes:
+        parts = load()
+        body = b"{" + b",".join(json.dumps(key).encode() + b":" + part for key, part in parts.items()) + b"}"
+        return compress(body, encoding)
+    key = ("bootstrap", name, encoding, session_table_versions(db, tuple(sorted(tables))))
+    return reference_cache.get_or_load(key, tables, build)
@@ -0,0 +1,66 @@
+import re
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.core.search import fts_table, search_indexes
+from app.models import SearchHit
+
+searchable_tables = tuple(search_indexes)
+
+# What a hit shows per table: (code column, name expression)
+search_labels = {
+    "location": ("code", "base.name"),
+    "warehouse": ("code", "base.name"),
+    "laboratory": ("code", "base.name"),
+    "division": ("code", "base.name"),
+    "user": ("username", "base.name || ' ' || base.surname"),
+}
+# bm25 weight per indexed column, in search_indexes order: a code or username
+# match ranks above a name match, which ranks above the rest
+search_weights = {
+    "location": (10.0, 5.0, 1.0, 1.0),
+    "warehouse": (10.0, 5.0, 1.0),
+    "laboratory": (10.0, 5.0, 1.0),
+    "division": (10.0, 5.0, 1.0),
+    "user": (10.0, 5.0, 5.0, 2.0),
+}
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+def match_expression(q: str) -> str | None:
+    """
+    'war ist' -> '"war"* "ist"*': every word of `q` as a quoted prefix term,
+    all of which must match. Quoting keeps FTS5 operators in `q` literal.
+    None when `q` has no words.
+    """
+    terms = _TERM.findall(q)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+def search(db: Session, q: str, tables: list[str], limit: int) -> list[SearchHit]:
+    """The best `limit` hits for `q` over `tables`, best first."""
+    match = match_expression(q)
+    if match is None:
+        return []
+    hits = []
+    for table in tables:
+        fts = fts_table(table)
+        code, name = search_labels[table]
+        weights = ", ".join(str(weight) for weight in search_weights[table])
+        rows = db.execute(text(
+            f"SELECT base.id, base.{code}, {name}, bm25({fts}, {weights}) AS rank "
+            f'FROM {fts} JOIN "{table}" AS base ON base.id = {fts}.rowid '
+            f"WHERE {fts} MATCH :match ORDER BY rank LIMIT :limit"
+        ), {"match": match, "limit": limit})
+        hits.extend(
+            SearchHit(entity=table, id=id, code=code_value, name=name_value, rank=rank)
+            for id, code_value, name_value, rank in rows
+        )
+    # bm25 scores of different tables are not comparable (each has its own
+    # term statistics), so hits whose code starts with a word of `q` go first
+    # whatever the table; within each group a lower bm25 is a better match
+    prefixes = tuple(term.lower() for term in _TERM.findall(q))
+    hits.sort(key=lambda hit: (not hit.code.lower().startswith(prefixes), hit.rank))
+    return hits[:limit]
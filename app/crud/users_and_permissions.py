@@ -1,14 +1,27 @@
+from typing import Iterator
+
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import datetime, timezone
 from sqlalchemy.orm import selectinload
 from fastapi import HTTPException, status
 from app.models import (
     UserRole, UserRoleCreate, UserRoleUpdate, UserRoleRead,
     UserSkill, UserSkillCreate, UserSkillUpdate, UserSkillRead,
-    User, UserCreate, UserType, UserUpdate, UserRead,
-    Module, ModuleRead, Division, DivisionRead)
-
-from app.dependencies.auth import get_password_hash
+    User, UserCreate, UserType, UserUpdate, UserMembersUpdate, UserRead,
+    Module, ModuleRead, Division, DivisionRead, UserRoleLink,
+    UserShortRead, UserRoleShortRead, UserSkillShortRead, ModuleShortRead, DivisionShortRead)
+
+from app.dependencies.auth import get_password_hash, invalidate_principal, bump_authz_version
+from app.core.versions import bump_table_versions
+from app.crud.pagination import PageParams, read_page
+from app.crud.reference import cached_bootstrap_json, cached_list_json
+from app.crud.mp_common_definitions import read_all_divisions_json
+from app.crud.codes import require_code_ids
+from app.crud.links import change_links, change_links_by_code, replace_links, require_ids
+from app.crud.grid import GridRowsRequest, GridRowsResponse, read_grid_rows
+from app.crud.export import export_rows
+from app.crud.changes import CREATE, changed_fields, record_changes, record_delete, record_update, register_feed_entity
 
 
 # region userrole crud
@@ -20,6 +33,21 @@ def read_all_roles(db: Session) -> list[UserRoleRead]:
     statement = select(UserRole).options(selectinload(UserRole.users))
     return db.exec(statement).all()
 
+def read_all_roles_json(db: Session) -> bytes:
+    return cached_list_json(db, "userrole", UserRoleRead, role_relationships, lambda: read_all_roles(db))
+
+role_relationships = {"users": UserShortRead}
+register_feed_entity(UserRole, UserRoleRead, role_relationships, module="users_and_permissions", superadmin_only=True)
+
+def read_roles_page(db: Session, params: PageParams) -> tuple[list[dict], int | None]:
+    return read_page(db, UserRole, UserRoleRead, params, role_relationships)
+
+def read_roles_rows(db: Session, request: GridRowsRequest) -> GridRowsResponse:
+    return read_grid_rows(db, UserRole, UserRoleRead, request, role_relationships)
+
+def export_roles(fmt: str, include: list[str] | None, batch_size: int) -> Iterator[str]:
+    return export_rows(UserRole, UserRoleRead, fmt, include, role_relationships, batch_size)
+
 def create_role(*, db: Session, role_create: UserRoleCreate) -> UserRole:
     if db.exec(select(UserRole).where(UserRole.rolename == role_create.rolename)).first():
         raise HTTPException(
@@ -28,6 +56,9 @@ def create_role(*, db: Session, role_create: UserRoleCreate) -> UserRole:
         )
     role = UserRole.model_validate(role_create)
     db.add(role)
+    db.flush()
+    record_changes(db, "userrole", [role.id], CREATE)
+    bump_table_versions(db, "userrole")
     db.commit()
     db.refresh(role)
     return role
@@ -42,8 +73,13 @@ def update_role(*, db: Session, db_role: UserRole, input_role: UserRoleUpdate) -
                 detail=f"Role '{input_role.rolename}' already exists",
             )
     role_data = input_role.model_dump(exclude_unset=True)
+    fields = changed_fields(db_role, role_data)
     db_role.sqlmodel_update(role_data)
+    record_update(db, db_role, fields)
+    # Role flags are aggregated into the members' token claims
+    bump_authz_version(db, db.exec(select(UserRoleLink.user_id).where(UserRoleLink.role_id == db_role.id)).all())
     db.add(db_role)
+    bump_table_versions(db, "userrole")
     db.commit()
     db.refresh(db_role)
     return db_role
@@ -52,7 +88,10 @@ def delete_role(db: Session, role_id: int) -> bool:
     role = db.get(UserRole, role_id)
     if not role:
         return False
+    bump_authz_version(db, db.exec(select(UserRoleLink.user_id).where(UserRoleLink.role_id == role_id)).all())
+    record_delete(db, role)
     db.delete(role)
+    bump_table_versions(db, "userrole")
     db.commit()
     return True
 #endregion
@@ -70,6 +109,21 @@ def read_all_skills(db: Session) -> list[UserSkillRead]:
     statement = select(UserSkill).options(selectinload(UserSkill.users))
     return db.exec(statement).all()
 
+def read_all_skills_json(db: Session) -> bytes:
+    return cached_list_json(db, "userskill", UserSkillRead, skill_relationships, lambda: read_all_skills(db))
+
+skill_relationships = {"users": UserShortRead}
+register_feed_entity(UserSkill, UserSkillRead, skill_relationships, module="users_and_permissions", superadmin_only=True)
+
+def read_skills_page(db: Session, params: PageParams) -> tuple[list[dict], int | None]:
+    return read_page(db, UserSkill, UserSkillRead, params, skill_relationships)
+
+def read_skills_rows(db: Session, request: GridRowsRequest) -> GridRowsResponse:
+    return read_grid_rows(db, UserSkill, UserSkillRead, request, skill_relationships)
+
+def export_skills(fmt: str, include: list[str] | None, batch_size: int) -> Iterator[str]:
+    return export_rows(UserSkill, UserSkillRead, fmt, include, skill_relationships, batch_size)
+
 def create_skill(*, db: Session, skill_create: UserSkillCreate) -> UserSkill:
     """
     Insert a new UserSkill, guarding against duplicate skill names.
@@ -82,6 +136,9 @@ def create_skill(*, db: Session, skill_create: UserSkillCreate) -> UserSkill:
 
     skill = UserSkill.model_validate(skill_create)
     db.add(skill)
+    db.flush()
+    record_changes(db, "userskill", [skill.id], CREATE)
+    bump_table_versions(db, "userskill")
     db.commit()
     db.refresh(skill)
     return skill
@@ -105,9 +162,12 @@ def update_skill(
 
     # Scalar updates
     skill_data = input_skill.model_dump(exclude_unset=True)
+    fields = changed_fields(db_skill, skill_data)
     db_skill.sqlmodel_update(skill_data)
+    record_update(db, db_skill, fields)
 
     db.add(db_skill)
+    bump_table_versions(db, "userskill")
     db.commit()
     db.refresh(db_skill)
     return db_skill
@@ -118,7 +178,9 @@ def delete_skill(db: Session, skill_id: int) -> bool:
     if not skill:
         return False
 
+    record_delete(db, skill)
     db.delete(skill)          # link rows removed via ON DELETE CASCADE
+    bump_table_versions(db, "userskill")
     db.commit()
     return True
 
@@ -141,6 +203,26 @@ def read_all_users(db: Session) -> list[UserRead]:
         selectinload(User.divisions))
     return db.exec(statement).all()
 
+def read_all_users_json(db: Session) -> bytes:
+    return cached_list_json(db, "user", UserRead, user_relationships, lambda: read_all_users(db))
+
+user_relationships = {
+    "roles": UserRoleShortRead,
+    "skills": UserSkillShortRead,
+    "modules": ModuleShortRead,
+    "divisions": DivisionShortRead,
+}
+register_feed_entity(User, UserRead, user_relationships, module="users_and_permissions", superadmin_only=True)
+
+def read_users_page(db: Session, params: PageParams) -> tuple[list[dict], int | None]:
+    return read_page(db, User, UserRead, params, user_relationships)
+
+def read_users_rows(db: Session, request: GridRowsRequest) -> GridRowsResponse:
+    return read_grid_rows(db, User, UserRead, request, user_relationships)
+
+def export_users(fmt: str, include: list[str] | None, batch_size: int) -> Iterator[str]:
+    return export_rows(User, UserRead, fmt, include, user_relationships, batch_size)
+
 def create_user(*, db: Session, user_create: UserCreate, created_by:str) -> User:
     # Check for existing username/email
     if db.exec(select(User).where(
@@ -155,48 +237,30 @@ def create_user(*, db: Session, user_create: UserCreate, created_by:str) -> User
     db_user = User(**user_data, hashed_pw=hashed_pw, created_by=created_by, last_modified_by=created_by)
     db.add(db_user)
     db.flush()
+    record_changes(db, "user", [db_user.id], CREATE)
     
     # Super‑admin gets *all* existing modules (ignores modules)
     if user_create.usertype == UserType.superadmin:
-        db_user.modules = db.exec(select(Module)).all()
+        replace_links(db, db_user, "modules", db.exec(select(Module.id)).all())
     elif user_create.modules:
         # Get the module ID for "Users & Permissions" (if it exists)
-        restricted_module = db.exec(select(Module).where(Module.name == "Users & Permissions")).first()    
+        restricted_id = db.exec(select(Module.id).where(Module.name == "Users & Permissions")).first()
         # Filter out "Users & Permissions" from the requested modules
-        requested_ids = set(user_create.modules)
-        if restricted_module:
-            requested_ids.discard(restricted_module.id)
-        
-        modules = db.exec(select(Module).where(Module.id.in_(requested_ids))).all()
-        # Check if all requested modules are valid
-        if len(modules) != len(requested_ids):
-            missing = requested_ids - {m.id for m in modules}
-            raise HTTPException(status_code=404, detail=f"Modules not found: {missing}")
-
-        db_user.modules = modules
+        requested_ids = [module_id for module_id in user_create.modules if module_id != restricted_id]
+        replace_links(db, db_user, "modules", require_ids(db, Module, requested_ids, "Modules"))
 
     if user_create.roles:
-        roles = db.exec(select(UserRole).where(UserRole.id.in_(user_create.roles))).all()
-        if len(roles) != len(set(user_create.roles)):
-            missing = set(user_create.roles) - {r.id for r in roles}
-            raise HTTPException(status_code=404, detail=f"Roles not found: {missing}")
-        db_user.roles = roles
+        replace_links(db, db_user, "roles", require_ids(db, UserRole, user_create.roles, "Roles"))
 
     if user_create.skills:
-        skills = db.exec(select(UserSkill).where(UserSkill.id.in_(user_create.skills))).all()
-        if len(skills) != len(set(user_create.skills)):
-            missing = set(user_create.skills) - {r.id for r in skills}
-            raise HTTPException(status_code=404, detail=f"Skills not found: {missing}")
-        db_user.skills = skills
+        replace_links(db, db_user, "skills", require_ids(db, UserSkill, user_create.skills, "Skills"))
 
     if user_create.divisions:
-        divisions = db.exec(select(Division).where(Division.code.in_(user_create.divisions))).all()
-        if len(divisions) != len(set(user_create.divisions)):
-            missing = set(user_create.divisions) - {div.code for div in divisions}
-            raise HTTPException(status_code=404, detail=f"Divisions not found: {missing}")
-        db_user.divisions = divisions
+        division_ids = require_code_ids(db, "division", user_create.divisions, "Divisions")
+        replace_links(db, db_user, "divisions", division_ids)
 
     db.add(db_user)
+    bump_table_versions(db, "user")
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -217,52 +281,72 @@ def update_user(*, db: Session, db_user: User, user_update: UserUpdate, updated_
         if db.exec(select(User).where(User.email == user_update.email)).first():
             raise HTTPException(status_code=400, detail="Email already exists")
 
+    old_username = db_user.username
     data = user_update.model_dump(exclude_unset=True, exclude={"roles", "modules", "skills", 'divisions'})
     data["last_modified_at"] = datetime.now(timezone.utc)
     data["last_modified_by"] = updated_by
+    fields = changed_fields(db_user, data)
     db_user.sqlmodel_update(data)
+    record_update(db, db_user, fields)
 
     # Determine the *new* usertype (may have been updated above)
     new_usertype = data.get("usertype", db_user.usertype)
 
     if user_update.roles is not None:   # None ➜ leave unchanged
-        role_ids = [r.id if isinstance(r, UserRole) else r for r in user_update.roles]
-        roles = db.exec(select(UserRole).where(UserRole.id.in_(role_ids))).all()
-        if len(roles) != len(set(role_ids)):
-            missing = set(role_ids) - {r.id for r in roles}
-            raise HTTPException(status_code=404, detail=f"Roles not found: {missing}")
-        db_user.roles = roles
+        replace_links(db, db_user, "roles", require_ids(db, UserRole, user_update.roles, "Roles"))
 
     if user_update.skills is not None:   # None ➜ leave unchanged
-        skill_ids = [r.id if isinstance(r, UserSkill) else r for r in user_update.skills]
-        skills = db.exec(select(UserSkill).where(UserSkill.id.in_(skill_ids))).all()
-        if len(skills) != len(set(skill_ids)):
-            missing = set(skill_ids) - {r.id for r in skills}
-            raise HTTPException(status_code=404, detail=f"Skills not found: {missing}")
-        db_user.skills = skills
+        replace_links(db, db_user, "skills", require_ids(db, UserSkill, user_update.skills, "Skills"))
     if user_update.divisions is not None:   # None ➜ leave unchanged
-        divisions = db.exec(select(Division).where(Division.code.in_(user_update.divisions))).all()
-        if len(divisions) != len(set(user_update.divisions)):
-            missing = set(user_update.divisions) - {div.code for div in divisions}
-            raise HTTPException(status_code=404, detail=f"Divisions not found: {missing}")
-        db_user.divisions = divisions
+        division_ids = require_code_ids(db, "division", user_update.divisions, "Divisions")
+        replace_links(db, db_user, "divisions", division_ids)
 
     if new_usertype == UserType.superadmin:
         # Super‑admin always owns every module, ignoring payload
-        db_user.modules = db.exec(select(Module)).all()
+        replace_links(db, db_user, "modules", db.exec(select(Module.id)).all())
     elif user_update.modules is not None:                # None ➜ leave unchanged
-        module_ids = [m.id if isinstance(m, Module) else m for m in user_update.modules]
-        modules = db.exec(select(Module).where(Module.id.in_(module_ids))).all()
-        if len(modules) != len(set(module_ids)):
-            missing = set(module_ids) - {m.id for m in modules}
-            raise HTTPException(status_code=404, detail=f"Modules not found: {missing}")
-        db_user.modules = modules
+        replace_links(db, db_user, "modules", require_ids(db, Module, user_update.modules, "Modules"))
 
+    bump_authz_version(db, [db_user.id])
     db.add(db_user)
+    bump_table_versions(db, "user")
     db.commit()
+    invalidate_principal(old_username)
     db.refresh(db_user)
     return db_user
 
+def update_user_members(*, db: Session, db_user: User, members: UserMembersUpdate, updated_by: str) -> None:
+    """
+    Links and unlinks some of a user's roles, skills and modules (by ID) and
+    divisions (by code), leaving the others alone. A super‑admin's modules
+    are not changed, they always own every module.
+    """
+    changed = False
+    for name, model, label in (("roles", UserRole, "Roles"), ("skills", UserSkill, "Skills"), ("modules", Module, "Modules")):
+        changes = getattr(members, name)
+        if changes is None or (name == "modules" and db_user.usertype == UserType.superadmin):
+            continue
+        changed |= any(change_links(
+            db, db_user, name,
+            require_ids(db, model, changes.add, label),
+            require_ids(db, model, changes.remove, label),
+        ))
+    if members.divisions is not None:
+        changed |= any(change_links_by_code(db, db_user, "divisions", "division", members.divisions, "Divisions"))
+
+    if changed:
+        data = {"last_modified_at": datetime.now(timezone.utc), "last_modified_by": updated_by}
+        fields = changed_fields(db_user, data)
+        db_user.sqlmodel_update(data)
+        record_update(db, db_user, fields)
+        db.add(db_user)
+        bump_authz_version(db, [db_user.id])
+        bump_table_versions(db, "user")
+    username = db_user.username
+    db.commit()
+    if changed:
+        invalidate_principal(username)
+
 def delete_user(*, db: Session, username: str, protect_superadmin: bool = True) -> bool:
     """
     Hard‑delete a user (and cascading link rows).
@@ -281,14 +365,69 @@ def delete_user(*, db: Session, username: str, protect_superadmin: bool = True)
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Deleting a super‑admin is not allowed")
 
+    bump_authz_version(db, [user.id])
+    record_delete(db, user)
     db.delete(user)      # ON DELETE CASCADE covers link tables
+    bump_table_versions(db, "user")
     db.commit()
+    invalidate_principal(username)
     return True
 # endregion
 
+# region async user crud (used by the async request path)
+async def get_user_async(db: AsyncSession, username: str) -> User | None:
+    """Fetches the bare user row, without relationships."""
+    return (await db.exec(select(User).where(User.username == username))).first()
+
+async def get_user_by_email_async(db: AsyncSession, email: str) -> User | None:
+    return (await db.exec(select(User).where(User.email == email))).first()
+
+async def read_user_async(db: AsyncSession, username: str) -> UserRead | None:
+    statement = select(User).options(
+        selectinload(User.roles),
+        selectinload(User.modules),
+        selectinload(User.skills),
+        selectinload(User.divisions)).where(User.username == username)
+    return (await db.exec(statement)).first()
+# endregion
+
 # region module crud
 def read_all_modules(db: Session) -> list[ModuleRead]:
     statement = select(Module).options(selectinload(Module.users))
     return db.exec(statement).all()
+
+def read_all_modules_json(db: Session) -> bytes:
+    return cached_list_json(db, "module", ModuleRead, module_relationships, lambda: read_all_modules(db))
+
+module_relationships = {"users": UserShortRead}
+register_feed_entity(Module, ModuleRead, module_relationships, module="users_and_permissions", superadmin_only=True)
+
+def read_modules_page(db: Session, params: PageParams) -> tuple[list[dict], int | None]:
+    return read_page(db, Module, ModuleRead, params, module_relationships)
+
+def read_modules_rows(db: Session, request: GridRowsRequest) -> GridRowsResponse:
+    return read_grid_rows(db, Module, ModuleRead, request, module_relationships)
+
+def export_modules(fmt: str, include: list[str] | None, batch_size: int) -> Iterator[str]:
+    return export_rows(Module, ModuleRead, fmt, include, module_relationships, batch_size)
 # endregion
 
+# region Bootstrap
+bootstrap_tables = ("userrole", "userskill", "module", "user", "division")
+
+def read_bootstrap_json(db: Session, encoding: str | None) -> bytes:
+    """
+    Every list the Users & Permissions page and its user editor load, as one
+    JSON object compressed with `encoding`. All lists are read in `db`, so the
+    users loaded for one relationship are reused by the next from the
+    session's identity map; lists still cached from the list endpoints are
+    not read again.
+    """
+    return cached_bootstrap_json(db, "users_and_permissions", frozenset(bootstrap_tables), lambda: {
+        "userroles": read_all_roles_json(db),
+        "userskills": read_all_skills_json(db),
+        "modules": read_all_modules_json(db),
+        "users": read_all_users_json(db),
+        "divisions": read_all_divisions_json(db),
+    }, encoding)
+# endregion
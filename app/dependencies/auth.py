@@ -1,22 +1,34 @@
 from fastapi import (
     Depends, HTTPException, status, 
     APIRouter, Response, Query, 
-    Cookie)
+    Cookie, Request)
 from fastapi.responses import RedirectResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlmodel import Session, select
+from sqlmodel import Session, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event
+from sqlalchemy.orm import selectinload
 
 import re
+import math
+import uuid
+import asyncio
+import threading
 import jwt
 from jwt.exceptions import InvalidTokenError
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from datetime import datetime, timedelta, timezone
-from typing import Annotated
+from typing import Annotated, Callable, TypeVar
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 
 from app.core.config import settings
-from app.models import User, UserRead
-from app.core.database import get_session
+from app.core.cache import TTLCache
+from app.core.revocation import token_denylist
+from app.core.throttle import LoginThrottle, MemoryThrottleStore, SQLiteThrottleStore
+from app.models import User, UserRead, UserPrincipal, UserType
+from app.core.database import get_session, get_async_session
 
 auth_router = APIRouter(
     prefix="/auth",
@@ -34,11 +46,66 @@ def get_password_hash(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+# region password hashing pool
+# bcrypt takes 100-300 ms per call and releases the GIL, so async handlers hand it
+# to a small dedicated pool instead of running it on the event loop. The pool is
+# bounded: once PASSWORD_HASH_MAX_PENDING calls are queued or running, new ones
+# are refused with 503 instead of piling up behind the workers.
+T = TypeVar("T")
+
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash",
+)
+_hash_pending = 0
+_hash_pending_lock = threading.Lock()
+
+def _release_hash_slot(_future) -> None:
+    global _hash_pending
+    with _hash_pending_lock:
+        _hash_pending -= 1
+
+async def _run_in_hash_pool(func: Callable[..., T], *args) -> T:
+    global _hash_pending
+    busy_exception = HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many concurrent password operations, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+    with _hash_pending_lock:
+        if _hash_pending >= settings.PASSWORD_HASH_MAX_PENDING:
+            raise busy_exception
+        _hash_pending += 1
+    future = _hash_executor.submit(func, *args)
+    # The slot is freed when the work really finishes, even if we stop waiting.
+    future.add_done_callback(_release_hash_slot)
+    try:
+        return await asyncio.wait_for(
+            asyncio.wrap_future(future), timeout=settings.PASSWORD_HASH_TIMEOUT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        raise busy_exception
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_in_hash_pool(get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_hash_pool(verify_password, plain_password, hashed_password)
+
+def get_hash_pool_stats() -> dict[str, int]:
+    return {
+        "workers": settings.PASSWORD_HASH_WORKERS,
+        "pending": _hash_pending,
+        "max_pending": settings.PASSWORD_HASH_MAX_PENDING,
+    }
+# endregion
+
 
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 
 SessionDep = Annotated[Session, Depends(get_session)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
 
 class Token(BaseModel):
     access_token: str
@@ -47,17 +114,166 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     username: str
 
+class TokenPermissions(BaseModel):
+    """Role flags aggregated over all of the user's roles (a flag is set if any role sets it)."""
+    can_create: bool = False
+    can_read: bool = False
+    can_update: bool = False
+    can_delete: bool = False
+
+class TokenClaims(BaseModel):
+    """
+    Signed authorization claims carried by the access token.
+
+    `ver` is the user's `authz_version` at login time. Every write that changes
+    what ends up in these claims bumps that counter, so a token whose `ver` no
+    longer matches is stale and gets rejected.
+    """
+    sub: str
+    usertype: UserType
+    modules: list[int] = []
+    divisions: list[str] = []
+    perms: TokenPermissions = TokenPermissions()
+    ver: int
+    # Set by create_access_token; `jti` keys the revocation denylist
+    jti: str | None = None
+    exp: int | None = None
+
 def get_user(db: Session, username: str) -> User|None:
     statement = select(User).where(User.username == username)
     userindb = db.exec(statement).first()
     if userindb:
         return userindb
 
-def authenticate_user(db: Session, username: str, password: str) -> User|bool:
-    userindb = get_user(db, username)
+# region principal cache
+# Token -> UserPrincipal. Lets most authenticated requests skip the user SELECT.
+# The cache is per process: writes invalidate it locally and the TTL bounds how
+# long another worker can keep serving a stale principal.
+principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+async def load_principal(db: AsyncSession, username: str) -> UserPrincipal | None:
+    statement = select(User).options(selectinload(User.modules)).where(User.username == username)
+    userindb = (await db.exec(statement)).first()
+    if userindb:
+        return UserPrincipal.model_validate(userindb)
+
+def invalidate_principal(username: str) -> int:
+    """Drop every cached principal of `username`. Call after any write to that user."""
+    return principal_cache.discard_where(lambda _, principal: principal.username == username)
+# endregion
+
+# region authz versions
+# username -> current authz_version, so checking a token's `ver` claim is one
+# cached integer comparison instead of a user + relationships load.
+authz_versions = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+async def get_authz_version(db: AsyncSession, username: str) -> int | None:
+    version = authz_versions.get(username)
+    if version is None:
+        version = (await db.exec(select(User.authz_version).where(User.username == username))).first()
+        if version is not None:
+            authz_versions.set(username, version)
+    return version
+
+def bump_authz_version(db: Session, user_ids) -> None:
+    """
+    Invalidate the token claims of the given users inside the caller's transaction.
+
+    The cached versions and principals are dropped once the session commits.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    # Read the stored names, not pending renames, since those are what old tokens carry
+    with db.no_autoflush:
+        usernames = db.exec(select(User.username).where(User.id.in_(user_ids))).all()
+    db.exec(
+        update(User)
+        .where(User.id.in_(user_ids))
+        .values(authz_version=User.authz_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.info.setdefault("stale_authz_users", set()).update(usernames)
+
+@event.listens_for(Session, "after_commit")
+def _forget_stale_authz_users(session) -> None:
+    for username in session.info.pop("stale_authz_users", ()):
+        authz_versions.pop(username)
+        invalidate_principal(username)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_stale_authz_users(session) -> None:
+    session.info.pop("stale_authz_users", None)
+
+def build_access_claims(user: User) -> dict:
+    perms = TokenPermissions(
+        can_create=any(role.can_create for role in user.roles),
+        can_read=any(role.can_read for role in user.roles),
+        can_update=any(role.can_update for role in user.roles),
+        can_delete=any(role.can_delete for role in user.roles),
+    )
+    claims = TokenClaims(
+        sub=user.username,
+        usertype=user.usertype,
+        modules=sorted(module.id for module in user.modules),
+        divisions=sorted(division.code for division in user.divisions),
+        perms=perms,
+        ver=user.authz_version,
+    )
+    return claims.model_dump(mode="json", exclude_none=True)
+# endregion
+
+# region login throttling
+# Checked before the user lookup and bcrypt, so a flood of guesses is answered
+# with cheap 429s instead of burning hashing CPU.
+if settings.LOGIN_THROTTLE_BACKEND == "sqlite":
+    _throttle_store = SQLiteThrottleStore(settings.LOGIN_THROTTLE_SQLITE_PATH)
+else:
+    _throttle_store = MemoryThrottleStore()
+
+username_throttle = LoginThrottle(
+    _throttle_store,
+    burst=settings.LOGIN_THROTTLE_USER_BURST,
+    per_minute=settings.LOGIN_THROTTLE_USER_PER_MINUTE,
+    free_failures=settings.LOGIN_THROTTLE_FREE_FAILURES,
+    max_backoff=settings.LOGIN_THROTTLE_MAX_BACKOFF_SECONDS,
+)
+ip_throttle = LoginThrottle(
+    _throttle_store,
+    burst=settings.LOGIN_THROTTLE_IP_BURST,
+    per_minute=settings.LOGIN_THROTTLE_IP_PER_MINUTE,
+    free_failures=settings.LOGIN_THROTTLE_IP_FREE_FAILURES,
+    max_backoff=settings.LOGIN_THROTTLE_MAX_BACKOFF_SECONDS,
+)
+
+async def _call_throttle(func, *args):
+    # The shared store does file I/O; the in-memory one is cheap enough to call inline
+    if settings.LOGIN_THROTTLE_BACKEND == "sqlite":
+        return await run_in_threadpool(func, *args)
+    return func(*args)
+
+def get_login_throttle_stats() -> dict[str, dict[str, int]]:
+    return {"username": username_throttle.stats(), "ip": ip_throttle.stats()}
+# endregion
+
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> User|bool:
+    statement = select(User).options(
+        selectinload(User.roles),
+        selectinload(User.modules),
+        selectinload(User.divisions)).where(User.username == username)
+    userindb = (await db.exec(statement)).first()
     if not userindb:
         return False
-    if not verify_password(password, userindb.hashed_pw):
+    # Hand the pooled connection back before waiting on bcrypt, otherwise a burst
+    # of logins holds every connection while the hashes queue up.
+    await db.close()
+    if not await verify_password_async(password, userindb.hashed_pw):
         return False
     return userindb
 
@@ -67,50 +283,82 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
     
-async def get_current_user(
-        db: SessionDep,
+async def get_auth_token(
         token: Annotated[str|None, Depends(oauth2_scheme)],
         cookie_token: Annotated[str|None, Cookie(alias=settings.COOKIE_NAME, description="You only need to fill this parameter if you're not logged in. Otherwise, the cookie existing in your browser will provide it.")] = None
-        ) -> UserRead:
+        ) -> str:
+    auth_token = token or cookie_token
+    if not auth_token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return auth_token
 
+async def get_token_claims(
+        db: AsyncSessionDep,
+        auth_token: Annotated[str, Depends(get_auth_token)],
+        ) -> TokenClaims:
+    """
+    Decode and verify the access token. Authorization checks that only need
+    usertype, modules, divisions or role flags can depend on this alone.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    auth_token = token or cookie_token
-    
-    if not auth_token:
-        raise credentials_exception
-    
     try:
         payload = jwt.decode(auth_token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
+        claims = TokenClaims.model_validate(payload)
+    except (InvalidTokenError, ValidationError):
+        raise credentials_exception
 
-    except InvalidTokenError:
+    if claims.jti is None or claims.jti in token_denylist:
         raise credentials_exception
-    
-    user = get_user(db, username=username)
+
+    if claims.ver != await get_authz_version(db, claims.sub):
+        principal_cache.pop(auth_token)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Permissions have changed, please log in again",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return claims
+
+async def get_current_user(
+        db: AsyncSessionDep,
+        auth_token: Annotated[str, Depends(get_auth_token)],
+        claims: Annotated[TokenClaims, Depends(get_token_claims)],
+        ) -> UserPrincipal:
+    user = principal_cache.get(auth_token)
     if user is None:
-        raise credentials_exception
+        user = await load_principal(db, username=claims.sub)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        principal_cache.set(auth_token, user)
     return user
 
 async def get_current_active_user(
-    current_user: Annotated[UserRead, Depends(get_current_user)],
-) -> UserRead:
+    current_user: Annotated[UserPrincipal, Depends(get_current_user)],
+) -> UserPrincipal:
     if current_user.is_active == False:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user")
     return current_user
 
 async def get_current_superadmin(
-    current_user: Annotated[UserRead, Depends(get_current_active_user)]
-) -> UserRead:
+    current_user: Annotated[UserPrincipal, Depends(get_current_active_user)],
+    claims: Annotated[TokenClaims, Depends(get_token_claims)],
+) -> UserPrincipal:
     """
     Dependency to get the current active user and check if they are a superadmin.
 
@@ -120,8 +368,8 @@ async def get_current_superadmin(
     Returns:
         The user object if they are a superadmin.
     """
-    # Check if the user object has the 'usertype' attribute and if it's 'superadmin'
-    if getattr(current_user, "usertype", None) != "superadmin":
+    # The usertype comes from the signed, version-checked token claims
+    if claims.usertype != UserType.superadmin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="The user doesn't have the required permissions.",
@@ -132,19 +380,38 @@ async def get_current_superadmin(
 async def login_for_access_token(
     response: Response,
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    db: SessionDep,
+    db: AsyncSessionDep,
+    request: Request,
     set_cookie: bool=True
 ) -> Token:
-    user = authenticate_user(db, form_data.username, form_data.password)
+    # Behind a reverse proxy, run uvicorn with --proxy-headers so this is the real client
+    user_key = f"user:{form_data.username.lower()}"
+    ip_key = f"ip:{request.client.host if request.client else 'unknown'}"
+    retry_after = max(
+        await _call_throttle(username_throttle.acquire, user_key),
+        await _call_throttle(ip_throttle.acquire, ip_key),
+    )
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, please try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
+        await _call_throttle(username_throttle.record_failure, user_key)
+        await _call_throttle(ip_throttle.record_failure, ip_key)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    await _call_throttle(username_throttle.record_success, user_key)
+
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=build_access_claims(user), expires_delta=access_token_expires
     )
 
     # Set secure cookie if requested
@@ -161,8 +428,22 @@ async def login_for_access_token(
     return Token(access_token=access_token, token_type="bearer")
 
 @auth_router.post("/logout", name='logout', response_class=RedirectResponse)
-async def logout(response: Response):
-    """Logout endpoint that clears the cookie"""
+async def logout(
+    response: Response,
+    token: Annotated[str|None, Depends(oauth2_scheme)],
+    cookie_token: Annotated[str|None, Cookie(alias=settings.COOKIE_NAME)] = None,
+):
+    """Logout endpoint that revokes the presented token and clears the cookie"""
+    auth_token = token or cookie_token
+    if auth_token:
+        try:
+            payload = jwt.decode(auth_token, SECRET_KEY, algorithms=[ALGORITHM])
+        except InvalidTokenError:
+            payload = {}
+        if payload.get("jti") and payload.get("exp"):
+            await run_in_threadpool(token_denylist.revoke, payload["jti"], payload.get("sub", ""), payload["exp"])
+            principal_cache.pop(auth_token)
+
     response = RedirectResponse("/", status_code=302)
     response.delete_cookie(
         key=settings.COOKIE_NAME,
@@ -172,3 +453,13 @@ async def logout(response: Response):
         path="/", 
     )
     return response
+
+def get_auth_stats() -> dict:
+    """Counters of the login throttle, the password hashing pool and the auth caches."""
+    return {
+        "login_throttle": get_login_throttle_stats(),
+        "password_hash_pool": get_hash_pool_stats(),
+        "principal_cache": principal_cache.stats(),
+        "authz_versions": authz_versions.stats(),
+        "revoked_tokens": len(token_denylist),
+    }
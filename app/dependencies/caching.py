@@ -0,0 +1,70 @@
+from urllib.parse import urlencode
+
+from fastapi import Depends, HTTPException, Request, status
+from sqlmodel import Session
+from starlette.datastructures import MutableHeaders
+
+from app.core.compression import preferred_encoding
+from app.core.database import get_read_session
+from app.core.versions import make_etag, read_table_versions
+from app.dependencies.auth import TokenClaims, get_current_active_user, get_token_claims
+
+CACHE_CONTROL = "private, no-cache"
+
+def versioned(*tables: str, encoded: bool = False, by_usertype: bool = False, auth=get_current_active_user):
+    """
+    Dependency for GET endpoints whose output only changes with the versions of `tables`.
+    Set `encoded` when the endpoint compresses its body itself, so that each
+    content coding gets its own ETag. `auth` is the endpoint's own user
+    dependency; it runs first, so only a client allowed to read the data
+    learns its version or gets a 304. Set `by_usertype` when the body also
+    depends on the caller's usertype, so each usertype gets its own ETag.
+
+    Answers 304 Not Modified when the client already holds the current ETag,
+    before the endpoint runs its query. Otherwise the ETag is left on
+    `request.state` for ETagMiddleware to send with the response.
+    """
+    def check_version(
+        request: Request,
+        claims: TokenClaims = Depends(get_token_claims),
+        _=Depends(auth),
+        db: Session = Depends(get_read_session),
+    ) -> None:
+        query = urlencode(sorted(request.query_params.multi_items()))
+        if encoded:
+            query += f"#{preferred_encoding(request.headers.get('accept-encoding'))}"
+        if by_usertype:
+            query += f"#{claims.usertype.value}"
+        etag = make_etag(tables, read_table_versions(db, tables), request.url.path, query)
+        if_none_match = request.headers.get("if-none-match", "")
+        # A bare "*" matches any current representation, not the one the client holds
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in candidates:
+            raise HTTPException(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+            )
+        request.state.etag = etag
+    return Depends(check_version)
+
+class ETagMiddleware:
+    """Adds the ETag computed by `versioned` to successful responses, whatever response class the endpoint used."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                etag = scope.get("state", {}).get("etag")
+                if etag:
+                    headers = MutableHeaders(scope=message)
+                    headers["ETag"] = etag
+                    headers["Cache-Control"] = CACHE_CONTROL
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
@@ -0,0 +1,61 @@
+from typing import Annotated, Iterator, Literal
+
+from fastapi import Depends, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from app.core.serialization import FastJSONResponse
+from app.crud.export import EXPORT_FORMATS
+from app.crud.pagination import PageParams
+
+MAX_PAGE_SIZE = 1000
+
+def _split(value: str | None) -> list[str]:
+    return [part.strip() for part in value.split(",") if part.strip()] if value else []
+
+def get_page_params(
+    after: Annotated[int | None, Query(ge=0, description="Return rows with an id greater than this cursor")] = None,
+    limit: Annotated[int | None, Query(ge=1, le=MAX_PAGE_SIZE, description="Page size")] = None,
+    fields: Annotated[str | None, Query(description="Comma separated columns to return")] = None,
+    include: Annotated[str | None, Query(description="Comma separated relationships to return")] = None,
+) -> PageParams | None:
+    """
+    Parses the paging query parameters of a list endpoint. Returns None when
+    none is given, so the endpoint keeps returning the complete list with all
+    relationships, which is what the grids expect.
+    """
+    if after is None and limit is None and fields is None and include is None:
+        return None
+    return PageParams(
+        after=after,
+        limit=limit or PageParams.model_fields["limit"].default,
+        fields=_split(fields) or None,
+        include=_split(include),
+    )
+
+PageDep = Annotated[PageParams | None, Depends(get_page_params)]
+
+def page_response(rows: list[dict], next_after: int | None) -> FastJSONResponse:
+    """A page is a plain JSON list; the cursor of the next page travels in `X-Next-After`."""
+    headers = {"X-Next-After": str(next_after)} if next_after is not None else None
+    return FastJSONResponse(content=rows, headers=headers)
+
+class ExportParams(BaseModel):
+    format: Literal["ndjson", "csv"]
+    include: list[str] | None
+
+def get_export_params(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    include: Annotated[str | None, Query(description="Comma separated relationships to export, all by default")] = None,
+) -> ExportParams:
+    return ExportParams(format=format, include=None if include is None else _split(include))
+
+ExportDep = Annotated[ExportParams, Depends(get_export_params)]
+
+def export_response(name: str, fmt: str, chunks: Iterator[str]) -> StreamingResponse:
+    """Sends the chunks of an export as they are produced, as a file download."""
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
@@ -1,20 +1,32 @@
 import os
 import uuid
+import asyncio
+import anyio
 from typing import Annotated
 from fastapi import FastAPI, Request, Depends, HTTPException,UploadFile, File, Form
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, RedirectResponse
 from starlette.middleware.sessions import SessionMiddleware
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.models import UserRead, User, Module
 
-from app.core.database import init_db, get_session
+from app.core.database import init_db, get_session, get_async_session, async_engine
+from app.crud.users_and_permissions import get_user_async, get_user_by_email_async
 from app.dependencies.auth import (
-    auth_router, get_current_active_user, 
-    verify_password, get_password_hash)
+    auth_router, get_current_active_user, get_current_superadmin,
+    verify_password_async, get_password_hash_async, invalidate_principal,
+    get_auth_stats)
 from app.core.config import settings
+from app.core.revocation import token_denylist, run_denylist_maintenance
+from app.core.metrics import get_pool_stats
+from app.core.versions import bump_table_versions
+from app.core.cache import reference_cache
+from app.crud.changes import changed_fields, feed_entities, read_live_changes, record_update
+from app.core.broadcast import change_broadcaster
+from app.dependencies.caching import ETagMiddleware
+from app.core.static_assets import FingerprintedStaticFiles, StaticMount
 from app.core.utils import (
     flash, get_flashed_messages, 
     redirect_to_route, is_valid_email)
@@ -24,30 +36,77 @@ from app.api.users_and_permissions import users_and_permissions_router
 from app.api.design_test_catalogue import design_test_catalogue_router
 from app.api.lab_quality_control import lab_quality_control_router
 from app.api.mp_common_definitions import mp_common_definitions_router
+from app.api.search import search_router
+from app.api.changes import changes_router
+from app.api.live import live_router
 
 async def lifespan(app: FastAPI):
-    # Load the ML model
+    # Sync endpoints run on this many worker threads (AnyIO's default is 40)
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_TOKENS
     init_db()
+    token_denylist.maintain()
+    denylist_task = asyncio.create_task(
+        run_denylist_maintenance(settings.TOKEN_DENYLIST_REFRESH_SECONDS)
+    )
+    broadcast_task = asyncio.create_task(change_broadcaster.run(
+        read_live_changes,
+        lambda entity: feed_entities[entity].module,
+        settings.LIVE_POLL_SECONDS,
+        settings.LIVE_BATCH_SIZE,
+    ))
     yield
+    broadcast_task.cancel()
+    denylist_task.cancel()
+    await async_engine.dispose()
 
 app = FastAPI(lifespan=lifespan, title='M&P Portal', description='Outsourcing responsibility is the fastest path to regret.')
 
 # Session Middleware
 app.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY)
+app.add_middleware(ETagMiddleware)
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+# Mount static files; url_for('static', path=...) resolves to the fingerprinted names of a build
+app.router.routes.append(StaticMount(
+    "/static",
+    app=FingerprintedStaticFiles(directory="app/static", build_directory=settings.STATIC_BUILD_DIR),
+    name="static",
+))
 
 # Jinja2 templates
 templates = Jinja2Templates(directory="app/templates")
 
 SessionDep = Annotated[Session, Depends(get_session)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
 
 app.include_router(auth_router)
 app.include_router(users_and_permissions_router)
 app.include_router(design_test_catalogue_router)
 app.include_router(lab_quality_control_router)
 app.include_router(mp_common_definitions_router)
+app.include_router(search_router)
+app.include_router(changes_router)
+app.include_router(live_router)
+
+@app.get("/metrics", name="metrics", tags=["Metrics"])
+async def metrics(current_user: Annotated[UserRead, Depends(get_current_superadmin)]) -> dict:
+    """
+    Runtime counters: connection pools per engine, the thread pool that runs
+    sync endpoints, the authentication layer, the reference data cache and
+    the live change push.
+    """
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter_stats = limiter.statistics()
+    return {
+        "database_pools": get_pool_stats(),
+        "threadpool": {
+            "total": limiter_stats.total_tokens,
+            "borrowed": limiter_stats.borrowed_tokens,
+            "waiting": limiter_stats.tasks_waiting,
+        },
+        "auth": get_auth_stats(),
+        "reference_cache": reference_cache.stats(),
+        "live": change_broadcaster.stats(),
+    }
 
 @app.get("/", response_class=HTMLResponse, include_in_schema=False)
 def login_form(request: Request):
@@ -74,10 +133,10 @@ async def dashboard(
 async def user_profile(
     request: Request, 
     current_user: Annotated[UserRead, Depends(get_current_active_user)],
-    db: Session = Depends(get_session)
+    db: AsyncSessionDep,
 ):
     # Refresh user data from database
-    db_user = db.exec(select(User).where(User.username == current_user.username)).first()
+    db_user = await get_user_async(db, current_user.username)
     if not db_user:
         raise HTTPException(status_code=404, detail="UserRead not found")
     
@@ -94,20 +153,20 @@ async def user_profile(
 async def update_profile(
     request: Request,
     current_user: UserRead = Depends(get_current_active_user),
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_async_session),
     email: str = Form(...),
     profile_image: UploadFile = File(None),
 ):
     try:
         # Refresh user data
-        user = db.exec(select(User).where(User.username == current_user.username)).first()
+        user = await get_user_async(db, current_user.username)
         if not user:
             raise HTTPException(status_code=404, detail="UserRead not found")
         
         # Check if email is being changed
         if email != user.email:
             # Verify new email is not taken
-            existing_user = db.exec(select(User).where(User.email == email)).first()
+            existing_user = await get_user_by_email_async(db, email)
             if existing_user and existing_user.username != user.username:
                 flash(request, "Email is already in use by another account.", "error")
                 return redirect_to_route(request, "user_profile")
@@ -117,7 +176,7 @@ async def update_profile(
             return redirect_to_route(request, "user_profile")
                
         # Update email only (name, surname, title are now read-only)
-        user.email = email
+        profile = {"email": email}
         
         # Handle profile image upload
         images_path = os.path.join('app', 'static', 'images')
@@ -148,11 +207,15 @@ async def update_profile(
                 if os.path.exists(old_path):
                     os.remove(old_path)
             
-            user.profile_image_path = filename
+            profile["profile_image_path"] = filename
             
-
+        fields = changed_fields(user, profile)
+        user.sqlmodel_update(profile)
         db.add(user)
-        db.commit()
+        await db.run_sync(record_update, user, fields)
+        await db.run_sync(bump_table_versions, "user")
+        await db.commit()
+        invalidate_principal(user.username)
 
         # Success messages
         flash(request, "Profile updated successfully!", "success")
@@ -167,14 +230,14 @@ async def update_profile(
 async def update_password(
     request: Request,
     current_user: UserRead = Depends(get_current_active_user),
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_async_session),
     current_password: str = Form(...),
     new_password: str = Form(...),
     confirm_password: str = Form(...)
 ):
     try:
         # Refresh user data to ensure we have the latest
-        user = db.exec(select(User).where(User.username == current_user.username)).first()
+        user = await get_user_async(db, current_user.username)
         if not user:
             flash(request, "UserRead not found.", "error")
             return redirect_to_route(request, "user_profile")
@@ -183,16 +246,19 @@ async def update_password(
             flash(request, "New passwords do not match.", "error")
             return redirect_to_route(request, "user_profile")
 
-        
+        # Release the connection while bcrypt runs; db.add() re-attaches the user below
+        await db.close()
+
         # Verify current password
-        if not verify_password(current_password, user.hashed_pw):
+        if not await verify_password_async(current_password, user.hashed_pw):
             flash(request, "Current password is incorrect.", "error")
             return redirect_to_route(request, "user_profile")
         
         # Update password
-        user.hashed_pw = get_password_hash(new_password)
+        user.hashed_pw = await get_password_hash_async(new_password)
         db.add(user)
-        db.commit()
+        await db.commit()
+        invalidate_principal(user.username)
         flash(request, "Password changed successfully!", "success")
 
     except Exception as e:
@@ -1,8 +1,8 @@
 from enum import Enum
 from sqlmodel import SQLModel, Field, Relationship
 from datetime import datetime, timezone
-from pydantic import EmailStr
-from sqlalchemy import Column, ForeignKey
+from pydantic import EmailStr, ConfigDict
+from sqlalchemy import JSON, Column, ForeignKey
 
 class UserRoleLink(SQLModel, table=True):
     user_id: int = Field(
@@ -102,6 +102,16 @@ class DivisionUserLink(SQLModel, table=True):
         )
     )
 
+# region Membership changes
+class LinkChanges(SQLModel):
+    add: list[str] = Field(default_factory=list, description="Codes to link")
+    remove: list[str] = Field(default_factory=list, description="Codes to unlink; an entry also in `add` stays linked")
+
+class LinkIdChanges(SQLModel):
+    add: list[int] = Field(default_factory=list, description="IDs to link")
+    remove: list[int] = Field(default_factory=list, description="IDs to unlink; an entry also in `add` stays linked")
+# endregion
+
 # region User models
 class UserType(str, Enum):
     superadmin = "superadmin"
@@ -130,6 +140,8 @@ class UserBase(UserImagelessBase):
 class User(UserBase, table=True):
     id:          int | None    = Field(default=None, primary_key=True)
     hashed_pw:   str
+    # Bumped whenever something carried in the token claims changes (see app.dependencies.auth)
+    authz_version: int         = Field(default=0, sa_column_kwargs={"server_default": "0"})
 
     roles: list["UserRole"] = Relationship(
         back_populates="users",
@@ -172,6 +184,14 @@ class UserRead(UserImagelessBase):
 class UserShortRead(UserShortBase):
     id: int
 
+class UserPrincipal(UserImagelessBase):
+    """Detached, read-only snapshot of the authenticated user, safe to share between requests."""
+    model_config = ConfigDict(frozen=True)
+
+    id: int
+    profile_image_path: str
+    modules: list["ModuleNavRead"] = Field(default_factory=list)
+
 class UserUpdate(SQLModel):
     username:    str           = Field(default=None)
     email:       EmailStr      = Field(default=None)
@@ -185,6 +205,12 @@ class UserUpdate(SQLModel):
     modules: list[int] | None = Field(default=None, description="List of module IDs to assign to the user")
     skills: list[int] | None = Field(default=None, description="List of skill IDs to assign to the user")
     divisions: list[str] | None = Field(default=None, description="List of division codes to assign to the user")
+
+class UserMembersUpdate(SQLModel):
+    roles: LinkIdChanges | None = None
+    modules: LinkIdChanges | None = None
+    skills: LinkIdChanges | None = None
+    divisions: LinkChanges | None = Field(default=None, description="Division codes")
 #endregion
 
 # region UserRole models
@@ -276,6 +302,11 @@ class Module(ModuleBase, table=True):
 class ModuleShortRead(ModuleBase):
     id: int
 
+class ModuleNavRead(ModuleBase):
+    id: int
+    linkname: str
+    image_url: str
+
 class ModuleRead(ModuleBase):
     id: int
     users: list["UserShortRead"] | None = None
@@ -328,6 +359,11 @@ class DivisionUpdate(DivisionBase):
     warehouses: list[str] | None = Field(default=None, description="List of warehouse codes to assign to the division")
     users: list[str] | None = Field(default=None, description="List of employee usernames to assign to the division")
 
+class DivisionMembersUpdate(SQLModel):
+    laboratories: LinkChanges | None = Field(default=None, description="Laboratory codes")
+    warehouses: LinkChanges | None = Field(default=None, description="Warehouse codes")
+    users: LinkChanges | None = Field(default=None, description="Employee usernames")
+
 # endregion
 
 # region Location models
@@ -403,6 +439,10 @@ class WarehouseUpdate(WarehouseBase):
     locations: list[str] | None = Field(default=None, description="List of location codes to assign to the warehouse")
     divisions: list[str] | None = Field(default=None, description="List of division codes to assign to the warehouse")
 
+class WarehouseMembersUpdate(SQLModel):
+    locations: LinkChanges | None = Field(default=None, description="Location codes")
+    divisions: LinkChanges | None = Field(default=None, description="Division codes")
+
 # endregion
 
 # region Laboratory models
@@ -436,4 +476,73 @@ class LaboratoryUpdate(LaboratoryBase):
     description: str | None = Field(default=None, max_length=255)
     divisions: list[str] | None = Field(default=None, description="List of division codes to assign to the laboratory")
 
+class LaboratoryMembersUpdate(SQLModel):
+    divisions: LinkChanges | None = Field(default=None, description="Division codes")
+
+# endregion
+
+# region Hierarchy models
+class HierarchyRead(SQLModel):
+    """Every organization node once, plus parent id -> child ids maps for each kind of link."""
+    locations: list[LocationShortRead]
+    warehouses: list[WarehouseShortRead]
+    divisions: list[DivisionShortRead]
+    laboratories: list[LaboratoryShortRead]
+    users: list[UserShortRead]
+    location_warehouses: dict[int, list[int]]
+    warehouse_divisions: dict[int, list[int]]
+    division_laboratories: dict[int, list[int]]
+    division_users: dict[int, list[int]]
+# endregion
+
+# region Search models
+class SearchHit(SQLModel):
+    """One search result; `code` is the username for users. Lower `rank` is a better match."""
+    entity: str
+    id: int
+    code: str
+    name: str
+    rank: float
+# endregion
+
+# region Token revocation models
+class RevokedToken(SQLModel, table=True):
+    # AUTOINCREMENT: workers follow new revocations by id, so a swept id must never come back
+    __table_args__ = {"sqlite_autoincrement": True}
+    id: int | None = Field(default=None, primary_key=True)
+    jti: str = Field(index=True, unique=True)
+    username: str
+    expires_at: int = Field(index=True, description="The token's exp claim (Unix time); the row is swept after it")
+    revoked_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+# endregion
+
+# region Schema state models
+class SchemaState(SQLModel, table=True):
+    """Fingerprint of the schema and seed data init_db last applied, so unchanged boots skip it."""
+    name: str = Field(primary_key=True)
+    fingerprint: str
+    applied_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+# endregion
+
+# region Table version models
+class TableVersion(SQLModel, table=True):
+    """Monotonic change counter per table, bumped by every write that can alter the table's read output."""
+    name: str = Field(primary_key=True)
+    version: int = Field(default=0)
+# endregion
+
+# region Change log models
+class ChangeLog(SQLModel, table=True):
+    """
+    Append-only record of every create, update and delete the CRUD layer
+    commits, one row per entity row affected. `seq` is the change feed cursor.
+    """
+    # AUTOINCREMENT: a sequence number is never handed out twice
+    __table_args__ = {"sqlite_autoincrement": True}
+    seq: int | None = Field(default=None, primary_key=True)
+    entity: str
+    entity_id: int
+    op: str
+    fields: list[str] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+    changed_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 # endregion
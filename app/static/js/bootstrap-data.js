@@ -0,0 +1,48 @@
+// Lists a module page needs when it opens come together from the module's
+// /bootstrap endpoint (#bootstrap-url). Each *-url element in base.html names
+// its list's key in that response with data-bootstrap-key. Until this page
+// saves a change, managers take their lists from the bootstrap response
+// instead of requesting every list endpoint.
+let bootstrap = null;
+let stale = false;
+
+function loadBootstrap() {
+  const element = document.querySelector("#bootstrap-url");
+  if (!element || stale) return Promise.resolve(null);
+  if (!bootstrap) {
+    bootstrap = fetch(element.dataset.url, {
+      method: 'GET',
+      headers: { 'Accept': 'application/json' }
+    })
+      .then(response => response.ok ? response.json() : null)
+      .catch(() => null);
+  }
+  return bootstrap;
+}
+
+function bootstrapKey(url) {
+  for (const element of document.querySelectorAll("[data-bootstrap-key]")) {
+    if (element.dataset.urlGetAll === url) return element.dataset.bootstrapKey;
+  }
+  return null;
+}
+
+// The list behind a get-all URL, from the bootstrap response when it has it
+export async function fetchList(url, entityName) {
+  const key = bootstrapKey(url);
+  const data = key ? await loadBootstrap() : null;
+  if (!stale && data && key in data) return data[key];
+
+  const response = await fetch(url, {
+    method: 'GET',
+    headers: { 'Accept': 'application/json' }
+  });
+  if (!response.ok) throw new Error(`Failed to fetch ${entityName}: ${response.status}`);
+  return await response.json();
+}
+
+// Call after a successful write: later reads go to the list endpoints again
+export function invalidateBootstrap() {
+  stale = true;
+  bootstrap = null;
+}
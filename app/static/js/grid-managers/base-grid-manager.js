@@ -1,3 +1,6 @@
+import { fetchList, invalidateBootstrap } from '../bootstrap-data.js';
+import { onChanges } from '../live-updates.js';
+
 // Base class for all grid managers
 export class BaseGridManager {
   constructor(gridSelector, preferredColumnOrder = []) {
@@ -8,6 +11,11 @@ export class BaseGridManager {
     this.tomSelectInstances = {};
     
     this.initializeEventListeners();
+
+    const liveEntity = this.getLiveEntity();
+    if (liveEntity) {
+      onChanges(liveEntity, (changes) => this.applyLiveChanges(changes));
+    }
   }
 
   // Abstract methods to be implemented by subclasses
@@ -24,6 +32,9 @@ export class BaseGridManager {
   async initializeTomSelects() {}
   populateForm(data) { }
 
+  // Override in subclasses to receive the pushed changes of this entity (its table name)
+  getLiveEntity() { return null; }
+
   // Override in subclasses to define how to identify the item for updates
   getUpdateIdentifier(data) { 
     return data.id;
@@ -67,16 +78,7 @@ export class BaseGridManager {
 
   // Common fetch method
   async fetchData() {
-    const response = await fetch(this.getApiUrls().getAll, {
-      method: 'GET',
-      headers: { 'Accept': 'application/json' }
-    });
-
-    if (!response.ok) {
-      throw new Error(`Failed to fetch ${this.getEntityName()}s: ${response.status}`);
-    }
-
-    return await response.json();
+    return fetchList(this.getApiUrls().getAll, `${this.getEntityName()}s`);
   }
   
   // Common grid options creation
@@ -352,6 +354,7 @@ export class BaseGridManager {
       });
 
       if (response.ok) {
+        invalidateBootstrap();
         const newItem = await response.json();
         const success = this.addNew(newItem);
         
@@ -392,6 +395,7 @@ export class BaseGridManager {
       });
 
       if (response.ok) {
+        invalidateBootstrap();
         const updatedItem = await response.json();
         const updatedData = { ...pending.rowData, ...updatedItem };
         
@@ -419,6 +423,7 @@ export class BaseGridManager {
       const response = await fetch(deleteUrl, { method: "DELETE" });
 
       if (response.status === 204 || response.ok) {
+        invalidateBootstrap();
         this.gridDiv.__agGridInstance.applyTransaction({ 
           remove: [pending.rowNode.data] 
         });
@@ -472,6 +477,31 @@ export class BaseGridManager {
     return true;
   }
 
+  // Applies changes pushed by the server, whoever made them
+  applyLiveChanges(changes) {
+    const grid = this.gridDiv?.__agGridInstance;
+    // Not opened yet: it loads the current list when it is
+    if (!grid) return;
+    const isEmptyGrid = !grid.getColumnDefs() || grid.getColumnDefs().length === 0;
+    if (changes === null || isEmptyGrid) {
+      this.loadData();
+      return;
+    }
+
+    const add = [], update = [], remove = [];
+    for (const change of changes) {
+      const node = grid.getRowNode(String(change.id));
+      if (change.op === "delete") {
+        if (node) remove.push(node.data);
+      } else if (node) {
+        update.push({ ...node.data, ...change.data });
+      } else if (change.op === "create") {
+        add.push(change.data);
+      }
+    }
+    grid.applyTransaction({ add, update, remove });
+  }
+
   // Common grid reinitialization
   reinitializeGridWithData(data) {
     const gridOptions = this.createGridOptions(data);
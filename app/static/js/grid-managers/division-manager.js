@@ -1,4 +1,5 @@
 import { BaseGridManager } from './base-grid-manager.js';
+import { fetchList } from '../bootstrap-data.js';
 
 const grid = document.querySelector("#divisions-url");
 
@@ -57,6 +58,8 @@ export class DivisionManager extends BaseGridManager {
 
   getEntityName() { return "Division"; }
 
+  getLiveEntity() { return "division"; }
+
   getApiUrls() {
     return {
       getAll: grid.dataset.urlGetAll,
@@ -165,32 +168,14 @@ export class DivisionManager extends BaseGridManager {
 
 
   async fetchLaboratories() {
-    const grid = document.querySelector("#laboratories-url");
-    const response = await fetch(grid.dataset.urlGetAll, {
-      method: 'GET',
-      headers: { 'Accept': 'application/json' }
-    });
-    if (!response.ok) throw new Error('Failed to fetch laboratories');
-    return await response.json();
+    return fetchList(document.querySelector("#laboratories-url").dataset.urlGetAll, "laboratories");
   }
 
   async fetchWarehouses() {
-    const grid = document.querySelector("#warehouses-url");
-      const response = await fetch(grid.dataset.urlGetAll, {
-          method: 'GET',
-          headers: { 'Accept': 'application/json' }
-      });
-      if (!response.ok) throw new Error('Failed to fetch warehouses');
-      return await response.json();
+    return fetchList(document.querySelector("#warehouses-url").dataset.urlGetAll, "warehouses");
   }
   async fetchUsers() {
-    const grid = document.querySelector("#users-url");
-      const response = await fetch(grid.dataset.urlGetAll, {
-          method: 'GET',
-          headers: { 'Accept': 'application/json' }
-      });
-      if (!response.ok) throw new Error('Failed to fetch users');
-      return await response.json();
+    return fetchList(document.querySelector("#users-url").dataset.urlGetAll, "users");
   }
 
   populateForm(data) {
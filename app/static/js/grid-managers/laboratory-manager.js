@@ -1,4 +1,5 @@
 import { BaseGridManager } from './base-grid-manager.js';
+import { fetchList } from '../bootstrap-data.js';
 
 const grid = document.querySelector("#laboratories-url");
 
@@ -35,6 +36,8 @@ export class LaboratoryManager extends BaseGridManager {
 
   getEntityName() { return "Laboratory"; }
 
+  getLiveEntity() { return "laboratory"; }
+
   getApiUrls() {
     return {
       getAll: grid.dataset.urlGetAll,
@@ -113,13 +116,7 @@ export class LaboratoryManager extends BaseGridManager {
   }
 
   async fetchDivisions() {
-    const grid = document.querySelector("#divisions-url");
-      const response = await fetch(grid.dataset.urlGetAll, {
-          method: 'GET',
-          headers: { 'Accept': 'application/json' }
-      });
-      if (!response.ok) throw new Error('Failed to fetch divisions');
-      return await response.json();
+    return fetchList(document.querySelector("#divisions-url").dataset.urlGetAll, "divisions");
   }
 
   populateForm(data) {
@@ -9,6 +9,8 @@ export class LocationManager extends BaseGridManager {
 
   getEntityName() { return "Location"; }
 
+  getLiveEntity() { return "location"; }
+
   getApiUrls() {
     return {
       getAll: grid.dataset.urlGetAll,
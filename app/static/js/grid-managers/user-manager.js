@@ -1,4 +1,5 @@
 import { BaseGridManager } from './base-grid-manager.js';
+import { fetchList } from '../bootstrap-data.js';
 
 const grid = document.querySelector("#users-url");
 
@@ -69,6 +70,8 @@ export class UserManager extends BaseGridManager {
 
   getEntityName() { return "User"; }
 
+  getLiveEntity() { return "user"; }
+
   getUpdateIdentifier(data) { 
     return data.username; 
   }
@@ -234,42 +237,18 @@ export class UserManager extends BaseGridManager {
   }
 
   async fetchRoles() {
-    const roleGrid = document.querySelector("#user-roles-url");
-    const response = await fetch(roleGrid.dataset.urlGetAll, {
-      method: 'GET',
-      headers: { 'Accept': 'application/json' }
-    });
-    if (!response.ok) throw new Error('Failed to fetch roles');
-    return await response.json();
+    return fetchList(document.querySelector("#user-roles-url").dataset.urlGetAll, "roles");
   }
 
   async fetchSkills() {
-    const skillGrid = document.querySelector("#user-skills-url");
-      const response = await fetch(skillGrid.dataset.urlGetAll, {
-          method: 'GET',
-          headers: { 'Accept': 'application/json' }
-      });
-      if (!response.ok) throw new Error('Failed to fetch skills');
-      return await response.json();
+    return fetchList(document.querySelector("#user-skills-url").dataset.urlGetAll, "skills");
   }
 
   async fetchModules() {
-    const moduleGrid = document.querySelector("#user-modules-url");
-    const response = await fetch(moduleGrid.dataset.urlGetAll, {
-      method: 'GET',
-      headers: { 'Accept': 'application/json' }
-    });
-    if (!response.ok) throw new Error('Failed to fetch modules');
-    return await response.json();
+    return fetchList(document.querySelector("#user-modules-url").dataset.urlGetAll, "modules");
   }
   async fetchDivisions() {
-    const moduleGrid = document.querySelector("#divisions-url");
-    const response = await fetch(moduleGrid.dataset.urlGetAll, {
-      method: 'GET',
-      headers: { 'Accept': 'application/json' }
-    });
-    if (!response.ok) throw new Error('Failed to fetch divisions');
-    return await response.json();
+    return fetchList(document.querySelector("#divisions-url").dataset.urlGetAll, "divisions");
   }
   populateForm(data) {
     document.getElementById("users-username").value = data.username || "";
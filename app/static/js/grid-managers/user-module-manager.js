@@ -10,6 +10,8 @@ export class UserModuleManager extends BaseGridManager {
 
   getEntityName() { return "Module"; }
 
+  getLiveEntity() { return "module"; }
+
   getApiUrls() {
     return {
       getAll: grid.dataset.urlGetAll,
@@ -9,6 +9,8 @@ export class UserRoleManager extends BaseGridManager {
 
   getEntityName() { return "Role"; }
 
+  getLiveEntity() { return "userrole"; }
+
 	getApiUrls() {
 		return {
 			getAll: grid.dataset.urlGetAll,
@@ -9,6 +9,8 @@ export class UserSkillManager extends BaseGridManager {
 
 	getEntityName() { return "Skill"; }
 
+	getLiveEntity() { return "userskill"; }
+
 	getApiUrls() {
 		return {
 			getAll: grid.dataset.urlGetAll,
@@ -1,4 +1,5 @@
 import { BaseGridManager } from './base-grid-manager.js';
+import { fetchList } from '../bootstrap-data.js';
 
 const grid = document.querySelector("#warehouses-url");
 
@@ -46,6 +47,8 @@ export class WarehouseManager extends BaseGridManager {
 
   getEntityName() { return "Warehouse"; }
 
+  getLiveEntity() { return "warehouse"; }
+
   getApiUrls() {
     return {
       getAll: grid.dataset.urlGetAll,
@@ -146,23 +149,11 @@ export class WarehouseManager extends BaseGridManager {
   }
 
   async fetchLocations() {
-    const grid = document.querySelector("#locations-url");
-    const response = await fetch(grid.dataset.urlGetAll, {
-      method: 'GET',
-      headers: { 'Accept': 'application/json' }
-    });
-    if (!response.ok) throw new Error('Failed to fetch locations');
-    return await response.json();
+    return fetchList(document.querySelector("#locations-url").dataset.urlGetAll, "locations");
   }
 
   async fetchDivisions() {
-    const grid = document.querySelector("#divisions-url");
-      const response = await fetch(grid.dataset.urlGetAll, {
-          method: 'GET',
-          headers: { 'Accept': 'application/json' }
-      });
-      if (!response.ok) throw new Error('Failed to fetch divisions');
-      return await response.json();
+    return fetchList(document.querySelector("#divisions-url").dataset.urlGetAll, "divisions");
   }
 
   populateForm(data) {
@@ -0,0 +1,86 @@
+// Keeps the grids of a module page current without polling: the server
+// pushes every create, update and delete of the module's entities over the
+// WebSocket named by #live-url. After a reconnect, what was missed comes
+// from the change feed (data-changes-url) before the pushes resume.
+import { invalidateBootstrap } from './bootstrap-data.js';
+
+const handlers = new Map();
+let socket = null;
+let cursor = null;
+let retryDelay = 1000;
+
+// `handler(changes)` gets the changes of `entity`, or null when the page fell
+// behind and must reload that entity's list
+export function onChanges(entity, handler) {
+  if (!handlers.has(entity)) handlers.set(entity, []);
+  handlers.get(entity).push(handler);
+  connect();
+}
+
+function connect() {
+  const element = document.querySelector("#live-url");
+  if (!element || socket) return;
+  const url = new URL(element.dataset.url, window.location.href);
+  url.protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
+  socket = new WebSocket(url);
+  socket.addEventListener("open", () => { retryDelay = 1000; });
+  socket.addEventListener("message", (event) => receive(JSON.parse(event.data)));
+  socket.addEventListener("close", () => {
+    socket = null;
+    setTimeout(connect, retryDelay);
+    retryDelay = Math.min(retryDelay * 2, 30000);
+  });
+}
+
+async function receive(message) {
+  if (message.type === "hello") {
+    if (cursor !== null && message.cursor > cursor) await catchUp(cursor, message.cursor);
+    cursor = message.cursor;
+  } else if (message.type === "resync") {
+    cursor = message.cursor;
+    resync();
+  } else {
+    cursor = message.cursor;
+    dispatch(message.changes);
+  }
+}
+
+async function catchUp(since, until) {
+  const changesUrl = document.querySelector("#live-url").dataset.changesUrl;
+  try {
+    while (since < until) {
+      const response = await fetch(`${changesUrl}?since=${since}`, {
+        method: 'GET',
+        headers: { 'Accept': 'application/json' }
+      });
+      if (!response.ok) throw new Error(`Failed to fetch changes: ${response.status}`);
+      const feed = await response.json();
+      dispatch(feed.changes);
+      if (!feed.has_more) break;
+      since = feed.cursor;
+    }
+  } catch (error) {
+    console.warn("Could not catch up on missed changes, reloading", error);
+    resync();
+  }
+}
+
+function dispatch(changes) {
+  if (!changes.length) return;
+  invalidateBootstrap();
+  const byEntity = new Map();
+  for (const change of changes) {
+    if (!byEntity.has(change.entity)) byEntity.set(change.entity, []);
+    byEntity.get(change.entity).push(change);
+  }
+  for (const [entity, entityChanges] of byEntity) {
+    (handlers.get(entity) || []).forEach(handler => handler(entityChanges));
+  }
+}
+
+function resync() {
+  invalidateBootstrap();
+  for (const entityHandlers of handlers.values()) {
+    entityHandlers.forEach(handler => handler(null));
+  }
+}
@@ -0,0 +1,210 @@
+# python -m benchmarks.live_fanout hub --subscribers 200
+# python -m benchmarks.live_fanout server --username admin --password secret
+#
+# "hub" measures the live change push in process: bursts of changes are
+# published to N subscriptions, each drained by its own task that takes
+# coalesced messages and serializes them as the WebSocket endpoint does.
+# A fraction of the subscribers is slow, so the report shows what folding
+# and the pending limit do for them without delaying the others.
+#
+# "server" measures it end to end against a running server: N WebSocket
+# clients listen on /live/mp_common_definitions while one client edits a
+# location; it reports the time from each PUT's response to each client
+# seeing the new name.
+import asyncio
+import json
+import statistics
+import time
+
+import typer
+
+cli = typer.Typer()
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def report(label: str, latencies: list[float]) -> None:
+    if not latencies:
+        typer.echo(f"{label:<14} no samples")
+        return
+    typer.echo(
+        f"{label:<14} n={len(latencies):<6} "
+        f"p50={percentile(latencies, 50):7.1f} ms  "
+        f"p99={percentile(latencies, 99):7.1f} ms  "
+        f"max={max(latencies):7.1f} ms"
+    )
+
+
+async def drain(subscription, coalesce: float, delay: float, stop: asyncio.Event, seen: list[float], stats: dict):
+    from app.core.serialization import dumps
+
+    while not stop.is_set():
+        try:
+            message = await asyncio.wait_for(subscription.next_message(coalesce), 0.5)
+        except asyncio.TimeoutError:
+            continue
+        dumps(message)
+        now = time.perf_counter()
+        stats["messages"] += 1
+        if message["type"] == "resync":
+            stats["resyncs"] += 1
+        for change in message.get("changes", []):
+            seen.append((now - change["data"]["published"]) * 1000)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+async def run_hub(subscribers: int, slow: float, slow_delay: float, bursts: int, burst_size: int, rows: int,
+                  interval: float, coalesce: float, max_pending: int):
+    from app.core.broadcast import ChangeBroadcaster
+
+    broadcaster = ChangeBroadcaster()
+    slow_count = int(subscribers * slow)
+    stop = asyncio.Event()
+    groups = {"fast": ([], {"messages": 0, "resyncs": 0}), "slow": ([], {"messages": 0, "resyncs": 0})}
+    tasks = []
+    for index in range(subscribers):
+        group = "slow" if index < slow_count else "fast"
+        subscription = broadcaster.subscribe("mp_common_definitions", max_pending)
+        seen, stats = groups[group]
+        delay = slow_delay if group == "slow" else 0.0
+        tasks.append(asyncio.create_task(drain(subscription, coalesce, delay, stop, seen, stats)))
+
+    publish_times = []
+    seq = 0
+    for burst in range(bursts):
+        changes = []
+        for offset in range(burst_size):
+            seq += 1
+            row_id = (burst * burst_size + offset) % rows
+            changes.append({
+                "seq": seq, "entity": "location", "id": row_id, "op": "update", "fields": ["name"],
+                "data": {"id": row_id, "name": f"Location {seq}", "published": time.perf_counter()},
+            })
+        start = time.perf_counter()
+        broadcaster.publish(changes, seq, lambda entity: "mp_common_definitions")
+        publish_times.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+
+    await asyncio.sleep(max(coalesce, slow_delay) * 3 + 0.5)
+    stop.set()
+    await asyncio.gather(*tasks)
+
+    total = bursts * burst_size
+    typer.echo(f"{subscribers} subscribers ({slow_count} slow), {bursts} bursts of {burst_size} changes over {rows} rows")
+    report("publish", publish_times)
+    for group, (seen, stats) in groups.items():
+        count = slow_count if group == "slow" else subscribers - slow_count
+        if not count:
+            continue
+        report(f"{group} delivery", seen)
+        typer.echo(
+            f"{'':<14} {stats['messages'] / count:.1f} messages and {len(seen) / count:.1f} of {total} changes "
+            f"per subscriber after folding, {stats['resyncs']} resyncs"
+        )
+
+
+@cli.command()
+def hub(
+    subscribers: int = typer.Option(200, help="Open connections"),
+    slow: float = typer.Option(0.1, help="Fraction of subscribers that read slowly"),
+    slow_delay: float = typer.Option(0.5, help="Seconds a slow subscriber spends per message"),
+    bursts: int = typer.Option(50),
+    burst_size: int = typer.Option(20, help="Changes committed together"),
+    rows: int = typer.Option(100, help="Distinct rows the changes hit, so bursts overlap"),
+    interval: float = typer.Option(0.02, help="Seconds between bursts"),
+    coalesce: float = typer.Option(0.05, help="LIVE_COALESCE_SECONDS"),
+    max_pending: int = typer.Option(1000, help="LIVE_MAX_PENDING"),
+):
+    """Fanout cost and delivery latency of the broadcaster alone."""
+    asyncio.run(run_hub(subscribers, slow, slow_delay, bursts, burst_size, rows, interval, coalesce, max_pending))
+
+
+async def listen(url: str, token: str, name_seen: dict, opened: list, stop: asyncio.Event):
+    import websockets
+
+    async with websockets.connect(url, additional_headers={"Authorization": f"Bearer {token}"}) as socket:
+        await socket.recv()     # hello
+        opened.append(socket)
+        while not stop.is_set():
+            try:
+                message = json.loads(await asyncio.wait_for(socket.recv(), 0.5))
+            except asyncio.TimeoutError:
+                continue
+            now = time.perf_counter()
+            for change in message.get("changes", []):
+                name = (change.get("data") or {}).get("name")
+                if name in name_seen:
+                    name_seen[name].append(now)
+
+
+async def run_server(base_url: str, username: str, password: str, clients: int, edits: int, interval: float):
+    import httpx
+
+    ws_url = base_url.replace("http", "ws", 1) + "/live/mp_common_definitions"
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        response = await client.post(
+            "/auth/token", data={"username": username, "password": password}, params={"set_cookie": False}
+        )
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        code = f"BENCH{int(time.time())}"
+        response = await client.post("/mp_common_definitions/locations/", json={"code": code, "name": code}, headers=headers)
+        response.raise_for_status()
+        location_id = response.json()["id"]
+
+        name_seen: dict[str, list[float]] = {}
+        stop = asyncio.Event()
+        opened: list = []
+        listeners = [
+            asyncio.create_task(listen(ws_url, headers["Authorization"][7:], name_seen, opened, stop))
+            for _ in range(clients)
+        ]
+        while len(opened) < clients:
+            await asyncio.sleep(0.05)
+
+        sent: dict[str, float] = {}
+        for index in range(edits):
+            name = f"{code} {index}"
+            name_seen[name] = []
+            response = await client.put(
+                f"/mp_common_definitions/locations/{location_id}", json={"name": name}, headers=headers
+            )
+            response.raise_for_status()
+            sent[name] = time.perf_counter()
+            await asyncio.sleep(interval)
+
+        await asyncio.sleep(2)
+        stop.set()
+        await asyncio.gather(*listeners)
+        await client.delete(f"/mp_common_definitions/locations/{location_id}", headers=headers)
+
+    latencies = [
+        max(0.0, (seen - sent[name]) * 1000)
+        for name, times in name_seen.items()
+        for seen in times
+    ]
+    delivered = statistics.fmean(len(times) / clients for times in name_seen.values())
+    typer.echo(f"{clients} clients, {edits} edits, {delivered:.0%} of edits seen per client (the rest folded)")
+    report("push latency", latencies)
+
+
+@cli.command()
+def server(
+    base_url: str = typer.Option("http://127.0.0.1:8000"),
+    username: str = typer.Option(..., prompt=True),
+    password: str = typer.Option(..., prompt=True, hide_input=True),
+    clients: int = typer.Option(200, help="Concurrent WebSocket clients"),
+    edits: int = typer.Option(50),
+    interval: float = typer.Option(0.1, help="Seconds between edits"),
+):
+    """Edit-to-screen latency over real WebSocket connections."""
+    asyncio.run(run_server(base_url, username, password, clients, edits, interval))
+
+
+if __name__ == "__main__":
+    cli()
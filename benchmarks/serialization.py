@@ -0,0 +1,121 @@
+# python -m benchmarks.serialization --users 10000
+#
+# Per-row cost of serializing the user list (all four relationships loaded)
+# with each JSON_SERIALIZER engine. "fastapi" replays what a route with
+# response_model=list[UserRead] does: validate through the response field,
+# turn the result into Python primitives, then json.dumps them. The database
+# is a throwaway SQLite file, so the numbers exclude query time.
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import typer
+
+cli = typer.Typer()
+
+
+def seed(users: int, per_relationship: int) -> None:
+    from sqlmodel import Session, insert, select
+
+    from app.core.database import engine
+    from app.models import (
+        Division, DivisionUserLink, Module, User, UserModuleLink, UserRole,
+        UserRoleLink, UserSkill, UserSkillLink,
+    )
+
+    with Session(engine) as db:
+        db.execute(insert(UserRole), [{"rolename": f"role{i}", "can_read": True} for i in range(20)])
+        db.execute(insert(UserSkill), [{"skillname": f"skill{i}", "skill_level": i % 5} for i in range(20)])
+        db.execute(insert(Division), [{"code": f"D{i}", "name": f"Division {i}"} for i in range(20)])
+        db.execute(insert(User), [
+            {
+                "username": f"user{i}", "email": f"user{i}@example.com", "name": "Name", "surname": "Surname",
+                "title": "Engineer", "usertype": "regular", "hashed_pw": "x",
+                "created_by": "benchmark", "last_modified_by": "benchmark",
+            }
+            for i in range(users)
+        ])
+        user_ids = db.exec(select(User.id)).all()
+        module_ids = db.exec(select(Module.id)).all()
+        for link, column, targets in (
+            (UserRoleLink, "role_id", db.exec(select(UserRole.id)).all()),
+            (UserSkillLink, "skill_id", db.exec(select(UserSkill.id)).all()),
+            (UserModuleLink, "module_id", module_ids),
+            (DivisionUserLink, "division_id", db.exec(select(Division.id)).all()),
+        ):
+            count = min(per_relationship, len(targets))
+            db.execute(insert(link), [
+                {"user_id": user_id, column: targets[(user_id + k) % len(targets)]}
+                for user_id in user_ids
+                for k in range(count)
+            ])
+        db.commit()
+
+
+def fastapi_engine(objects) -> bytes:
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+
+    from app.models import UserRead
+
+    field = create_model_field(name="Response", type_=list[UserRead], mode="serialization")
+    content = asyncio.run(serialize_response(field=field, response_content=objects))
+    return JSONResponse(content).body
+
+
+@cli.command()
+def main(
+    users: int = typer.Option(10_000, help="Users to generate"),
+    per_relationship: int = typer.Option(2, help="Links per user in each of the four relationships"),
+    rounds: int = typer.Option(5, help="Timed rounds per engine"),
+):
+    directory = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{directory}/benchmark.sqlite3"
+
+    from sqlmodel import Session
+
+    from app.core.database import engine, init_db
+    from app.core.serialization import ListSerializer, orjson
+    from app.crud.users_and_permissions import read_all_users, user_relationships
+    from app.models import UserRead
+
+    init_db()
+    seed(users, per_relationship)
+    with Session(engine) as db:
+        start = time.perf_counter()
+        objects = read_all_users(db)
+        typer.echo(f"loaded {len(objects)} users in {(time.perf_counter() - start) * 1000:.0f} ms (not counted below)")
+
+        serializer = ListSerializer(UserRead, user_relationships)
+        engines = {"fastapi": fastapi_engine, "pydantic": serializer.validated_json}
+        if orjson is not None:
+            engines["orjson"] = serializer.direct_json
+        else:
+            typer.echo("orjson is not installed, skipping that engine")
+
+        reference = None
+        for name, dump in engines.items():
+            body = dump(objects)    # warm-up, and the output check below
+            parsed = json.loads(body)
+            if reference is None:
+                reference = parsed
+            elif parsed != reference:
+                typer.secho(f"{name} output differs from fastapi", fg=typer.colors.RED)
+            timings = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                dump(objects)
+                timings.append(time.perf_counter() - start)
+            median = statistics.median(timings)
+            typer.echo(
+                f"{name:>8}: {median * 1000:8.1f} ms total, {median / len(objects) * 1e6:6.1f} us/row, "
+                f"{len(body) / 1024:8.0f} KiB"
+            )
+
+
+if __name__ == "__main__":
+    cli()
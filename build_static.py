@@ -0,0 +1,26 @@
+import typer
+from pathlib import Path
+
+from app.core.config import settings
+from app.core.compression import brotli
+from app.core.static_assets import build_static
+
+cli = typer.Typer()
+
+
+@cli.command()
+def build(
+    source: Path = typer.Option(Path("app/static"), help="Static files to build"),
+    target: Path = typer.Option(Path(settings.STATIC_BUILD_DIR), help="Where the fingerprinted files go"),
+    clean: bool = typer.Option(False, help="Remove the hashed files of earlier builds first"),
+):
+    """Fingerprint and precompress the static files; restart the app to serve the new build."""
+    if brotli is None:
+        typer.secho("brotli is not installed, writing .gz siblings only", fg=typer.colors.YELLOW)
+    manifest = build_static(source, target, clean=clean)
+    compressed = sum(1 for entry in manifest.values() if entry["encodings"])
+    typer.secho(f"Built {len(manifest)} files into {target} ({compressed} precompressed).", fg=typer.colors.GREEN)
+
+
+if __name__ == "__main__":
+    cli()
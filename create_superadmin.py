@@ -3,6 +3,7 @@ import os
 from app.core.database import get_sync_session, init_db
 from app.models import User, UserType, Module
 from app.dependencies.auth import get_password_hash
+from app.core.versions import bump_table_versions
 from sqlmodel import select
 
 cli = typer.Typer()
@@ -36,6 +37,7 @@ def create_superadmin(
         user = User(username=username, email=email, hashed_pw=hashed, usertype=UserType.superadmin, name=name, surname=surname, title=title, profile_image_path=default_iamge_path, created_by='root', last_modified_by='root')
         user.modules = session.exec(select(Module)).all()
         session.add(user)
+        bump_table_versions(session, "user")
         session.commit()
         typer.secho(f"SuperAdmin '{username}: {email}' created.", fg=typer.colors.GREEN)
 
@@ -0,0 +1,22 @@
+import typer
+
+from app.core.database import engine, init_db, migration_lock
+from app.core.search import search_indexes, sync_search_indexes
+
+cli = typer.Typer()
+
+
+@cli.command()
+def rebuild():
+    """Drop and rebuild the full-text search indexes from the current rows."""
+    if engine.dialect.name != "sqlite":
+        typer.secho("Full-text search needs SQLite FTS5; nothing to rebuild.", fg=typer.colors.YELLOW)
+        raise typer.Exit()
+    init_db()  # ensure tables exist
+    with migration_lock() as connection:
+        sync_search_indexes(connection, recreate=True)
+    typer.secho(f"Rebuilt the search indexes of {', '.join(search_indexes)}.", fg=typer.colors.GREEN)
+
+
+if __name__ == "__main__":
+    cli()